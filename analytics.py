@@ -0,0 +1,197 @@
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import calendar
+import numpy as np
+
+# Days of daily rollups loaded per user
+HISTORY_DAYS = 3 * 365
+ROLLING_WINDOW = 7
+ANOMALY_Z = 2.5
+ANOMALY_BASELINE_DAYS = 90
+RECENT_DAYS = 30
+WEEKDAY_PROFILE_WEEKS = 8
+MAX_WEEKS = 52
+
+
+def rollup_pipeline(email: str, since: date, until: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Aggregate a user's expenses into (day, category) totals, from `since` up to and including `until`"""
+    dates = {"$gte": since.strftime('%Y-%m-%d')}
+    if until is not None:
+        dates["$lt"] = (until + timedelta(days=1)).strftime('%Y-%m-%d')
+    return [
+        {"$match": {"user": email, "date": dates}},
+        {"$group": {
+            "_id": {"d": {"$substrCP": ["$date", 0, 10]}, "c": "$category"},
+            "total": {"$sum": "$amount"}
+        }}
+    ]
+
+
+def build_rollup(rows: Iterable[Dict[str, Any]], start: date, today: date) -> Tuple[List[str], np.ndarray]:
+    """Scatter rollup rows into a dense (days x categories) matrix covering start..today"""
+    n = (today - start).days + 1
+    cats: Dict[str, int] = {}
+    days, idx_c, vals = [], [], []
+    for r in rows:
+        key = r.get('_id') or {}
+        days.append(str(key.get('d'))[:10])
+        idx_c.append(cats.setdefault(key.get('c') or 'Misc', len(cats)))
+        vals.append(r.get('total') or 0)
+    width = max(len(cats), 1)
+    m = np.zeros((n, width))
+    if vals:
+        # Parse the whole date column at once; malformed dates become NaT and are dropped
+        parsed = np.array(days, dtype='datetime64[D]') if all(len(d) == 10 for d in days) else \
+            np.array([_safe_day(d) for d in days], dtype='datetime64[D]')
+        idx_d = (parsed - np.datetime64(start.isoformat(), 'D')).astype(np.int64)
+        ok = ~np.isnat(parsed) & (idx_d >= 0) & (idx_d < n)
+        flat = idx_d[ok] * width + np.asarray(idx_c)[ok]
+        m = np.bincount(flat, weights=np.asarray(vals, dtype=np.float64)[ok], minlength=n * width).reshape(n, width)
+    return list(cats) or ['Misc'], m
+
+
+def _safe_day(s: str):
+    try:
+        return np.datetime64(s, 'D')
+    except ValueError:
+        return np.datetime64('NaT')
+
+
+def _pct(cur: np.ndarray, prev: np.ndarray) -> np.ndarray:
+    out = np.full(cur.shape, np.nan)
+    np.divide(cur - prev, prev, out=out, where=prev > 0)
+    return out * 100.0
+
+
+def _month_index(start: date, d: date) -> int:
+    return (d - start).days
+
+
+def analyze(m: np.ndarray, categories: List[str], start: date, today: date,
+            budget: Optional[float] = None) -> Dict[str, Any]:
+    """Rolling averages, WoW/MoM deltas, anomalies and a month-end forecast in one pass"""
+    n, _ = m.shape
+    daily = m.sum(axis=1)
+    ords = np.arange(start.toordinal(), start.toordinal() + n)
+    weekday = (ords - 1) % 7  # date.fromordinal(1) is a Monday
+
+    # Rolling average of daily spend
+    w = min(ROLLING_WINDOW, n)
+    cs = np.concatenate(([0.0], np.cumsum(daily)))
+    rolling = (cs[w:] - cs[:-w]) / w
+    recent_rolling = rolling[-RECENT_DAYS:]
+    rolling_dates = [date.fromordinal(int(o)).isoformat() for o in ords[-len(recent_rolling):]]
+
+    # Week over week per category
+    this_week = m[-7:].sum(axis=0)
+    prev_week = m[-14:-7].sum(axis=0) if n >= 14 else np.zeros_like(this_week)
+    wow = _pct(this_week, prev_week)
+
+    # Month to date vs the same span of the previous month
+    ms = _month_index(start, today.replace(day=1))
+    span = n - ms
+    mtd = m[ms:].sum(axis=0)
+    prev_first = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+    pms = _month_index(start, prev_first)
+    prev_len = calendar.monthrange(prev_first.year, prev_first.month)[1]
+    if pms >= 0:
+        prev_mtd = m[pms:pms + min(span, prev_len)].sum(axis=0)
+    else:
+        prev_mtd = np.zeros_like(mtd)
+    mom = _pct(mtd, prev_mtd)
+
+    # Daily anomalies: recent days scored against the preceding baseline
+    recent = daily[-RECENT_DAYS:]
+    base = daily[max(0, n - RECENT_DAYS - ANOMALY_BASELINE_DAYS):max(0, n - RECENT_DAYS)]
+    anomalies = []
+    if base.size >= 14 and base.std() > 0:
+        z = (recent - base.mean()) / base.std()
+        for i in np.flatnonzero(z > ANOMALY_Z):
+            o = ords[n - len(recent) + i]
+            anomalies.append({'date': date.fromordinal(int(o)).isoformat(),
+                              'total': float(recent[i]), 'z': float(z[i])})
+
+    # Category anomalies: this week's totals against past weekly totals
+    k = min(n // 7, MAX_WEEKS)
+    cat_anomalies = []
+    if k >= 4:
+        weeks = m[n - 7 * k:].reshape(k, 7, -1).sum(axis=1)
+        hist = weeks[:-1]
+        mu, sd = hist.mean(axis=0), hist.std(axis=0)
+        cz = np.zeros_like(mu)
+        np.divide(weeks[-1] - mu, sd, out=cz, where=sd > 0)
+        for j in np.flatnonzero(cz > ANOMALY_Z):
+            cat_anomalies.append({'category': categories[j], 'week_total': float(weeks[-1, j]), 'z': float(cz[j])})
+
+    # Month-end forecast from a weekday profile, scaled by last year's seasonality
+    days_in_month = calendar.monthrange(today.year, today.month)[1]
+    remaining = days_in_month - today.day
+    prof_n = min(WEEKDAY_PROFILE_WEEKS * 7, n)
+    counts = np.bincount(weekday[-prof_n:], minlength=7)
+    sums = np.bincount(weekday[-prof_n:], weights=daily[-prof_n:], minlength=7)
+    profile = np.divide(sums, counts, out=np.zeros(7), where=counts > 0)
+    rem_weekdays = (np.arange(today.toordinal() + 1, today.toordinal() + 1 + remaining) - 1) % 7
+    expected_rest = float(profile[rem_weekdays].sum())
+
+    seasonal = 1.0
+    ly_first = date(today.year - 1, today.month, 1)
+    ly_ms = _month_index(start, ly_first)
+    if ly_ms >= 0 and n >= 395:
+        ly_total = daily[ly_ms:ly_ms + calendar.monthrange(ly_first.year, ly_first.month)[1]].sum()
+        avg_month = daily[-365:].sum() / 12.0
+        if ly_total > 0 and avg_month > 0:
+            seasonal = float(np.clip(ly_total / avg_month, 0.5, 2.0))
+
+    spent_mtd = float(daily[ms:].sum())
+    forecast = spent_mtd + expected_rest * seasonal
+    linear = spent_mtd / max(span, 1) * days_in_month
+
+    by_cat = []
+    for j in np.argsort(-mtd):
+        by_cat.append({
+            'category': categories[j],
+            'month_to_date': float(mtd[j]),
+            'week': float(this_week[j]),
+            'wow_pct': None if np.isnan(wow[j]) else float(wow[j]),
+            'mom_pct': None if np.isnan(mom[j]) else float(mom[j]),
+        })
+
+    result = {
+        'as_of': today.isoformat(),
+        'rolling_7d': [{'date': d, 'avg': float(v)} for d, v in zip(rolling_dates, recent_rolling)],
+        'categories': by_cat,
+        'anomalies': anomalies,
+        'category_anomalies': cat_anomalies,
+        'forecast': {
+            'spent_to_date': spent_mtd,
+            'month_end': forecast,
+            'linear': linear,
+            'seasonal_factor': seasonal,
+            'days_remaining': remaining,
+        },
+    }
+    if budget:
+        result['forecast']['budget'] = float(budget)
+        result['forecast']['over_budget'] = forecast - float(budget)
+    return result
+
+
+def insights_text(result: Dict[str, Any]) -> List[str]:
+    """Turn analytics output into short human-readable insights"""
+    insights = []
+    fc = result.get('forecast') or {}
+    if fc.get('budget') and fc.get('over_budget', 0) > 0:
+        insights.append(f"At this rate, you may exceed your budget by ₹{fc['over_budget']:.0f}.")
+    elif fc.get('month_end'):
+        insights.append(f"Projected month-end spend: ₹{fc['month_end']:.0f}.")
+    for c in result.get('categories') or []:
+        if c['wow_pct'] is not None and c['wow_pct'] >= 50 and c['week'] > 0:
+            insights.append(f"{c['category']} spending is up {c['wow_pct']:.0f}% week over week.")
+        if c['mom_pct'] is not None and c['mom_pct'] <= -25:
+            insights.append(f"{c['category']} is down {abs(c['mom_pct']):.0f}% versus last month so far.")
+    for a in result.get('category_anomalies') or []:
+        insights.append(f"Unusual week for {a['category']}: ₹{a['week_total']:.0f} is well above your norm.")
+    if result.get('anomalies'):
+        last = result['anomalies'][-1]
+        insights.append(f"Spending spike on {last['date']}: ₹{last['total']:.0f}.")
+    return insights
@@ -1,19 +1,20 @@
-from flask import Flask, render_template, request, redirect, url_for, jsonify, session, make_response, abort
+from flask import Flask, render_template, request, redirect, url_for, jsonify, session, make_response, abort, Response
 from flask import send_from_directory
 from flask_bcrypt import Bcrypt
 from flask_login import LoginManager, login_user, logout_user, login_required, UserMixin, current_user
-from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
 from werkzeug.utils import secure_filename
 from bson.objectid import ObjectId
 import pytesseract, os, re, json, io
 from PIL import Image
-from datetime import datetime
-import traceback
+from datetime import date, datetime, timedelta
 import shutil
+import hashlib, hmac
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from functools import wraps
-from reportlab.pdfgen import canvas as _pdf_canvas
-from reportlab.lib.pagesizes import A4
-from reportlab.lib.units import mm
 from flask_cors import CORS
 import requests
 from typing import List, Dict, Any, Optional
@@ -22,8 +23,32 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+# Structured JSON logging through a background queue listener
+from logging_setup import configure_logging, init_app as init_request_ids
+log = configure_logging()
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.05'))  # for high-volume events
+
 # Import Firestore utilities
 from firestore_utils import db, UPDATES_COLLECTION, FAQ_COLLECTION
+from pdf_report import render_analysis_report
+from export_cache import ExportCache, ExportJobs, export_key
+from importers import CLIENT_ID_RE, MAX_BATCH, import_expenses, ingest_batch, iter_csv_records, iter_ofx_records
+from exporters import EXPORT_FIELDS, EXPORT_PROJECTION, iter_csv, iter_jsonl, iter_parquet
+from analytics import analyze, build_rollup, insights_text, rollup_pipeline, HISTORY_DAYS
+from dedupe import describe, duplicate_report, find_duplicate, fingerprints
+from search import build_query, search_expenses, search_prefixes
+from receipt_store import MERCHANT_PROJECTION, ReceiptTextStore, extract_keywords, text_for
+from auth_guard import HashPool, MemoryBucketStore, PoolBusy, RateLimiter, RedisBucketStore
+from mongo_indexes import ensure_indexes
+from receipt_parsing import (assess_expense, categorize_expense, extract_merchant, extract_total_amount,
+                             month_bounds as _month_bounds, parse_doc_date as _parse_doc_date)
+from metrics import track, init_app as init_metrics
+from database import Mongo, pool_options_from_env
+from write_buffer import WriteBuffer
+from profiling import SlowLog, init_app as init_profiling
+from live_updates import LiveUpdates, MemoryBroker, RedisBroker
+from response_encoding import init_compression, init_json
+import assets
 
 # Application Configuration
 app = Flask(__name__)
@@ -33,12 +58,63 @@ app.config.update(
     MAX_CONTENT_LENGTH=16 * 1024 * 1024,  # 16MB max file size
 )
 
+# Rows fetched per round-trip when streaming transactions into PDF exports
+PDF_CURSOR_BATCH_SIZE = int(os.getenv('PDF_CURSOR_BATCH_SIZE', '500'))
+
+# Generated exports are cached on disk by (user, range, data version)
+EXPORT_CACHE_DIR = os.getenv('EXPORT_CACHE_DIR', os.path.join('uploads', 'exports'))
+EXPORT_CACHE_MAX_MB = int(os.getenv('EXPORT_CACHE_MAX_MB', '256'))
+# Reports with more rows than this are rendered by export_jobs (about 1 s per 1000 rows, see bench_pdf_report)
+PDF_BACKGROUND_ROWS = int(os.getenv('PDF_BACKGROUND_ROWS', '1000'))
+export_cache = ExportCache(EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_MB * 1024 * 1024)
+# Job state sits next to the cached files, so any worker on the host can answer a poll
+export_jobs = ExportJobs(export_cache, max_workers=int(os.getenv('EXPORT_WORKERS', '2')))
+
+# Bulk data exports stream straight from a Mongo cursor
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+EXPORT_MIMETYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
 # Initialize extensions
 bcrypt = Bcrypt(app)
 login_manager = LoginManager(app)
 login_manager.login_view = 'login'
 CORS(app)
 
+# Password hashing runs on a bounded pool; requests beyond the queue are rejected with 503
+hash_pool = HashPool(
+    workers=int(os.getenv('HASH_WORKERS', str(os.cpu_count() or 2))),
+    max_queue=int(os.getenv('HASH_QUEUE_DEPTH', '32'))
+)
+
+# Token-bucket rate limits, shared through Redis when RATE_LIMIT_REDIS_URL is set
+_bucket_store = RedisBucketStore(os.environ['RATE_LIMIT_REDIS_URL']) if os.getenv('RATE_LIMIT_REDIS_URL') else MemoryBucketStore()
+login_ip_limiter = RateLimiter(_bucket_store, per_minute=float(os.getenv('LOGIN_IP_PER_MINUTE', '30')), burst=10)
+login_account_limiter = RateLimiter(_bucket_store, per_minute=float(os.getenv('LOGIN_ACCOUNT_PER_MINUTE', '10')), burst=5)
+register_limiter = RateLimiter(_bucket_store, per_minute=float(os.getenv('REGISTER_IP_PER_MINUTE', '5')), burst=5)
+
+# Parallel Mongo/Firestore lookups for the combined /api/dashboard payload
+dashboard_pool = ThreadPoolExecutor(max_workers=int(os.getenv('DASHBOARD_WORKERS', '8')), thread_name_prefix='dashboard')
+
+# Announcement/FAQ feeds are cached per process; admin writes through the API clear them
+FEED_CACHE_SECONDS = int(os.getenv('FEED_CACHE_SECONDS', '60'))
+_feed_cache: Dict[str, tuple] = {}
+
+# Live dashboard updates over SSE; set LIVE_REDIS_URL to share channels across workers
+live = LiveUpdates(
+    RedisBroker(os.environ['LIVE_REDIS_URL']) if os.getenv('LIVE_REDIS_URL') else MemoryBroker(),
+    max_streams_per_user=int(os.getenv('LIVE_MAX_STREAMS_PER_USER', '5'))
+)
+
+# What to do with probable duplicate expenses: flag, reject or allow
+DUPLICATE_POLICY = os.getenv('DUPLICATE_POLICY', 'flag')
+
+# Days of daily rollups fed to the analytics engine
+ANALYTICS_HISTORY_DAYS = int(os.getenv('ANALYTICS_HISTORY_DAYS', str(HISTORY_DAYS)))
+
 # LLM Configuration
 LLM_API_ENDPOINT = os.getenv('LLM_API_ENDPOINT', 'https://api.openai.com/v1/chat/completions')
 LLM_API_KEY = os.getenv('NVIDIA_API_KEY') or os.getenv('OPENAI_API_KEY')
@@ -48,21 +124,30 @@ LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-3.5-turbo')
 def get_user_context(email: str) -> List[Dict[str, str]]:
     """Get conversation context for the user"""
     try:
-        # Get last 5 messages from chat history
-        chat_history = list(chats_col.find(
-            {"user": email},
-            {"_id": 0, "role": 1, "content": "$text", "date": 1}
-        ).sort("date", -1).limit(10))
-        
-        # Convert to LLM message format and reverse to maintain order
-        return [
-            {"role": msg["role"], "content": msg["content"]}
-            for msg in reversed(chat_history)
-        ]
+        # Last 10 messages of chat history, oldest first, in LLM message format
+        context = [{"role": msg["role"], "content": msg["text"]} for msg in _recent_chats(email, 10)]
+        # Older history survives only as the summary written by maintenance.py
+        summary = chat_summaries_col.find_one({"user": email}, {"_id": 0, "text": 1})
+        if summary and summary.get("text"):
+            # Assistant-role context, not "system": the summary quotes what the user typed
+            context.insert(0, {"role": "assistant", "content": f"(Notes from our earlier conversations: {summary['text']})"})
+        return context
     except Exception as e:
-        print(f"Error fetching chat history: {e}")
+        log.warning("Error fetching chat history", extra={"error": str(e)})
         return []
 
+def _spending_analytics(email: str, budget: Optional[float] = None, as_of: Optional[date] = None) -> Dict[str, Any]:
+    """Load daily category rollups and run the analytics engine over them, as of `as_of` (default today)"""
+    try:
+        today = min(as_of, datetime.now().date()) if as_of else datetime.now().date()
+        since = today - timedelta(days=ANALYTICS_HISTORY_DAYS)
+        rows = expenses_col.aggregate(rollup_pipeline(email, since, today))
+        categories, matrix = build_rollup(rows, since, today)
+        return analyze(matrix, categories, since, today, budget)
+    except Exception as e:
+        log.exception("Error computing analytics")
+        return {}
+
 def get_financial_context(email: str) -> Dict[str, Any]:
     """Get financial context for the user"""
     try:
@@ -84,14 +169,18 @@ def get_financial_context(email: str) -> Dict[str, Any]:
         # Get budget if set
         settings = _get_user_settings(email)
         
+        stats = _spending_analytics(email, settings.get("monthly_budget"))
+        
         return {
             "recent_expenses": expenses[:5],  # Top 5 categories
             "total_spent": sum(e["total"] for e in expenses),
             "monthly_budget": settings.get("monthly_budget"),
-            "savings_goal": settings.get("savings_goal")
+            "savings_goal": settings.get("savings_goal"),
+            "forecast": stats.get("forecast") or {},
+            "insights": insights_text(stats) if stats else []
         }
     except Exception as e:
-        print(f"Error fetching financial context: {e}")
+        log.warning("Error fetching financial context", extra={"error": str(e)})
         return {}
 
 def generate_llm_response(user_message: str, user_email: str) -> str:
@@ -113,6 +202,8 @@ def generate_llm_response(user_message: str, user_email: str) -> str:
         - Total Monthly Spend: ${financial_context.get('total_spent', 0):.2f}
         - Monthly Budget: ${financial_context.get('monthly_budget', 'Not set')}
         - Savings Goal: ${financial_context.get('savings_goal', 'Not set')}
+        - Projected Month-End Spend: ${financial_context.get('forecast', {}).get('month_end', 0):.2f}
+        - Recent Trends: {'; '.join(financial_context.get('insights', [])) or 'None'}
         
         Guidelines:
         1. Be concise and specific in your responses
@@ -139,27 +230,29 @@ def generate_llm_response(user_message: str, user_email: str) -> str:
             "max_tokens": 500
         }
         
-        response = requests.post(
-            LLM_API_ENDPOINT,
-            headers=headers,
-            json=payload,
-            timeout=30
-        )
+        with track('llm', 'chat_completions'):
+            response = requests.post(
+                LLM_API_ENDPOINT,
+                headers=headers,
+                json=payload,
+                timeout=30
+            )
         
         if response.status_code == 200:
             return response.json()["choices"][0]["message"]["content"]
         else:
-            print(f"LLM API Error: {response.status_code} - {response.text}")
+            log.error("LLM API error", extra={"status": response.status_code, "body": response.text[:200]})
             return "I'm having trouble connecting to the AI assistant. Please try again later."
             
     except Exception as e:
-        print(f"Error calling LLM API: {e}")
+        log.warning("Error calling LLM API", extra={"error": str(e)})
         return "I'm sorry, I encountered an error while processing your request. Please try again."
 
 
 # Tesseract OCR configuration
-tess_cmd = os.getenv('TESSERACT_CMD', '/opt/homebrew/bin/tesseract')
-pytesseract.pytesseract.tesseract_cmd = tess_cmd
+# TESSERACT_CMD wins, then tesseract on PATH, then the Homebrew location
+_tess_env = os.getenv('TESSERACT_CMD')
+pytesseract.pytesseract.tesseract_cmd = '/opt/homebrew/bin/tesseract'
 _tess_found = shutil.which('tesseract')
 if _tess_env:
     pytesseract.pytesseract.tesseract_cmd = _tess_env
@@ -181,6 +274,20 @@ CORS(app,
          }
      })
 
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv('BCRYPT_LOG_ROUNDS', '12'))  # bcrypt cost factor
+
+# Request ids for log correlation, and request/dependency metrics at /metrics (optionally behind METRICS_TOKEN)
+init_request_ids(app)
+init_metrics(app, token=os.getenv('METRICS_TOKEN'))
+# Admins can profile a request with `X-Profile: 1` or `?__profile=1`; flamegraphs land in PROFILE_DIR
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+slow_requests = SlowLog(keep=int(os.getenv('SLOW_LOG_KEEP', '2000')))
+init_profiling(app, is_admin=lambda: _is_admin(), directory=PROFILE_DIR, slow_log=slow_requests)
+# orjson serialisation (when installed) and gzip/brotli for text responses over COMPRESS_MIN_BYTES
+init_json(app)
+init_compression(app, min_size=int(os.getenv('COMPRESS_MIN_BYTES', '1024')))
+# Fingerprinted, precompressed static files from `python assets.py` (source files when not built)
+assets.init_app(app)
 bcrypt = Bcrypt(app)
 login_manager = LoginManager(app)
 login_manager.login_view = "login"
@@ -193,16 +300,53 @@ mongo_uri = os.getenv('MONGO_URI')
 if not mongo_uri:
     raise ValueError("No MONGO_URI environment variable set. Please check your .env file.")
 
-client = MongoClient(mongo_uri)
-db = client[os.getenv('MONGO_DB_NAME', 'ai_expenses')]
+# Built lazily in each worker process; pool size, wait-queue timeout and wire
+# compression come from MONGO_* env vars (see database.POOL_ENV)
+mongo = Mongo(mongo_uri, os.getenv('MONGO_DB_NAME', 'ai_expenses'), **pool_options_from_env())
+db = mongo.db
 
 # Collections
 users_col = db["users"]
 expenses_col = db["expenses"]
 chats_col = db["chats"]
+chat_summaries_col = db["chat_summaries"]
 notifications_col = db["notifications"]
 faq_col = db["faqs"]
 updates_col = db["updates"]
+receipt_texts = ReceiptTextStore(db["receipt_texts"])
+
+# Chat history and other non-critical inserts are written behind the response, in bulk.
+# Readers merge in pending documents, so callers bump data_version when they add, not on flush.
+write_behind = WriteBuffer(
+    db,
+    max_docs=int(os.getenv('WRITE_BUFFER_MAX_DOCS', '200')),
+    max_delay=float(os.getenv('WRITE_BUFFER_MAX_DELAY', '0.5'))
+)
+
+# Fields needed by the summary/analysis read paths; keeps receipt text off the wire
+SUMMARY_PROJECTION = {"_id": 0, "date": 1, "category": 1, "amount": 1, "merchant": MERCHANT_PROJECTION, "filename": 1}
+
+# Create/verify indexes (unique email, per-user expense/chat lookups, search); idempotent.
+# Done on each worker's first request, not at import, so a --preload master never builds
+# a MongoClient before forking; `python mongo_indexes.py` does the same from a deploy step.
+_indexes_lock = threading.Lock()
+_indexes_checked = os.getenv('MONGO_ENSURE_INDEXES', '1') != '1'
+
+@app.before_request
+def _ensure_indexes_once():
+    global _indexes_checked
+    if _indexes_checked:
+        return
+    with _indexes_lock:
+        if _indexes_checked:
+            return
+        _indexes_checked = True
+        try:
+            for r in ensure_indexes(db):
+                if not r['ok']:
+                    log.warning("Index not created", extra={"collection": r['collection'], "index": r['name'], "error": r['error']})
+        except Exception as e:
+            log.warning("Could not ensure indexes", extra={"error": str(e)})
 
 class User(UserMixin):
     def __init__(self, user_data):
@@ -210,6 +354,8 @@ class User(UserMixin):
         self.email = user_data.get("email")
         self.username = user_data.get("username") or (self.email.split('@')[0] if self.email else None)
         self.is_admin = user_data.get("is_admin", False)
+        # Read with the user document on every request; lets validators skip a lookup
+        self.data_version = int(user_data.get("data_version") or 0)
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -220,124 +366,23 @@ def load_user(user_id):
         return None
 
 
-def categorize_expense(text):
-    text = text.lower()
-    categories = {
-        "Food": ["food", "restaurant", "burger", "pizza", "hotel", "meal", "snack", "biryani"],
-        "Travel": ["uber", "ola", "train", "flight", "bus", "taxi", "petrol", "fuel"],
-        "Entertainment": ["movie", "cinema", "netflix", "prime", "game", "music"],
-        "Bills": ["electricity", "water", "mobile", "internet", "wifi"],
-        "Shopping": ["amazon", "flipkart", "mall", "clothes", "store"],
-        "Health": ["pharmacy", "hospital", "doctor", "medical"],
+def _request_range(now: datetime):
+    """Parse ?start=YYYY-MM-DD&end=YYYY-MM-DD, defaulting to the current month"""
+    q_start = request.args.get('start')
+    q_end = request.args.get('end')
+    if q_start and q_end:
+        try:
+            return datetime.strptime(q_start, '%Y-%m-%d'), datetime.strptime(q_end, '%Y-%m-%d')
+        except Exception:
+            pass
+    return _month_bounds(now)
+
+def _range_match(email: str, start: datetime, end: datetime) -> dict:
+    # Dates are stored as 'YYYY-MM-DD HH:MM' strings, so lexical order is chronological
+    return {
+        "user": email,
+        "date": {"$gte": start.strftime('%Y-%m-%d'), "$lt": end.strftime('%Y-%m-%d')}
     }
-    for cat, words in categories.items():
-        if any(w in text for w in words):
-            return cat
-    return "Misc"
-
-def assess_expense(category, amount, text):
-    text_l = (text or "").lower()
-    wanted = True
-    reason = ""
-    tips = []
-
-    if category in ("Bills", "Health", "Travel"):
-        wanted = True
-        reason = f"{category} is generally a necessary expense."
-        if category == "Bills":
-            tips.append("Review recurring plans to eliminate unused subscriptions.")
-        if category == "Health":
-            tips.append("Compare pharmacies or use generics to reduce costs.")
-    elif category in ("Entertainment", "Shopping"):
-        wanted = False
-        reason = f"{category} is usually discretionary."
-        tips.append("Set a monthly cap for discretionary categories.")
-        tips.append("Delay non-urgent purchases by 24 hours to curb impulse buys.")
-    elif category == "Food":
-        if any(k in text_l for k in ["restaurant", "hotel", "pizza", "burger", "biryani"]):
-            wanted = False
-            reason = "Eating out is discretionary compared to groceries."
-            tips.append("Meal plan and cook at home more often.")
-        else:
-            wanted = True
-            reason = "Groceries are generally necessary."
-    else:
-        wanted = amount < 500
-        reason = "Small purchases may be okay; larger ones may be avoidable."
-
-    if amount >= 2000 and category in ("Entertainment", "Shopping"):
-        tips.append("High spend detected. Consider reducing frequency or finding cheaper alternatives.")
-    if amount >= 5000:
-        tips.append("Set aside an emergency buffer before large discretionary spends.")
-
-    assessment = "Wanted" if wanted else "Unwanted"
-    return assessment, reason, tips
-
-def extract_total_amount(text: str) -> float:
-    try:
-        lines = [ln.strip() for ln in (text or "").splitlines() if ln.strip()]
-        keyword_patterns = [
-            r"grand\s*total",
-            r"total\s*amount",
-            r"amount\s*payable",
-            r"net\s*total",
-            r"balance\s*due",
-            r"total$",
-            r"total\s*:"
-        ]
-        amount_pattern = r"(?:(?:₹|rs\.?)[\s:]*)?([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{1,2})?|[0-9]+(?:\.[0-9]{1,2})?)"
-
-        def to_float(s: str):
-            try:
-                return float(s.replace(',', ''))
-            except Exception:
-                return None
-
-        for ln in reversed(lines):
-            low = ln.lower()
-            if any(re.search(k, low, re.IGNORECASE) for k in keyword_patterns):
-                m = re.search(amount_pattern, ln, re.IGNORECASE)
-                if m:
-                    val = to_float(m.group(1))
-                    if val is not None:
-                        return val
-
-        currency_amounts = list(re.finditer(r"(?:₹|rs\.?)[\s:]*([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{1,2})?|[0-9]+(?:\.[0-9]{1,2})?)", text, re.IGNORECASE))
-        if currency_amounts:
-            val = to_float(currency_amounts[-1].group(1))
-            if val is not None:
-                return val
-
-        candidates = []
-        for m in re.finditer(r"[0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{1,2})?|[0-9]+(?:\.[0-9]{1,2})?", text):
-            s = m.group(0)
-            if len(re.sub(r"[^0-9]", "", s)) >= 10 and (',' not in s and '.' not in s):
-                continue
-            val = to_float(s)
-            if val is None:
-                continue
-            if 1 <= val <= 1_000_000:
-                candidates.append(val)
-        if candidates:
-            return max(candidates)
-
-        return 0.0
-    except Exception:
-        return 0.0
-
-def _parse_doc_date(s: str) -> datetime:
-    try:
-        return datetime.strptime(str(s), "%Y-%m-%d %H:%M")
-    except Exception:
-        return datetime.now()
-
-def _month_bounds(dt: datetime):
-    start = datetime(dt.year, dt.month, 1)
-    if dt.month == 12:
-        end = datetime(dt.year + 1, 1, 1)
-    else:
-        end = datetime(dt.year, dt.month + 1, 1)
-    return start, end
 
 TIP_BANK = {
     "Food": [
@@ -392,9 +437,76 @@ def _get_user_settings(email: str) -> dict:
     except Exception:
         return {}
 
+def _admin_exists() -> bool:
+    return users_col.find_one({"is_admin": True}, {"_id": 1}) is not None
+
 def _save_user_settings(email: str, settings: dict):
     try:
-        users_col.update_one({"email": email}, {"$set": {"settings": settings}}, upsert=False)
+        users_col.update_one({"email": email}, {"$set": {"settings": settings}, "$inc": {"data_version": 1}}, upsert=False)
+    except Exception:
+        pass
+
+def _get_data_version(email: str) -> int:
+    try:
+        u = users_col.find_one({"email": email}, {"data_version": 1}) or {}
+        return int(u.get("data_version") or 0)
+    except Exception:
+        return 0
+
+def _api_etag(email: str) -> str:
+    """Validator for a user's read APIs: changes with their data version, the query string and the day.
+
+    The signed-in user's version comes from the document load_user already
+    fetched, so a matching If-None-Match is answered without another query.
+    """
+    if current_user.is_authenticated and current_user.email == email:
+        version = current_user.data_version
+    else:
+        version = _get_data_version(email)
+    raw = f"{email}|{version}|{request.full_path}|{datetime.now():%Y-%m-%d}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:24]
+
+def _cached_feed(name: str, loader):
+    """Announcements/FAQs from Firestore, kept in-process for FEED_CACHE_SECONDS with a content ETag"""
+    now = time.monotonic()
+    hit = _feed_cache.get(name)
+    if hit and hit[0] > now:
+        return hit[1], hit[2]
+    payload = loader()
+    etag = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()[:24]
+    _feed_cache[name] = (now + FEED_CACHE_SECONDS, payload, etag)
+    return payload, etag
+
+def _cache_scope(user) -> str:
+    """Opaque per-user key the service worker partitions its API cache by"""
+    return hmac.new(str(app.secret_key).encode(), str(user.id).encode(), hashlib.sha256).hexdigest()[:16]
+
+def _not_modified(etag: str) -> Response:
+    resp = Response(status=304)
+    # Echo the form the client holds: compressed responses carry the weak W/ tag
+    resp.set_etag(etag, weak=not request.if_none_match.is_strong(etag))
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+def _revalidatable(resp: Response, etag: str) -> Response:
+    """Mark a per-user JSON response as cacheable only with revalidation"""
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    resp.headers['X-Cache-Scope'] = _cache_scope(current_user)
+    resp.vary.add('Cookie')
+    return resp
+
+def _duplicate_policy(payload: Optional[dict] = None) -> str:
+    """flag (save and mark), reject (409) or allow; overridable per request via on_duplicate"""
+    val = (request.args.get('on_duplicate') or (payload or {}).get('on_duplicate')
+           or request.form.get('on_duplicate') or DUPLICATE_POLICY)
+    val = str(val).lower()
+    return val if val in ('flag', 'reject', 'allow') else DUPLICATE_POLICY
+
+def _bump_data_version(email: str):
+    """Invalidate anything keyed on the user's data (exports, caches) after a write"""
+    try:
+        users_col.update_one({"email": email}, {"$inc": {"data_version": 1}})
     except Exception:
         pass
 
@@ -433,6 +545,22 @@ def logo_asset():
     except Exception:
         return ('', 404)
 
+@app.route('/sw.js')
+def service_worker():
+    # Served from the root, not /static/, so the worker's scope covers the pages and APIs
+    response = send_from_directory(app.static_folder, 'sw.js', mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Service-Worker-Allowed'] = '/'
+    return response
+
+@app.route('/healthz')
+def healthz():
+    """Liveness for load balancers: MongoDB ping and this worker's connection pool saturation"""
+    health = mongo.health()
+    response = jsonify(health)
+    response.headers['Cache-Control'] = 'no-store'
+    return response, (503 if health['status'] == 'down' else 200)
+
 @app.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
@@ -450,10 +578,23 @@ def login():
                 return jsonify({"error": "Email and password are required"}), 400
             return render_template('login.html', error="Email and password are required")
             
+        # Per-IP and per-account token buckets blunt credential stuffing
+        if not login_ip_limiter.allow(f"login-ip:{request.remote_addr}") or \
+                not login_account_limiter.allow(f"login-acct:{email.strip().lower()}"):
+            if request.is_json:
+                return jsonify({"error": "Too many login attempts. Please wait and try again."}), 429
+            return render_template('login.html', error="Too many login attempts. Please wait and try again."), 429
+
         user = users_col.find_one({'email': email})
-        if user and bcrypt.check_password_hash(user['password'], password):
+        try:
+            valid = bool(user) and hash_pool.run(bcrypt.check_password_hash, user['password'], password)
+        except PoolBusy:
+            if request.is_json:
+                return jsonify({"error": "Server is busy. Please try again shortly."}), 503, {'Retry-After': '1'}
+            return render_template('login.html', error="Server is busy. Please try again shortly."), 503, {'Retry-After': '1'}
+        if valid:
             login_user(User(user))
-            print(f"✅ Login success for {email}")
+            log.info("Login success", extra={"user": email})
             if request.is_json:
                 return jsonify({"message": "Login successful"}), 200
             return redirect(url_for('dashboard'))
@@ -469,6 +610,9 @@ def register():
         return render_template('register.html')
         
     # Handle POST request
+    if not register_limiter.allow(f"register-ip:{request.remote_addr}"):
+        return render_template('register.html', error="Too many sign-up attempts. Please wait and try again."), 429
+
     email = request.form.get('email')
     if not email:
         return render_template('register.html', error="Email is required.")
@@ -482,21 +626,29 @@ def register():
     if users_col.find_one({'email': email}):
         return render_template('register.html', error="User already exists.")
 
-    # First user is always an admin
-    is_first_user = users_col.count_documents({}) == 0
-    users_col.insert_one({
-        'email': email, 
-        'password': bcrypt.generate_password_hash(password).decode('utf-8'),
-        'username': username or email.split('@')[0],
-        'is_admin': is_first_user,
-        'created_at': datetime.utcnow()
-    })
+    try:
+        pw_hash = hash_pool.run(bcrypt.generate_password_hash, password).decode('utf-8')
+    except PoolBusy:
+        return render_template('register.html', error="Server is busy. Please try again shortly."), 503, {'Retry-After': '1'}
+
+    # First user is always an admin (indexed lookup rather than counting every user)
+    is_first_user = not _admin_exists()
+    try:
+        users_col.insert_one({
+            'email': email, 
+            'password': pw_hash,
+            'username': username or email.split('@')[0],
+            'is_admin': is_first_user,
+            'created_at': datetime.utcnow()
+        })
+    except DuplicateKeyError:
+        return render_template('register.html', error="User already exists.")
     return redirect(url_for('login', msg="Registration successful! Please login."))
 
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    print(f"📊 Dashboard opened for {current_user.email}")
+    log.info("Dashboard opened", extra={"user": current_user.email, "sample_rate": LOG_SAMPLE_RATE})
     display_name = getattr(current_user, 'username', None) or current_user.email
     return render_template('index.html', user=display_name)
 
@@ -509,91 +661,213 @@ def analysis_page():
     except Exception:
         return render_template('analysis.html', user='')
 
+def _summary_data(email: str, settings: dict, now: Optional[datetime] = None):
+    """Current-month KPIs plus all-time category totals, from a single pass over the user's expenses"""
+    now = now or datetime.now()
+    start, end = _month_bounds(now)
+
+    # Fetch user expenses and filter by current month
+    expenses = []
+    all_time: Dict[str, float] = {}
+    for x in expenses_col.find({"user": email}, SUMMARY_PROJECTION):
+        amount = float(x.get('amount') or 0)
+        cat = x.get('category') or 'Misc'
+        all_time[cat] = all_time.get(cat, 0.0) + amount
+        try:
+            d = _parse_doc_date(x.get('date'))
+        except Exception:
+            d = now
+        if start <= d < end:
+            expenses.append({
+                'date': d,
+                'category': cat,
+                'amount': amount,
+                'filename': x.get('filename')
+            })
+
+    total_spend = sum(e['amount'] for e in expenses)
+    # Top categories
+    cat_tot = {}
+    for e in expenses:
+        cat_tot[e['category']] = cat_tot.get(e['category'], 0.0) + float(e['amount'] or 0)
+    top = sorted([{ 'category': k, 'total': v } for k, v in cat_tot.items()], key=lambda x: -x['total'])[:3]
+
+    # Budget
+    budget = float(settings.get('monthly_budget') or 0)
+    net_balance = (budget - total_spend) if budget else None
+    pct = (total_spend / budget * 100.0) if budget else None
+
+    # Recent activity
+    recent = sorted(expenses, key=lambda x: x['date'], reverse=True)[:10]
+    recent = [{
+        'date': r['date'].strftime('%Y-%m-%d %H:%M'),
+        'category': r['category'],
+        'amount': r['amount'],
+        'filename': r.get('filename')
+    } for r in recent]
+
+    summary = {
+        'period': {
+            'start': start.strftime('%Y-%m-%d'),
+            'end': (end).strftime('%Y-%m-%d')
+        },
+        'total_spend': total_spend,
+        'top_categories': top,
+        'budget': {'amount': budget, 'percent_used': pct},
+        'net_balance': net_balance,
+        'recent': recent
+    }
+    grouped = sorted(all_time.items(), key=lambda kv: -kv[1])
+    return summary, {'categories': [k for k, _ in grouped], 'totals': [v for _, v in grouped]}
+
+def _recent_chats(email: str, limit: int) -> List[Dict[str, Any]]:
+    """The user's last `limit` chat documents, oldest first, including ones not yet flushed"""
+    stored = list(chats_col.find({"user": email}, {"role": 1, "text": 1, "date": 1}).sort("date", -1).limit(limit))
+    stored.reverse()
+    seen = {d["_id"] for d in stored}
+    pending = [d for d in write_behind.pending("chats", lambda d: d.get("user") == email) if d["_id"] not in seen]
+    return (stored + pending)[-limit:]
+
+def _chat_history(email: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """The user's last `limit` chat messages, oldest first"""
+    return [{"role": x.get("role"), "text": x.get("text"), "date": x.get("date")} for x in _recent_chats(email, limit)]
+
+def _announcements(limit: int = 5) -> List[Dict[str, Any]]:
+    from firestore_utils import db
+
+    with track('firestore', 'stream'):
+        announcements = list(db.collection('updates_and_announcements').stream())
+    result = []
+    for ann in announcements:
+        data = ann.to_dict()
+        data['id'] = ann.id
+        # Skip the _initial document
+        if data.get('id') == '_initial':
+            continue
+        # Convert Firestore timestamp to string if it exists
+        if 'created_at' in data and hasattr(data['created_at'], 'isoformat'):
+            data['created_at'] = data['created_at'].isoformat()
+        result.append(data)
+    # Most recent first
+    return sorted(result, key=lambda x: x.get('created_at', ''), reverse=True)[:limit]
+
+def _faqs() -> List[Dict[str, Any]]:
+    from firestore_utils import db
+
+    with track('firestore', 'stream'):
+        faqs = list(db.collection('faq_content').stream())
+    result = []
+    for faq in faqs:
+        data = faq.to_dict()
+        data['id'] = faq.id
+        if data.get('id') == '_initial':
+            continue
+        result.append(data)
+    return sorted(result, key=lambda x: x.get('order', 0))
+
+def _push_change(email: str, kind: str, expense: Optional[dict] = None):
+    """Send the user's open dashboards the refreshed summary and category totals"""
+    def build():
+        # The same helper as /api/summary and /api/dashboard, so pushed totals key categories identically
+        summary, categories = _summary_data(email, _get_user_settings(email))
+        change = {
+            'kind': kind,
+            'summary': summary,
+            'categories': categories,
+            'version': _get_data_version(email)
+        }
+        if expense:
+            change['expense'] = {k: expense.get(k) for k in ('date', 'category', 'amount', 'merchant')}
+        return change
+    live.publish(email, 'change', build)
+
 @app.route('/api/summary')
 @login_required
 def api_summary():
     try:
-        now = datetime.now()
-        start, end = _month_bounds(now)
+        etag = _api_etag(current_user.email)
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
+        summary, _ = _summary_data(current_user.email, _get_user_settings(current_user.email))
+        return _revalidatable(jsonify(summary), etag)
+    except Exception:
+        log.exception('api_summary error')
+        return jsonify({'error': 'Unable to compute summary'}), 500
 
-        # Fetch user expenses and filter by current month
-        cursor = expenses_col.find({"user": current_user.email})
-        expenses = []
-        for x in cursor:
+@app.route('/api/dashboard')
+@login_required
+def api_dashboard():
+    """Everything the dashboard renders on load, gathered concurrently in one response"""
+    email = current_user.email
+
+    # Each part runs on the pool in a copy of this request's context (metrics, request id)
+    def submit(fn, *args):
+        return dashboard_pool.submit(contextvars.copy_context().run, fn, *args)
+
+    def collect(futures: Dict[str, Any]):
+        for name, fut in futures.items():
             try:
-                d = _parse_doc_date(x.get('date'))
+                payload[name] = fut.result(timeout=30)
             except Exception:
-                d = now
-            if start <= d < end:
-                expenses.append({
-                    'date': d,
-                    'category': x.get('category') or 'Misc',
-                    'amount': float(x.get('amount') or 0),
-                    'filename': x.get('filename')
-                })
+                log.exception('Dashboard part failed', extra={'part': name})
+                payload[name] = None
+                payload['errors'].append(name)
+
+    # The shared feeds are usually served from the process cache; with them and
+    # the user's data version the validator is known before touching Mongo
+    payload: Dict[str, Any] = {'errors': []}
+    collect({name: submit(_cached_feed, name, loader)
+             for name, loader in (('announcements', _announcements), ('faqs', _faqs))})
+    feed_tags = [payload[n][1] if payload[n] else '-' for n in ('announcements', 'faqs')]
+    for n in ('announcements', 'faqs'):
+        payload[n] = payload[n][0] if payload[n] else None
+    etag = hashlib.sha1('|'.join([_api_etag(email)] + feed_tags).encode()).hexdigest()[:24]
+    if not payload['errors'] and request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+
+    settings = _get_user_settings(email)
+    collect({'summary': submit(_summary_data, email, settings), 'history': submit(_chat_history, email)})
+    if payload['summary'] is not None:
+        payload['summary'], payload['categories'] = payload['summary']
+    else:
+        payload['categories'] = None
 
-        total_spend = sum(e['amount'] for e in expenses)
-        # Top categories
-        cat_tot = {}
-        for e in expenses:
-            cat_tot[e['category']] = cat_tot.get(e['category'], 0.0) + float(e['amount'] or 0)
-        top = sorted([{ 'category': k, 'total': v } for k, v in cat_tot.items()], key=lambda x: -x['total'])[:3]
+    return _revalidatable(jsonify(payload), etag)
 
-        # Budget
-        settings = _get_user_settings(current_user.email)
-        budget = float(settings.get('monthly_budget') or 0)
-        net_balance = (budget - total_spend) if budget else None
-        pct = (total_spend / budget * 100.0) if budget else None
-
-        # Recent activity
-        recent = sorted(expenses, key=lambda x: x['date'], reverse=True)[:10]
-        recent = [{
-            'date': r['date'].strftime('%Y-%m-%d %H:%M'),
-            'category': r['category'],
-            'amount': r['amount'],
-            'filename': r.get('filename')
-        } for r in recent]
-
-        return jsonify({
-            'period': {
-                'start': start.strftime('%Y-%m-%d'),
-                'end': (end).strftime('%Y-%m-%d')
-            },
-            'total_spend': total_spend,
-            'top_categories': top,
-            'budget': {'amount': budget, 'percent_used': pct},
-            'net_balance': net_balance,
-            'recent': recent
-        })
-    except Exception:
-        print('❌ api_summary error:', traceback.format_exc())
-        return jsonify({'error': 'Unable to compute summary'}), 500
+@app.route('/api/events')
+@login_required
+def api_events():
+    """Server-Sent Events stream of the user's data changes.
+
+    Long-lived: run under threaded or gevent gunicorn workers, not sync ones.
+    """
+    stream = live.stream(current_user.email, hello={'version': current_user.data_version})
+    if stream is None:
+        return jsonify({'error': 'Too many open live connections'}), 429
+    resp = Response(stream, mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'  # let nginx pass events through unbuffered
+    return resp
 
 @app.route('/api/analysis')
 @login_required
 def api_analysis():
     try:
+        etag = _api_etag(current_user.email)
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
         # Parse range
-        q_start = request.args.get('start')
-        q_end = request.args.get('end')
         now = datetime.now()
-        if q_start and q_end:
-            try:
-                start = datetime.strptime(q_start, '%Y-%m-%d')
-                end = datetime.strptime(q_end, '%Y-%m-%d')
-            except Exception:
-                start, end = _month_bounds(now)
-        else:
-            start, end = _month_bounds(now)
+        start, end = _request_range(now)
 
         # Load all for user and filter by date
         items = []
-        for x in expenses_col.find({"user": current_user.email}):
+        for x in expenses_col.find({"user": current_user.email}, SUMMARY_PROJECTION):
             d = _parse_doc_date(x.get('date'))
             if start <= d < end:
                 items.append({
                     'date': d,
-                    'merchant': (x.get('text') or '').split('\n', 1)[0][:40],
+                    'merchant': x.get('merchant') or '',
                     'category': x.get('category') or 'Misc',
                     'amount': float(x.get('amount') or 0)
                 })
@@ -611,25 +885,12 @@ def api_analysis():
             by_cat[e['category']] = by_cat.get(e['category'], 0.0) + e['amount']
         cat_breakdown = [{'category': k, 'total': v} for k, v in sorted(by_cat.items(), key=lambda x: -x[1])]
 
-        # AI-ish insights (heuristics)
-        insights = []
-        if cat_breakdown:
-            vals = [c['total'] for c in cat_breakdown]
-            avg = sum(vals) / len(vals)
-            top = cat_breakdown[0]
-            if avg and top['total'] > avg * 1.25:
-                insights.append(f"Spending {((top['total']/avg)-1)*100:.0f}% above category average in {top['category']} this period.")
-        # Forecast vs budget
+        # Insights from the vectorised analytics engine (trends, anomalies, forecast),
+        # as of the last day of the requested range; earlier history is their baseline
         settings = _get_user_settings(current_user.email)
         budget = float(settings.get('monthly_budget') or 0)
-        if budget:
-            days = max((end - start).days, 1)
-            spent = sum(e['amount'] for e in items)
-            today_index = max((min(now, end) - start).days, 1)
-            daily = spent / max(today_index, 1)
-            forecast = daily * days
-            if forecast > budget:
-                insights.append(f"At this rate, you may exceed your budget by ₹{forecast - budget:.0f}.")
+        stats = _spending_analytics(current_user.email, budget, as_of=(end - timedelta(days=1)).date())
+        insights = insights_text(stats) if stats else []
 
         table = [{
             'date': e['date'].strftime('%Y-%m-%d'),
@@ -638,32 +899,29 @@ def api_analysis():
             'amount': e['amount']
         } for e in sorted(items, key=lambda x: x['date'], reverse=True)]
 
-        return jsonify({
+        return _revalidatable(jsonify({
             'range': { 'start': start.strftime('%Y-%m-%d'), 'end': end.strftime('%Y-%m-%d') },
             'trend': trend,
             'by_category': cat_breakdown,
             'table': table,
-            'insights': insights
-        })
+            'insights': insights,
+            'analytics': stats
+        }), etag)
     except Exception:
-        print('❌ api_analysis error:', traceback.format_exc())
+        log.exception('api_analysis error')
         return jsonify({'error': 'Unable to compute analysis'}), 500
 
 @app.route('/upload', methods=['POST'])
 @login_required
 def upload_receipt():
-    print("🟢 /upload route triggered")
-
     # Check if the post request has the file part
     if 'file' not in request.files:
-        print("❌ No file part in request")
         return jsonify({'success': False, 'error': 'No file part in request'}), 400
 
     file = request.files['file']
     
     # If user does not select file, browser also submit an empty part without filename
     if file.filename == '':
-        print("❌ No selected file")
         return jsonify({'success': False, 'error': 'No selected file'}), 400
 
     # Validate file type
@@ -685,7 +943,6 @@ def upload_receipt():
     # Save the uploaded file
     filepath = os.path.join(upload_dir, filename)
     file.save(filepath)
-    print(f"📁 File saved to: {filepath}")
 
     try:
         text = ""
@@ -695,7 +952,6 @@ def upload_receipt():
                 from pdf2image import convert_from_path
                 import tempfile
                 
-                print("📄 Processing PDF file...")
                 with tempfile.TemporaryDirectory() as temp_dir:
                     # Convert PDF to images
                     images = convert_from_path(
@@ -711,13 +967,14 @@ def upload_receipt():
                         img_path = os.path.join(temp_dir, f'page_{i+1}.jpg')
                         image.save(img_path, 'JPEG', quality=90)
                         # Extract text from each page
-                        page_text = pytesseract.image_to_string(Image.open(img_path))
+                        with track('tesseract', 'image_to_string'):
+                            page_text = pytesseract.image_to_string(Image.open(img_path))
                         text += f"--- Page {i+1} ---\n{page_text}\n\n"
                         
-                    print(f"✅ Processed {len(images)} pages from PDF")
+                    log.debug("Processed PDF pages", extra={"pages": len(images)})
                     
             except Exception as e:
-                print(f"❌ PDF processing error: {str(e)}")
+                log.warning("PDF processing error", extra={"error": str(e)})
                 return jsonify({
                     'success': False,
                     'error': f'Failed to process PDF: {str(e)}'
@@ -725,55 +982,72 @@ def upload_receipt():
         else:
             # Process image file
             try:
-                print("🖼️ Processing image file...")
-                text = pytesseract.image_to_string(Image.open(filepath))
+                with track('tesseract', 'image_to_string'):
+                    text = pytesseract.image_to_string(Image.open(filepath))
             except Exception as e:
-                print(f"❌ Image processing error: {str(e)}")
+                log.warning("Image processing error", extra={"error": str(e)})
                 return jsonify({
                     'success': False,
                     'error': f'Failed to process image: {str(e)}'
                 }), 500
 
-        print(f"📝 Extracted text length: {len(text)} characters")
-        if text.strip():
-            print("📄 Sample extracted text:", text[:200] + "...")
-        else:
-            print("⚠️ No text was extracted from the file")
+        if not text.strip():
+            log.info("No text extracted from upload", extra={"filetype": file_ext})
 
         # Process the extracted text
         try:
             amount = extract_total_amount(text)
             category = categorize_expense(text)
             assessment, reason, tips = assess_expense(category, amount, text)
-            print(f"✅ Processed - Category: {category}, Amount: {amount}, Assessment: {assessment}")
         except Exception as e:
-            print(f"❌ Error processing extracted text: {traceback.format_exc()}")
+            log.exception('Error processing extracted text')
             return jsonify({
                 'success': False,
                 'error': f'Failed to process receipt data: {str(e)}'
             }), 500
 
-        # Save to database
+        # Check for a probable duplicate before saving (indexed fingerprint lookup)
+        date_str = datetime.now().strftime("%Y-%m-%d %H:%M")
+        fps = fingerprints(amount, date_str, text)
+        policy = _duplicate_policy()
+        dup = find_duplicate(expenses_col, current_user.email, fps) if policy != 'allow' else None
+        if dup and policy == 'reject':
+            return jsonify({
+                'success': False,
+                'error': 'This receipt looks like a duplicate of an existing expense',
+                'duplicate': describe(dup)
+            }), 409
+
+        # Save to database; the OCR text itself lives in the compressed receipt text store
+        text_id = receipt_texts.put(current_user.email, text)
         doc = {
             'user': current_user.email,
             'filename': filename,
             'filetype': 'pdf' if file_ext == '.pdf' else 'image',
             'category': category,
             'amount': amount,
-            'text': text,
-            'date': datetime.now().strftime("%Y-%m-%d %H:%M"),
+            'text_id': text_id,
+            'merchant': extract_merchant(text),
+            'keywords': extract_keywords(text),
+            'date': date_str,
             'uploaded_at': datetime.now(),
             'file_size': os.path.getsize(filepath),
-            'mimetype': file.content_type
+            'mimetype': file.content_type,
+            'fingerprints': fps,
+            'search_prefixes': search_prefixes(category=category, text=text)
         }
+        if dup:
+            doc['duplicate_of'] = dup['_id']
         
         try:
             result = expenses_col.insert_one(doc)
             if not result.inserted_id:
                 raise Exception("Database insertion failed")
-            print(f"💾 Saved to database with ID: {result.inserted_id}")
+            _bump_data_version(current_user.email)
+            _push_change(current_user.email, 'expense_added', doc)
         except Exception as e:
-            print(f"❌ Database error: {str(e)}")
+            log.error("Database error saving receipt", extra={"error": str(e)})
+            receipt_texts.delete([text_id])
             return jsonify({
                 'success': False,
                 'error': 'Failed to save to database'
@@ -787,9 +1061,8 @@ def upload_receipt():
                 {"$sort": {"total": -1}}
             ]
             grouped = list(expenses_col.aggregate(pipeline))
-            print(f"📊 Updated category totals: {grouped}")
         except Exception as e:
-            print(f"⚠️ Could not get updated totals: {str(e)}")
+            log.warning("Could not get updated totals", extra={"error": str(e)})
             grouped = []
 
         # Save last receipt context in session for interactive Q&A
@@ -802,9 +1075,8 @@ def upload_receipt():
                 'tips': tips,
                 'filename': filename
             }
-            print("💾 Saved receipt context to session")
         except Exception as e:
-            print(f"⚠️ Could not save to session: {str(e)}")
+            log.warning("Could not save receipt context to session", extra={"error": str(e)})
 
         return jsonify({
             'success': True,
@@ -817,6 +1089,7 @@ def upload_receipt():
                 'extracted_text': text[:500] + ('...' if len(text) > 500 else '')
             },
             'totals': grouped,
+            'duplicate': describe(dup) if dup else None,
             'assessment': {
                 'category': category,
                 'amount': amount,
@@ -827,7 +1100,7 @@ def upload_receipt():
         })
 
     except Exception as e:
-        print(f"❌ Unexpected error: {traceback.format_exc()}")
+        log.exception('Unexpected upload error')
         return jsonify({
             'success': False,
             'error': f'An unexpected error occurred: {str(e)}'
@@ -837,9 +1110,8 @@ def upload_receipt():
         try:
             if os.path.exists(filepath):
                 os.remove(filepath)
-                print(f"🧹 Cleaned up file: {filepath}")
         except Exception as e:
-            print(f"⚠️ Could not clean up file {filepath}: {str(e)}")
+            log.warning("Could not clean up upload", extra={"path": filepath, "error": str(e)})
             
 
 @app.route('/expenses/add', methods=['POST'])
@@ -867,6 +1139,16 @@ def add_expense_manual():
         text_blob = "\n".join(filter(None, [merchant, note, f"Category: {category}"]))
         assessment, reason, tips = assess_expense(category, amount, text_blob)
 
+        fps = fingerprints(amount, date_str, merchant or note)
+        policy = _duplicate_policy(payload)
+        dup = find_duplicate(expenses_col, current_user.email, fps) if policy != 'allow' else None
+        if dup and policy == 'reject':
+            return jsonify({
+                'success': False,
+                'error': 'This looks like a duplicate of an existing expense',
+                'duplicate': describe(dup)
+            }), 409
+
         doc = {
             'user': current_user.email,
             'filename': None,
@@ -876,14 +1158,26 @@ def add_expense_manual():
             'date': date_str,
             'merchant': merchant,
             'note': note,
-            'created_at': datetime.now()
+            'created_at': datetime.now(),
+            'fingerprints': fps,
+            'search_prefixes': search_prefixes(merchant, note, category)
         }
+        if dup:
+            doc['duplicate_of'] = dup['_id']
+        # Lets a later /expenses/batch replay of the same entry be recognised
+        if CLIENT_ID_RE.match(str(payload.get('client_id') or '')):
+            doc['client_id'] = payload['client_id']
         
         # Insert the document and get the inserted ID
-        result = expenses_col.insert_one(doc)
+        try:
+            result = expenses_col.insert_one(doc)
+        except DuplicateKeyError:
+            return jsonify({'success': True, 'message': 'Expense already saved', 'duplicate': None})
         
         if not result.inserted_id:
             raise Exception("Failed to insert expense")
+        _bump_data_version(current_user.email)
+        _push_change(current_user.email, 'expense_added', doc)
 
         # Get updated category totals
         pipeline = [
@@ -896,6 +1190,7 @@ def add_expense_manual():
             'success': True,
             'message': 'Expense added successfully',
             'data': grouped,
+            'duplicate': describe(dup) if dup else None,
             'assessment': {
                 'label': assessment,
                 'reason': reason,
@@ -905,16 +1200,118 @@ def add_expense_manual():
             }
         })
     except Exception as e:
-        print('❌ add_expense_manual error:', str(e))
+        log.exception('add_expense_manual error')
         return jsonify({
             'success': False,
             'error': str(e) or 'Failed to add expense'
         }), 500
 
+@app.route('/expenses/import', methods=['POST'])
+@login_required
+def import_expenses_file():
+    if 'file' not in request.files or not request.files['file'].filename:
+        return jsonify({'success': False, 'error': 'No file part in request'}), 400
+
+    file = request.files['file']
+    filename = secure_filename(file.filename)
+    fmt = (request.form.get('format') or os.path.splitext(filename)[1].lstrip('.')).lower()
+    if fmt not in ('csv', 'ofx', 'qfx'):
+        return jsonify({'success': False, 'error': 'Unsupported file type. Please upload: .csv, .ofx, .qfx'}), 400
+
+    try:
+        # Decode the upload as a text stream instead of reading it into memory
+        stream = io.TextIOWrapper(file.stream, encoding='utf-8-sig', errors='replace', newline='')
+        records = iter_csv_records(stream) if fmt == 'csv' else iter_ofx_records(stream)
+        report = import_expenses(
+            records,
+            user=current_user.email,
+            expenses_col=expenses_col,
+            categorize=categorize_expense,
+            assess=assess_expense,
+            filename=filename,
+            # 'debit-negative' / 'debit-positive' for a signed amount column; guessed when omitted
+            sign_convention=(request.form.get('sign') or 'auto').lower()
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception:
+        log.exception('Import error')
+        return jsonify({'success': False, 'error': 'Failed to import expenses'}), 500
+
+    if report['imported']:
+        _bump_data_version(current_user.email)
+        _push_change(current_user.email, 'expenses_imported')
+    return jsonify({'success': True, **report})
+
+@app.route('/expenses/batch', methods=['POST'])
+@login_required
+def add_expense_batch():
+    """Idempotent batch ingest for expenses queued offline by the service worker"""
+    payload = request.get_json(silent=True) or {}
+    items = payload.get('expenses')
+    if not isinstance(items, list) or not all(isinstance(it, dict) for it in items):
+        return jsonify({'success': False, 'error': 'Expected {"expenses": [...]}'}), 400
+    if len(items) > MAX_BATCH:
+        return jsonify({'success': False, 'error': f'At most {MAX_BATCH} expenses per batch'}), 413
+
+    try:
+        report = ingest_batch(items, current_user.email, expenses_col,
+                              categorize=categorize_expense, assess=assess_expense)
+    except Exception:
+        log.exception('Batch ingest error')
+        return jsonify({'success': False, 'error': 'Failed to save expenses'}), 500
+
+    if report['created']:
+        _bump_data_version(current_user.email)
+        _push_change(current_user.email, 'expenses_synced')
+    return jsonify({'success': True, **report})
+
+@app.route('/expenses/duplicates', methods=['GET'])
+@login_required
+def find_duplicates():
+    try:
+        # Expenses from before fingerprinting are covered once maintenance.py has backfilled them
+        groups = duplicate_report(expenses_col, current_user.email)
+        return jsonify({'success': True, 'groups': groups})
+    except Exception:
+        log.exception('Duplicate report error')
+        return jsonify({'success': False, 'error': 'Unable to compute duplicates'}), 500
+
+@app.route('/expenses/search', methods=['GET'])
+@login_required
+def search_expenses_api():
+    try:
+        def _num(name):
+            v = request.args.get(name)
+            return float(v) if v not in (None, '') else None
+
+        query, ranked = build_query(
+            current_user.email,
+            request.args.get('q') or '',
+            min_amount=_num('min'),
+            max_amount=_num('max'),
+            start=request.args.get('start') or None,
+            end=request.args.get('end') or None
+        )
+        result = search_expenses(
+            expenses_col, query, ranked,
+            page=int(request.args.get('page') or 1),
+            per_page=int(request.args.get('per_page') or 20)
+        )
+        return jsonify({'success': True, **result})
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Invalid search parameters'}), 400
+    except Exception:
+        log.exception('Search error')
+        return jsonify({'success': False, 'error': 'Search failed'}), 500
+
 @app.route('/expenses/summary')
 @login_required
 def get_expense_summary():
     try:
+        etag = _api_etag(current_user.email)
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
         pipeline = [
             {"$match": {"user": current_user.email}},
             {"$group": {
@@ -925,11 +1322,11 @@ def get_expense_summary():
         ]
         result = list(expenses_col.aggregate(pipeline))
         
-        return jsonify({
+        return _revalidatable(jsonify({
             'success': True,
             'categories': [item['_id'] for item in result],
             'totals': [item['total'] for item in result]
-        })
+        }), etag)
     except Exception as e:
         return jsonify({
             'success': False,
@@ -984,7 +1381,7 @@ def advice():
         elif "receipt" in msg or "bill" in msg:
             last = expenses_col.find_one({"user": current_user.email}, sort=[("_id", -1)])
             if last:
-                a_lbl, a_reason, a_tips = assess_expense(last.get('category'), float(last.get('amount') or 0), last.get('text') or '')
+                a_lbl, a_reason, a_tips = assess_expense(last.get('category'), float(last.get('amount') or 0), text_for(last, receipt_texts))
                 bullets = "\n".join([f"- {t}" for t in (a_tips or [])[:3]])
                 reply = "\n".join([
                     f"Last receipt: {last.get('category')} · ₹{float(last.get('amount') or 0):.0f} — {a_lbl}.",
@@ -1003,27 +1400,30 @@ def advice():
                 if not reply or "error" in reply.lower() or "trouble" in reply.lower():
                     reply = "I'm here to help with your finances. You can ask me about your spending, set budgets, or get savings tips."
             except Exception as e:
-                print(f"LLM generation error: {e}")
+                log.warning("LLM generation error", extra={"error": str(e)})
                 reply = "I'm having trouble generating a response. Please try again later."
         
         # Fallback if both rule-based and LLM failed
         if not reply:
             reply = "I'm not sure how to respond to that. Could you rephrase or ask about your expenses, budget, or savings?"
 
-        # Save conversation to history
+        # Save conversation to history; the insert is written behind the response, but
+        # data_version moves now so a conditional GET of the history sees the new messages
         now = datetime.now().strftime("%Y-%m-%d %H:%M")
         try:
-            chats_col.insert_many([
-                {"user": current_user.email, "role": "user", "text": msg_raw, "date": now},
-                {"user": current_user.email, "role": "ai", "text": reply, "date": now}
-            ])
+            created = datetime.utcnow()  # BSON dates are UTC; the retention TTL index and maintenance.py compare in UTC
+            write_behind.add("chats",
+                {"user": current_user.email, "role": "user", "text": msg_raw, "date": now, "created_at": created},
+                {"user": current_user.email, "role": "ai", "text": reply, "date": now, "created_at": created}
+            )
+            _bump_data_version(current_user.email)
         except Exception as e:
-            print("❌ Chat save error:", str(e))
+            log.error("Chat save error", extra={"error": str(e)})
 
         return jsonify({'reply': reply})
         
     except Exception as e:
-        print("❌ Advice error:", str(e))
+        log.exception('Advice error')
         return jsonify({'error': 'An error occurred while processing your request'}), 500
         return jsonify({'error': 'Unable to generate advice right now.'}), 500
 
@@ -1031,91 +1431,178 @@ def advice():
 @login_required
 def advice_history():
     try:
-        cursor = chats_col.find({"user": current_user.email}).sort("date", 1)
-        msgs = [{"role": x.get("role"), "text": x.get("text"), "date": x.get("date")} for x in cursor]
-        # Return only the last 50 messages
-        msgs = msgs[-50:]
-        return jsonify({"messages": msgs})
+        etag = _api_etag(current_user.email)
+        if request.if_none_match.contains_weak(etag):
+            return _not_modified(etag)
+        return _revalidatable(jsonify({"messages": _chat_history(current_user.email)}), etag)
     except Exception:
-        print("❌ History fetch error:", traceback.format_exc())
+        log.exception('History fetch error')
         return jsonify({"messages": []})
 
+def _render_analysis_pdf(out, email: str, start: datetime, end: datetime, last_receipt: dict):
+    """Query the period and render the analysis report into `out`"""
+    match = _range_match(email, start, end)
+
+    # Fetch grouped totals and per-day trend for the period
+    grouped = list(expenses_col.aggregate([
+        {"$match": match},
+        {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
+        {"$sort": {"total": -1}}
+    ]))
+    trend = [{'date': x['_id'], 'total': float(x.get('total') or 0)} for x in expenses_col.aggregate([
+        {"$match": match},
+        {"$group": {"_id": {"$substrCP": ["$date", 0, 10]}, "total": {"$sum": "$amount"}}},
+        {"$sort": {"_id": 1}}
+    ])]
+
+    # Transactions are streamed from the cursor straight into the table
+    cursor = expenses_col.find(
+        match,
+        {"_id": 0, "date": 1, "merchant": MERCHANT_PROJECTION, "category": 1, "amount": 1}
+    ).sort("date", -1).batch_size(PDF_CURSOR_BATCH_SIZE)
+    rows = ({
+        'date': str(x.get('date') or '')[:16],
+        'merchant': x.get('merchant') or '',
+        'category': x.get('category') or 'Misc',
+        'amount': x.get('amount')
+    } for x in cursor)
+    try:
+        render_analysis_report(
+            out,
+            user=email,
+            period={'start': start.strftime('%Y-%m-%d'), 'end': end.strftime('%Y-%m-%d')},
+            grouped=grouped,
+            trend=trend,
+            rows=rows,
+            settings=_get_user_settings(email),
+            last_receipt=last_receipt
+        )
+    finally:
+        cursor.close()
+
+def _send_cached_pdf(key: str):
+    hit = export_cache.open(key)
+    if not hit:
+        return None
+    chunks, size = hit
+    resp = Response(chunks, mimetype='application/pdf')
+    resp.headers['Content-Length'] = str(size)
+    resp.headers['Content-Disposition'] = 'attachment; filename=analysis.pdf'
+    return resp
+
 @app.route('/export/analysis.pdf', methods=['GET'])
 @login_required
 def export_analysis_pdf():
     try:
-        # Fetch grouped totals
-        grouped = list(expenses_col.aggregate([
-            {"$match": {"user": current_user.email}},
-            {"$group": {"_id": "$category", "total": {"$sum": "$amount"}}},
-            {"$sort": {"total": -1}}
-        ]))
-
-        # Last assessment from session
-        last_ctx = session.get('last_receipt') or {}
-        settings = _get_user_settings(current_user.email)
-
-        buf = io.BytesIO()
-        c = _pdf_canvas.Canvas(buf, pagesize=A4)
-        width, height = A4
-        x_margin = 20 * mm
-        y = height - 25 * mm
-
-        def line(txt, dy=8*mm, size=12, bold=False):
-            nonlocal y
-            c.setFont('Helvetica-Bold' if bold else 'Helvetica', size)
-            c.drawString(x_margin, y, str(txt))
-            y -= dy
-
-        # Title
-        line('AI-Expenses Tracker — Analysis', size=16, bold=True)
-        line(f'User: {current_user.email}', dy=6*mm)
-        line('')
-
-        # Budget/caps
-        mb = settings.get('monthly_budget')
-        if mb:
-            line(f'Monthly Budget: ₹{float(mb):.0f}', dy=6*mm)
-        caps = settings.get('caps') or {}
-        if caps:
-            line('Category Caps:', bold=True)
-            for k, v in caps.items():
-                line(f'- {k}: ₹{float(v or 0):.0f}', dy=6*mm)
-            line('')
-
-        # Summary
-        line('Summary by Category:', bold=True)
-        if grouped:
-            for x in grouped:
-                line(f"- {x.get('_id')}: ₹{float(x.get('total') or 0):.0f}", dy=6*mm)
-        else:
-            line('- No expenses yet', dy=6*mm)
-        line('')
-
-        # Last assessment
-        if last_ctx:
-            line('Last Receipt Assessment:', bold=True)
-            line(f"- Category: {last_ctx.get('category')} · Amount: ₹{float(last_ctx.get('amount') or 0):.0f}", dy=6*mm)
-            line(f"- Label: {last_ctx.get('assessment')} — {last_ctx.get('reason') or ''}", dy=6*mm)
-            tips = last_ctx.get('tips') or []
-            if tips:
-                line('- Tips:', dy=6*mm)
-                for t in tips[:5]:
-                    line(f"  • {t}", dy=6*mm)
-
-        c.showPage()
-        c.save()
-        pdf = buf.getvalue()
-        buf.close()
-
-        resp = make_response(pdf)
-        resp.headers['Content-Type'] = 'application/pdf'
-        resp.headers['Content-Disposition'] = 'attachment; filename=analysis.pdf'
-        return resp
+        email = current_user.email
+        start, end = _export_range(email, datetime.now())
+        key = export_key('analysis.pdf', email, start.strftime('%Y-%m-%d'), end.strftime('%Y-%m-%d'),
+                         _get_data_version(email))
+
+        # Repeated exports of unchanged data are served straight from disk
+        resp = _send_cached_pdf(key)
+        if resp:
+            return resp
+
+        last_receipt = dict(session.get('last_receipt') or {})
+        build = lambda: export_cache.build(key, lambda fh: _render_analysis_pdf(fh, email, start, end, last_receipt))
+
+        # Large reports are generated off the request thread; the client polls for them
+        if request.args.get('async') == '1' or \
+                expenses_col.count_documents(_range_match(email, start, end)) > PDF_BACKGROUND_ROWS:
+            job = export_jobs.submit(key, email, build)
+            status = export_jobs.status(job['key'], email)
+            status['poll'] = url_for('export_job_status', key=key)
+            status['download'] = url_for('export_job_download', key=key)
+            return jsonify(status), 202
+
+        build()
+        return _send_cached_pdf(key) or ('', 500)
     except Exception:
-        print('❌ Export PDF error:', traceback.format_exc())
+        log.exception('Export PDF error')
         return ('', 500)
 
+def _export_range(email: str, now: datetime):
+    """?start=&end= when given; otherwise all of the user's expenses, the report's default scope"""
+    if request.args.get('start') and request.args.get('end'):
+        return _request_range(now)
+    dated = {"user": email, "date": {"$regex": r"^\d{4}-\d{2}-\d{2}"}}
+    first = expenses_col.find_one(dated, {"_id": 0, "date": 1}, sort=[("date", 1)])
+    last = expenses_col.find_one(dated, {"_id": 0, "date": 1}, sort=[("date", -1)])
+    try:
+        start = datetime.strptime(first['date'][:10], '%Y-%m-%d')
+        end = datetime.strptime(last['date'][:10], '%Y-%m-%d') + timedelta(days=1)
+    except (TypeError, ValueError):
+        return _month_bounds(now)
+    return start, end
+
+@app.route('/export/jobs/<key>', methods=['GET'])
+@login_required
+def export_job_status(key):
+    status = export_jobs.status(key, current_user.email)
+    if not status:
+        return jsonify({'error': 'Export not found'}), 404
+    if status['status'] == 'ready':
+        status['download'] = url_for('export_job_download', key=key)
+    return jsonify(status)
+
+@app.route('/export/jobs/<key>/download', methods=['GET'])
+@login_required
+def export_job_download(key):
+    status = export_jobs.status(key, current_user.email)
+    if not status:
+        return jsonify({'error': 'Export not found'}), 404
+    if status['status'] == 'expired':
+        return jsonify({'error': 'Export expired, please request it again'}), 410
+    if status['status'] != 'ready':
+        return jsonify(status), 409
+    return _send_cached_pdf(key) or (jsonify({'error': 'Export expired, please request it again'}), 410)
+
+@app.route('/export/expenses.<fmt>', methods=['GET'])
+@login_required
+def export_expenses(fmt):
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({'error': 'Unsupported export format. Use csv, jsonl or parquet'}), 404
+    try:
+        batch_size = min(max(int(request.args.get('batch_size') or EXPORT_BATCH_SIZE), 100), 10000)
+    except ValueError:
+        return jsonify({'error': 'Invalid batch_size'}), 400
+
+    email = current_user.email
+    if request.args.get('start') and request.args.get('end'):
+        start, end = _request_range(datetime.now())
+        query = _range_match(email, start, end)
+    else:
+        query = {"user": email}
+
+    fields = list(EXPORT_FIELDS)
+    projection = dict(EXPORT_PROJECTION)
+    if request.args.get('include_text') == '1':
+        fields.append('text')
+        projection['text'] = 1
+        projection['text_id'] = 1
+
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return jsonify({'error': 'Parquet export is not available on this server'}), 501
+
+    # The cursor is consumed lazily by the response generator, one batch at a time
+    cursor = expenses_col.find(query, projection).sort("date", 1).batch_size(batch_size)
+    docs = receipt_texts.attach(cursor, batch=batch_size) if 'text' in fields else cursor
+    if fmt == 'csv':
+        body = iter_csv(docs, fields)
+    elif fmt == 'jsonl':
+        body = iter_jsonl(docs, fields)
+    else:
+        body = iter_parquet(docs, fields)
+
+    resp = Response(body, mimetype=EXPORT_MIMETYPES[fmt])
+    resp.headers['Content-Disposition'] = f'attachment; filename=expenses.{fmt}'
+    resp.call_on_close(cursor.close)
+    return resp
+
 @app.route('/settings/budget', methods=['POST'])
 @login_required
 def set_budget():
@@ -1134,10 +1621,11 @@ def set_budget():
         settings = _get_user_settings(current_user.email)
         settings['monthly_budget'] = val
         _save_user_settings(current_user.email, settings)
+        _push_change(current_user.email, 'budget_updated')
 
         return jsonify({'message': 'Monthly budget updated', 'budget': val})
     except Exception:
-        print('❌ Set budget error:', traceback.format_exc())
+        log.exception('Set budget error')
         return jsonify({'error': 'Failed to update budget'}), 500
 
 @app.route('/clear_data', methods=['POST'])
@@ -1145,14 +1633,20 @@ def set_budget():
 def clear_data():
     try:
         e_res = expenses_col.delete_many({"user": current_user.email})
+        # Queued chat messages must land before the delete, not after it
+        write_behind.flush()
         c_res = chats_col.delete_many({"user": current_user.email})
+        chat_summaries_col.delete_one({"user": current_user.email})
+        receipt_texts.delete_for_user(current_user.email)
+        _bump_data_version(current_user.email)
+        _push_change(current_user.email, 'data_cleared')
         return jsonify({
             "deleted_expenses": getattr(e_res, 'deleted_count', 0),
             "deleted_chats": getattr(c_res, 'deleted_count', 0),
             "message": "Your data has been cleared."
         })
     except Exception:
-        print("❌ Clear data error:", traceback.format_exc())
+        log.exception('Clear data error')
         return jsonify({"error": "Failed to clear data"}), 500
 
 @app.route('/delete_last', methods=['POST'])
@@ -1164,6 +1658,9 @@ def delete_last():
             return jsonify({"message": "No expenses to delete.", "data": []})
 
         expenses_col.delete_one({"_id": last["_id"]})
+        receipt_texts.delete([last.get("text_id")])
+        _bump_data_version(current_user.email)
+        _push_change(current_user.email, 'expense_deleted', last)
 
         pipeline = [
             {"$match": {"user": current_user.email}},
@@ -1181,14 +1678,17 @@ def delete_last():
             "data": grouped
         })
     except Exception:
-        print("❌ Delete last error:", traceback.format_exc())
+        log.exception('Delete last error')
         return jsonify({"error": "Failed to delete last expense"}), 500
 
 
+def _is_admin() -> bool:
+    return current_user.is_authenticated and current_user.is_admin
+
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated or not current_user.is_admin:
+        if not _is_admin():
             return redirect(url_for('login'))
         return f(*args, **kwargs)
     return decorated_function
@@ -1199,6 +1699,23 @@ def admin_required(f):
 def admin_dashboard():
     return render_template('admin.html', user=current_user.username or current_user.email)
 
+@app.route('/api/admin/slow-requests')
+@login_required
+@admin_required
+def admin_slow_requests():
+    limit = min(request.args.get('limit', 20, type=int), 200)
+    return jsonify(slow_requests.slowest(limit))
+
+@app.route('/api/admin/profiles/<name>')
+@login_required
+@admin_required
+def admin_profile(name):
+    fmt = request.args.get('format', 'svg')
+    if fmt not in ('svg', 'folded', 'json'):
+        abort(404)
+    return send_from_directory(os.path.abspath(PROFILE_DIR), f"{secure_filename(name)}.{fmt}",
+                               mimetype={'svg': 'image/svg+xml', 'folded': 'text/plain', 'json': 'application/json'}[fmt])
+
 @app.route('/api/admin/updates', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -1365,7 +1882,23 @@ def reorder_faqs():
 @app.route('/logout')
 def logout():
     logout_user()
-    return redirect(url_for('login'))
+    resp = redirect(url_for('login'))
+    # Drop per-user API responses cached by the browser and service worker
+    resp.headers['Clear-Site-Data'] = '"cache"'
+    return resp
+
+
+@app.context_processor
+def inject_cache_scope():
+    return {'cache_scope': _cache_scope(current_user) if current_user.is_authenticated else ''}
+
+
+@app.after_request
+def clear_feed_cache(response):
+    # Announcement/FAQ edits made through the admin API show up immediately on this worker
+    if request.path.startswith('/api/admin/') and request.method != 'GET' and response.status_code < 400:
+        _feed_cache.clear()
+    return response
 
 
 @app.after_request
@@ -1389,45 +1922,20 @@ def get_announcements():
         return response
         
     try:
-        # Get the Firestore client from firestore_utils
-        from firestore_utils import db
-        
-        # Query the updates_and_announcements collection
-        announcements_ref = db.collection('updates_and_announcements')
-        
-        # Get all documents and process them
-        announcements = announcements_ref.stream()
-        
-        # Convert to list of dicts
-        result = []
-        for ann in announcements:
-            data = ann.to_dict()
-            data['id'] = ann.id
-            
-            # Skip the _initial document
-            if data.get('id') == '_initial':
-                continue
-                
-            # Convert Firestore timestamp to string if it exists
-            if 'created_at' in data and hasattr(data['created_at'], 'isoformat'):
-                data['created_at'] = data['created_at'].isoformat()
-                
-            result.append(data)
-        
-        # Sort by created_at in descending order and limit to 5
-        result = sorted(result, 
-                       key=lambda x: x.get('created_at', ''), 
-                       reverse=True)[:5]
-        
-        response = jsonify(result)
+        result, etag = _cached_feed('announcements', _announcements)
+        if request.if_none_match.contains_weak(etag):
+            response = _not_modified(etag)
+        else:
+            response = jsonify(result)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+
         response.headers.add('Access-Control-Allow-Origin', request.headers.get('Origin', '*'))
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
         
     except Exception as e:
-        print(f"Error fetching announcements: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception('Error fetching announcements')
         response = jsonify({
             "error": "Failed to fetch announcements",
             "details": str(e)
@@ -1451,39 +1959,20 @@ def get_faqs():
         return response
         
     try:
-        # Get the Firestore client from firestore_utils
-        from firestore_utils import db
-        
-        # Query the faq_content collection
-        faqs_ref = db.collection('faq_content')
-        
-        # Get all documents and process them
-        faqs = faqs_ref.stream()
-        
-        # Convert to list of dicts
-        result = []
-        for faq in faqs:
-            data = faq.to_dict()
-            data['id'] = faq.id
-            
-            # Skip the _initial document
-            if data.get('id') == '_initial':
-                continue
-                
-            result.append(data)
-        
-        # Sort by order field if it exists
-        result = sorted(result, key=lambda x: x.get('order', 0))
-        
-        response = jsonify(result)
+        result, etag = _cached_feed('faqs', _faqs)
+        if request.if_none_match.contains_weak(etag):
+            response = _not_modified(etag)
+        else:
+            response = jsonify(result)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+
         response.headers.add('Access-Control-Allow-Origin', request.headers.get('Origin', '*'))
         response.headers.add('Access-Control-Allow-Credentials', 'true')
         return response
         
     except Exception as e:
-        print(f"Error fetching FAQs: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception('Error fetching FAQs')
         response = jsonify({
             "error": "Failed to fetch FAQs",
             "details": str(e)
@@ -0,0 +1,185 @@
+"""Static asset build: bundle, minify, fingerprint and precompress static/.
+
+    python assets.py          # build into static/dist
+    python assets.py --clean  # remove the build output
+
+Every output is written as <name>.<hash>.<ext> with .gz (and, when brotli is
+installed, .br) siblings, and static/dist/manifest.json maps logical names to
+them. init_app() makes url_for('static', filename=...) resolve through that
+manifest, serves the precompressed sibling the client accepts and marks
+fingerprinted files immutable. static/dist/precache-manifest.js lists the
+build output for the service worker, whose cache version is the build hash.
+
+Without a build everything is served from the source files as before.
+"""
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import sys
+
+from response_encoding import brotli, compress, negotiate
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+PRECACHE = 'precache-manifest.js'
+
+# Concatenated in order; style.css first so its @import rules stay at the top
+BUNDLES: Dict[str, List[str]] = {
+    'app.css': ['style.css', 'animations.css', 'theme.css'],
+}
+# Fingerprinted one-to-one. sw.js keeps a fixed URL (it is the registration
+# URL) and so does manifest.json (the browser re-reads it by URL).
+FILES = ['script.js', 'admin.js', 'admin.css', 'firebase-config.js', 'expense-queue.js']
+
+HASHED_RE = re.compile(r'\.[0-9a-f]{10}\.\w+$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+ENCODINGS = {'br': '.br', 'gzip': '.gz'}
+
+
+def minify_css(text: str) -> str:
+    try:
+        import rcssmin
+        return rcssmin.cssmin(text)
+    except ImportError:
+        pass
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    # Not around ':' — `.a :hover` and `.a:hover` are different selectors
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text: str) -> str:
+    # No safe regex minifier for JS (template literals, regex literals, ASI);
+    # without rjsmin the file is only fingerprinted and precompressed
+    try:
+        import rjsmin
+        return rjsmin.jsmin(text)
+    except ImportError:
+        return text
+
+
+def _read(static_dir: str, name: str) -> str:
+    with open(os.path.join(static_dir, name), encoding='utf-8') as fh:
+        return fh.read()
+
+
+def _fingerprinted(name: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def build(static_dir: str = STATIC_DIR, url_prefix: str = '/static') -> Dict[str, Any]:
+    """Write the bundles and files into static/dist; returns the manifest"""
+    out_dir = os.path.join(static_dir, DIST)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+
+    sources = {name: '\n'.join(_read(static_dir, s) for s in parts) for name, parts in BUNDLES.items()}
+    sources.update({name: _read(static_dir, name) for name in FILES})
+
+    files: Dict[str, str] = {}
+    sizes: Dict[str, Dict[str, int]] = {}
+    for name, text in sources.items():
+        minified = minify_css(text) if name.endswith('.css') else minify_js(text)
+        data = minified.encode('utf-8')
+        target = _fingerprinted(name, data)
+        path = os.path.join(out_dir, target)
+        with open(path, 'wb') as fh:
+            fh.write(data)
+        sizes[name] = {'source': len(text.encode('utf-8')), 'minified': len(data)}
+        for encoding, suffix in ENCODINGS.items():
+            if encoding == 'br' and brotli is None:
+                continue
+            packed = compress(data, encoding, gzip_level=9, brotli_quality=11)
+            with open(path + suffix, 'wb') as fh:
+                fh.write(packed)
+            sizes[name][encoding] = len(packed)
+        files[name] = f"{DIST}/{target}"
+
+    version = hashlib.sha256(json.dumps(files, sort_keys=True).encode()).hexdigest()[:10]
+    manifest = {'version': version, 'files': files, 'bundles': BUNDLES, 'sizes': sizes}
+    with open(os.path.join(out_dir, MANIFEST), 'w') as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+
+    precache = {'version': version, 'assets': sorted(f"{url_prefix}/{p}" for p in files.values())}
+    with open(os.path.join(out_dir, PRECACHE), 'w') as fh:
+        fh.write("// Generated by assets.py; do not edit\n")
+        fh.write(f"self.__PRECACHE_MANIFEST = {json.dumps(precache, indent=2)};\n")
+    return manifest
+
+
+def load_manifest(static_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(static_dir, DIST, MANIFEST)) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def init_app(app):
+    """Route url_for('static') through the build manifest and serve dist/ precompressed and immutable"""
+    from flask import request, send_from_directory, url_for
+
+    manifest = load_manifest(app.static_folder)
+    files: Dict[str, str] = manifest['files'] if manifest else {}
+    app.extensions['assets'] = manifest
+
+    @app.url_defaults
+    def _fingerprint(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in files:
+            values['filename'] = files[values['filename']]
+
+    @app.context_processor
+    def _asset_helpers():
+        def bundle_urls(name: str) -> List[str]:
+            """The built bundle, or its source files when there is no build"""
+            if name in files:
+                return [url_for('static', filename=name)]
+            return [url_for('static', filename=src) for src in BUNDLES[name]]
+        return {'bundle_urls': bundle_urls}
+
+    static_view = app.view_functions['static']
+
+    def static_file(filename):
+        if not filename.startswith(DIST + '/') or not HASHED_RE.search(filename):
+            return static_view(filename=filename)
+        encoding = negotiate(request.accept_encodings)
+        packed = filename + ENCODINGS[encoding] if encoding else None
+        if packed and os.path.isfile(os.path.join(app.static_folder, packed)):
+            response = send_from_directory(app.static_folder, packed,
+                                           mimetype=mimetypes.guess_type(filename)[0])
+            response.headers['Content-Encoding'] = encoding
+        else:
+            response = static_view(filename=filename)
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = IMMUTABLE
+        return response
+
+    app.view_functions['static'] = static_file
+    return manifest
+
+
+def main(argv):
+    if '--clean' in argv:
+        shutil.rmtree(os.path.join(STATIC_DIR, DIST), ignore_errors=True)
+        print("Removed static/dist")
+        return 0
+    manifest = build()
+    print(f"Built static/dist (version {manifest['version']})")
+    for name, path in sorted(manifest['files'].items()):
+        s = manifest['sizes'][name]
+        line = f"  {name:<20} -> {path:<36}{s['source']:>8,} -> {s['minified']:>8,} B, gzip {s['gzip']:>7,}"
+        if 'br' in s:
+            line += f", br {s['br']:>7,}"
+        print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
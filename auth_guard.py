@@ -0,0 +1,101 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Tuple
+import threading
+import time
+
+
+class PoolBusy(Exception):
+    """Raised when the hashing pool's queue is full or a hash waited past its timeout"""
+
+
+class HashPool:
+    """Bounded pool for CPU-bound password hashing.
+
+    At most `workers` hashes run at once and at most `max_queue` more may
+    wait; anything beyond that is rejected immediately so a burst of logins
+    cannot tie up every request thread.
+    """
+
+    def __init__(self, workers: int, max_queue: int, timeout: float = 10.0):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self.timeout = timeout
+
+    def run(self, fn: Callable[..., Any], *args) -> Any:
+        if not self._slots.acquire(blocking=False):
+            raise PoolBusy()
+        try:
+            fut = self._pool.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        fut.add_done_callback(lambda _: self._slots.release())
+        try:
+            return fut.result(timeout=self.timeout)
+        except FutureTimeout:
+            # Still queued: drop it rather than hash for a caller that has gone
+            fut.cancel()
+            raise PoolBusy()
+
+
+class MemoryBucketStore:
+    """Process-local token bucket state; swap for a shared store when running many workers"""
+
+    def __init__(self, max_keys: int = 100000):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+        self.max_keys = max_keys
+
+    def take(self, key: str, rate: float, burst: float) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            if len(self._buckets) >= self.max_keys and key not in self._buckets:
+                self._evict(now, rate, burst)
+            self._buckets[key] = (tokens, now)
+            return allowed
+
+    def _evict(self, now: float, rate: float, burst: float):
+        # Drop buckets that have refilled completely; they carry no state
+        full = [k for k, (t, last) in self._buckets.items() if t + (now - last) * rate >= burst]
+        for k in full:
+            del self._buckets[k]
+
+
+class RedisBucketStore:
+    """Token buckets held in Redis so all workers share the same limits"""
+
+    _SCRIPT = """
+    local b = redis.call('HMGET', KEYS[1], 't', 'ts')
+    local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local t = tonumber(b[1]) or burst
+    local ts = tonumber(b[2]) or now
+    t = math.min(burst, t + (now - ts) * rate)
+    local ok = 0
+    if t >= 1 then t = t - 1; ok = 1 end
+    redis.call('HSET', KEYS[1], 't', t, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return ok
+    """
+
+    def __init__(self, url: str):
+        import redis
+        self._r = redis.Redis.from_url(url)
+        self._take = self._r.register_script(self._SCRIPT)
+
+    def take(self, key: str, rate: float, burst: float) -> bool:
+        return bool(self._take(keys=[f"rl:{key}"], args=[rate, burst, time.time()]))
+
+
+class RateLimiter:
+    def __init__(self, store, per_minute: float, burst: float):
+        self.store = store
+        self.rate = per_minute / 60.0
+        self.burst = burst
+
+    def allow(self, key: str) -> bool:
+        return self.store.take(key, self.rate, self.burst)
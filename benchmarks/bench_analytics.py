@@ -0,0 +1,51 @@
+"""Benchmark the spending analytics engine over several years of daily rollups.
+
+Usage: python benchmarks/bench_analytics.py [years] [iterations]
+"""
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from analytics import analyze, build_rollup
+
+CATEGORIES = ["Food", "Travel", "Entertainment", "Bills", "Shopping", "Health", "Misc"]
+
+
+def synthetic_rollup(start: date, today: date):
+    rnd = random.Random(7)
+    d = start
+    while d <= today:
+        for c in CATEGORIES:
+            if rnd.random() < 0.6:
+                yield {'_id': {'d': d.isoformat(), 'c': c}, 'total': round(rnd.uniform(50, 1500), 2)}
+        d += timedelta(days=1)
+
+
+def main():
+    years = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    today = date.today()
+    start = today - timedelta(days=365 * years)
+    rows = list(synthetic_rollup(start, today))
+
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        categories, matrix = build_rollup(rows, start, today)
+    t_build = (time.perf_counter() - t0) / iterations
+
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        analyze(matrix, categories, start, today, budget=40000)
+    t_analyze = (time.perf_counter() - t0) / iterations
+
+    print(f"rollup_rows={len(rows)} days={matrix.shape[0]} "
+          f"build={t_build * 1000:.2f}ms analyze={t_analyze * 1000:.2f}ms "
+          f"total={(t_build + t_analyze) * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Serialisation time and bytes-on-wire for a large /api/analysis response.
+
+Compares Flask's default json provider against OrjsonProvider, then the
+size and cost of gzip and brotli encoding at the levels the app uses.
+
+Usage: python benchmarks/bench_json_compression.py [rows] [iterations]
+"""
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from response_encoding import OrjsonProvider, brotli, compress, orjson
+
+CATEGORIES = ["Food", "Travel", "Entertainment", "Bills", "Shopping", "Health", "Misc"]
+MERCHANTS = ["Big Bazaar", "Swiggy", "Uber", "Amazon", "Apollo Pharmacy", "PVR", "Airtel", "Zomato", "IRCTC"]
+
+
+def analysis_payload(rows: int):
+    """Same shape as api_analysis: trend, by_category, table, insights"""
+    rnd = random.Random(3)
+    start = date.today() - timedelta(days=365)
+    table = [{
+        'date': (start + timedelta(days=rnd.randint(0, 365))).isoformat(),
+        'merchant': rnd.choice(MERCHANTS),
+        'category': rnd.choice(CATEGORIES),
+        'amount': round(rnd.uniform(20, 5000), 2),
+    } for _ in range(rows)]
+    by_day, by_cat = {}, {}
+    for r in table:
+        by_day[r['date']] = by_day.get(r['date'], 0.0) + r['amount']
+        by_cat[r['category']] = by_cat.get(r['category'], 0.0) + r['amount']
+    return {
+        'range': {'start': start.isoformat(), 'end': date.today().isoformat()},
+        'trend': [{'date': k, 'total': by_day[k]} for k in sorted(by_day)],
+        'by_category': [{'category': k, 'total': v} for k, v in sorted(by_cat.items(), key=lambda x: -x[1])],
+        'table': sorted(table, key=lambda r: r['date'], reverse=True),
+        'insights': ["Food spending is up 18% on last month.", "Projected month-end spend is ₹41,200."],
+    }
+
+
+def timed(fn, iterations: int):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        out = fn()
+    return (time.perf_counter() - t0) / iterations, out
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    app = Flask(__name__)
+    payload = analysis_payload(rows)
+
+    providers = [('flask default', DefaultJSONProvider(app))]
+    if orjson is not None:
+        providers.append(('orjson', OrjsonProvider(app)))
+    else:
+        print("orjson not installed; only the default provider is measured")
+
+    print(f"{rows} table rows, mean of {iterations} runs\n")
+    print(f"{'serialiser':<16}{'ms':>9}{'bytes':>12}")
+    body = None
+    with app.app_context():
+        for name, provider in providers:
+            t, resp = timed(lambda: provider.response(payload).get_data(), iterations)
+            body = resp
+            print(f"{name:<16}{t * 1000:>9.2f}{len(resp):>12,}")
+
+    print(f"\n{'encoding':<16}{'ms':>9}{'bytes':>12}{'ratio':>8}")
+    print(f"{'identity':<16}{0:>9.2f}{len(body):>12,}{1:>8.2f}")
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+    for enc in encodings:
+        t, out = timed(lambda: compress(body, enc), iterations)
+        print(f"{enc:<16}{t * 1000:>9.2f}{len(out):>12,}{len(body) / len(out):>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
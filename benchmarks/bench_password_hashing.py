@@ -0,0 +1,48 @@
+"""Benchmark bcrypt verification throughput (logins/sec) per cost factor and pool size.
+
+Usage: python benchmarks/bench_password_hashing.py [seconds] [rounds ...]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import bcrypt
+
+from auth_guard import HashPool, PoolBusy
+
+
+def logins_per_sec(pw_hash: bytes, workers: int, seconds: float) -> float:
+    pool = HashPool(workers=workers, max_queue=workers * 4)
+    deadline = time.perf_counter() + seconds
+    # Drive the pool from more client threads than workers, as request threads would
+    with ThreadPoolExecutor(max_workers=workers * 2) as clients:
+        def client():
+            n = 0
+            while time.perf_counter() < deadline:
+                try:
+                    pool.run(bcrypt.checkpw, b'correct horse', pw_hash)
+                    n += 1
+                except PoolBusy:
+                    time.sleep(0.001)
+            return n
+        done = sum(f.result() for f in [clients.submit(client) for _ in range(workers * 2)])
+    return done / seconds
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    rounds = [int(r) for r in sys.argv[2:]] or [10, 12]
+    cores = os.cpu_count() or 1
+    for r in rounds:
+        pw_hash = bcrypt.hashpw(b'correct horse', bcrypt.gensalt(rounds=r))
+        single = logins_per_sec(pw_hash, 1, seconds)
+        multi = logins_per_sec(pw_hash, cores, seconds)
+        print(f"rounds={r} 1 worker={single:.1f}/s {cores} workers={multi:.1f}/s "
+              f"per_core={multi / cores:.1f}/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Benchmark the multi-page PDF report engine with a synthetic 10k-row period.
+
+Usage: python benchmarks/bench_pdf_report.py [rows]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pdf_report import render_analysis_report
+
+CATEGORIES = ["Food", "Travel", "Entertainment", "Bills", "Shopping", "Health", "Misc"]
+MERCHANTS = ["Big Bazaar", "Uber", "Netflix", "BESCOM", "Amazon", "Apollo Pharmacy", "Cafe Coffee Day"]
+
+
+def synthetic_rows(n: int, start: datetime):
+    rnd = random.Random(42)
+    for i in range(n):
+        d = start + timedelta(minutes=int(i * 525600 / max(n, 1)))
+        yield {
+            'date': d.strftime('%Y-%m-%d %H:%M'),
+            'merchant': rnd.choice(MERCHANTS),
+            'category': rnd.choice(CATEGORIES),
+            'amount': round(rnd.uniform(20, 5000), 2),
+        }
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    start = datetime(2025, 1, 1)
+    by_day, by_cat = {}, {}
+    for r in synthetic_rows(n, start):
+        by_day[r['date'][:10]] = by_day.get(r['date'][:10], 0.0) + r['amount']
+        by_cat[r['category']] = by_cat.get(r['category'], 0.0) + r['amount']
+    trend = [{'date': k, 'total': by_day[k]} for k in sorted(by_day)]
+    grouped = [{'_id': k, 'total': v} for k, v in sorted(by_cat.items(), key=lambda x: -x[1])]
+
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    os.close(fd)
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    count = render_analysis_report(
+        path, user='bench@example.com',
+        period={'start': '2025-01-01', 'end': '2026-01-01'},
+        grouped=grouped, trend=trend, rows=synthetic_rows(n, start),
+        settings={'monthly_budget': 50000},
+    )
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = os.path.getsize(path)
+    os.remove(path)
+
+    print(f"rows={count} time={elapsed:.2f}s rows/s={count / elapsed:,.0f} "
+          f"peak_mem={peak / 1e6:.1f}MB pdf={size / 1e6:.2f}MB")
+
+
+if __name__ == '__main__':
+    main()
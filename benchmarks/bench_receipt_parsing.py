@@ -0,0 +1,206 @@
+"""Micro-benchmarks for the pure receipt-processing helpers.
+
+Times extract_total_amount, categorize_expense, assess_expense,
+parse_doc_date and month_bounds over a deterministic corpus of OCR-like
+text, reporting ops/sec and per-call allocations (tracemalloc).
+
+Usage:
+    python benchmarks/bench_receipt_parsing.py run                 # print results
+    python benchmarks/bench_receipt_parsing.py save [--baseline F] # store a baseline
+    python benchmarks/bench_receipt_parsing.py compare [--baseline F] [--threshold 0.2]
+
+`compare` exits non-zero when any case is slower than the baseline by more
+than the threshold (default 20%) or allocates noticeably more.
+"""
+from datetime import datetime
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from receipt_parsing import assess_expense, categorize_expense, extract_total_amount, month_bounds, parse_doc_date
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baselines', 'receipt_parsing.json')
+
+ITEMS = ["Paneer Tikka", "Veg Biryani", "Butter Naan", "Coke 500ml", "Paracetamol 650", "Petrol",
+         "Movie Ticket", "Wifi Recharge", "T-Shirt", "Bread", "Milk 1L", "Eggs (12)"]
+NOISE = "~|_'`.,;:!°©®"
+
+
+def short_receipt(rnd: random.Random) -> str:
+    lines = [rnd.choice(["SPICE HUT RESTAURANT", "APOLLO PHARMACY", "BIG BAZAAR", "PVR CINEMAS"]),
+             f"GSTIN 29ABCDE{rnd.randint(1000, 9999)}F1Z5", f"Date: {rnd.randint(1, 28):02d}/06/2025 19:42"]
+    total = 0.0
+    for _ in range(rnd.randint(3, 8)):
+        price = round(rnd.uniform(20, 600), 2)
+        total += price
+        lines.append(f"{rnd.choice(ITEMS):<20}{price:>10.2f}")
+    lines += [f"CGST 2.5% {total * 0.025:.2f}", f"SGST 2.5% {total * 0.025:.2f}",
+              f"Grand Total ₹{total * 1.05:,.2f}", "Thank you! Visit again"]
+    return "\n".join(lines)
+
+
+def noisy_statement(rnd: random.Random, pages: int = 4, rows: int = 60) -> str:
+    out = []
+    for p in range(pages):
+        out.append(f"--- Page {p + 1} ---")
+        out.append("HDFC BANK CREDIT CARD STATEMENT  Card No 4591 XXXX XXXX 2231")
+        for _ in range(rows):
+            noise = ''.join(rnd.choice(NOISE) for _ in range(rnd.randint(0, 3)))
+            out.append(f"{rnd.randint(1, 28):02d}/05/2025 {rnd.choice(ITEMS).upper()}{noise} "
+                       f"REF{rnd.randint(10 ** 9, 10 ** 10)} {rnd.uniform(50, 9000):,.2f} Dr")
+        out.append(f"Page total Rs. {rnd.uniform(10000, 90000):,.2f}")
+    out.append("Amount payable 48,211.50")
+    return "\n".join(out)
+
+
+def number_heavy(rnd: random.Random, n: int = 4000) -> str:
+    # Phone numbers, account numbers and bare figures with no keyword or currency marker
+    parts = []
+    for i in range(n):
+        kind = i % 4
+        if kind == 0:
+            parts.append(str(rnd.randint(10 ** 9, 10 ** 12)))
+        elif kind == 1:
+            parts.append(f"{rnd.randint(1, 999)},{rnd.randint(100, 999)}.{rnd.randint(10, 99)}")
+        elif kind == 2:
+            parts.append(f"{rnd.uniform(0, 10 ** 6):.3f}")
+        else:
+            parts.append(str(rnd.randint(0, 99)))
+    return "\n".join(" ".join(parts[i:i + 12]) for i in range(0, len(parts), 12))
+
+
+def corpus():
+    rnd = random.Random(1234)
+    return {
+        'short': [short_receipt(rnd) for _ in range(50)],
+        'statement': [noisy_statement(rnd) for _ in range(5)],
+        'numbers': [number_heavy(rnd) for _ in range(3)],
+    }
+
+
+def cases():
+    texts = corpus()
+    dates = [f"2025-{m:02d}-{d:02d} {h:02d}:15" for m in range(1, 13) for d in (1, 15, 28) for h in (9, 21)]
+    dates += ["", "not a date", None, "2025-13-40 99:99"]
+    days = [datetime(2025, m, 17) for m in range(1, 13)]
+    out = []
+    for kind, docs in texts.items():
+        out.append((f"extract_total_amount[{kind}]", extract_total_amount, [(t,) for t in docs]))
+        out.append((f"categorize_expense[{kind}]", categorize_expense, [(t,) for t in docs]))
+        cats = [categorize_expense(t) for t in docs]
+        out.append((f"assess_expense[{kind}]", assess_expense,
+                    [(c, float(i * 731 % 7000), t) for i, (c, t) in enumerate(zip(cats, docs))]))
+    out.append(("parse_doc_date", parse_doc_date, [(d,) for d in dates]))
+    out.append(("month_bounds", month_bounds, [(d,) for d in days]))
+    return out
+
+
+def measure(fn, arglist, min_time: float = 0.2, repeat: int = 5):
+    """Best-of-`repeat` ops/sec and mean bytes/blocks allocated per call"""
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            for args in arglist:
+                fn(*args)
+        if time.perf_counter() - t0 >= min_time / repeat:
+            break
+        loops *= 2
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            for args in arglist:
+                fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    calls = loops * len(arglist)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    for args in arglist:
+        fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    stats = tracemalloc.take_snapshot().compare_to(before, 'filename')
+    tracemalloc.stop()
+    blocks = sum(max(s.count_diff, 0) for s in stats)
+    return {
+        'ops_per_sec': round(calls / best, 1),
+        'us_per_op': round(best / calls * 1e6, 3),
+        'peak_kib': round(peak / 1024, 1),
+        'blocks_retained': blocks,
+    }
+
+
+def run():
+    results = {}
+    for name, fn, arglist in cases():
+        results[name] = measure(fn, arglist)
+    return results
+
+
+def print_results(results, baseline=None):
+    header = f"{'case':<36}{'ops/s':>12}{'us/op':>10}{'peak KiB':>10}"
+    print(header + ('  vs baseline' if baseline else ''))
+    for name, r in results.items():
+        line = f"{name:<36}{r['ops_per_sec']:>12,.0f}{r['us_per_op']:>10.2f}{r['peak_kib']:>10.1f}"
+        b = (baseline or {}).get(name)
+        if b:
+            line += f"  {r['ops_per_sec'] / b['ops_per_sec']:.2f}x speed, {r['peak_kib'] - b['peak_kib']:+.1f} KiB"
+        print(line)
+
+
+def main():
+    p = argparse.ArgumentParser(description='Micro-benchmarks for receipt_parsing')
+    p.add_argument('command', nargs='?', choices=['run', 'save', 'compare'], default='run')
+    p.add_argument('--baseline', default=BASELINE)
+    p.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown before compare fails')
+    args = p.parse_args()
+
+    results = run()
+    if args.command == 'run':
+        print_results(results)
+        return 0
+    if args.command == 'save':
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w') as fh:
+            json.dump({'python': platform.python_version(), 'machine': platform.machine(),
+                       'saved_at': datetime.now().isoformat(timespec='seconds'), 'results': results},
+                      fh, indent=2, sort_keys=True)
+        print_results(results)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run `save` first.")
+        return 2
+    with open(args.baseline) as fh:
+        saved = json.load(fh)
+    baseline = saved['results']
+    print(f"Baseline: Python {saved.get('python')} on {saved.get('machine')}, saved {saved.get('saved_at')}\n")
+    print_results(results, baseline)
+    failures = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b:
+            continue
+        if r['ops_per_sec'] < b['ops_per_sec'] * (1 - args.threshold):
+            failures.append(f"{name}: {r['ops_per_sec'] / b['ops_per_sec']:.2f}x of baseline throughput")
+        if r['peak_kib'] > b['peak_kib'] * (1 + args.threshold) + 4:
+            failures.append(f"{name}: peak allocation {b['peak_kib']} -> {r['peak_kib']} KiB")
+    if failures:
+        print("\nRegressions:\n  " + "\n  ".join(failures))
+        return 1
+    print("\nNo regressions beyond threshold.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,471 @@
+"""End-to-end load test of the app's hot paths against local stand-ins.
+
+Boots app.py in-process on a local port and drives it over HTTP with a pool
+of logged-in sessions. By default nothing external is needed: MongoDB is
+replaced by mongomock, Firestore by an in-memory fake, Tesseract by a canned
+OCR result, and the LLM by a stub OpenAI-compatible server started here.
+Each stand-in can be swapped for the real thing:
+
+    --mongo-uri mongodb://localhost:27017   use a real (local) MongoDB
+    --firestore emulator                    use FIRESTORE_EMULATOR_HOST
+    --ocr tesseract                         run the real Tesseract binary
+    --llm-endpoint URL                      use another OpenAI-compatible server
+
+Usage:
+    python benchmarks/loadtest.py [--users 20] [--history-days 365] [--per-day 3]
+                                  [--concurrency 8] [--duration 30]
+                                  [--mix upload=1,add=3,summary=6,analysis=4,advice=1,pdf=1]
+                                  [--json results.json] [--max-p95-ms 500]
+
+The default stand-ins need `pip install mongomock requests`. mongomock is
+taught the few aggregation expressions the app relies on (see
+install_mongomock); a real mongod still gives the more faithful timings.
+
+Prints throughput and p50/p95/p99 per endpoint. With --max-p95-ms the exit
+status is non-zero when any endpoint's p95 exceeds the limit, so the run
+can gate CI.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import types
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, ROOT)
+
+CATEGORIES = ["Food", "Travel", "Entertainment", "Bills", "Shopping", "Health", "Misc"]
+MERCHANTS = ["Big Bazaar", "Swiggy", "Uber", "Amazon", "Apollo Pharmacy", "PVR", "Airtel", "Zomato", "IRCTC"]
+PASSWORD = "loadtest-password"
+
+RECEIPT_TEXT = """SWIGGY INSTAMART
+Order #48213
+Milk 2 x 30.00
+Bread 45.00
+Eggs (12) 84.00
+TOTAL 189.00
+Date: {date}
+Thank you for shopping!
+"""
+
+ADVICE_PROMPTS = [
+    "How can I spend less on food this month?",
+    "Am I on track with my spending?",
+    "What should I cut back on?",
+]
+
+MIX_ALIASES = {
+    'upload': ('POST', '/upload'),
+    'add': ('POST', '/expenses/add'),
+    'summary': ('GET', '/api/summary'),
+    'analysis': ('GET', '/api/analysis'),
+    'advice': ('POST', '/advice'),
+    'pdf': ('GET', '/export/analysis.pdf'),
+}
+DEFAULT_MIX = 'upload=1,add=3,summary=6,analysis=4,advice=1,pdf=1'
+
+
+# --- stand-ins ---------------------------------------------------------------
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """Minimal /v1/chat/completions that answers after a fixed delay"""
+
+    latency = 0.2
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        time.sleep(self.latency)
+        body = json.dumps({
+            "id": "chatcmpl-loadtest",
+            "object": "chat.completion",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "Try setting a weekly food budget."}}],
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_llm(latency: float) -> str:
+    StubLLMHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/v1/chat/completions"
+
+
+class _FakeDoc:
+    def __init__(self, coll, doc_id):
+        self._coll, self.id = coll, doc_id
+
+    @property
+    def exists(self):
+        return self.id in self._coll._docs
+
+    def to_dict(self):
+        return dict(self._coll._docs.get(self.id, {}))
+
+    def get(self):
+        return self
+
+    def set(self, data):
+        self._coll._docs[self.id] = dict(data)
+
+    def update(self, data):
+        self._coll._docs.setdefault(self.id, {}).update(data)
+
+    def delete(self):
+        self._coll._docs.pop(self.id, None)
+
+
+class _FakeQuery:
+    def __init__(self, coll, filters=(), order=None, limit=None):
+        self._coll, self._filters, self._order, self._limit = coll, filters, order, limit
+
+    def where(self, field, op, value):
+        return _FakeQuery(self._coll, self._filters + ((field, op, value),), self._order, self._limit)
+
+    def order_by(self, field, direction='ASCENDING'):
+        return _FakeQuery(self._coll, self._filters, (field, direction), self._limit)
+
+    def limit(self, n):
+        return _FakeQuery(self._coll, self._filters, self._order, n)
+
+    def stream(self):
+        ops = {'==': lambda a, b: a == b, '!=': lambda a, b: a != b, '>': lambda a, b: a > b,
+               '>=': lambda a, b: a >= b, '<': lambda a, b: a < b, '<=': lambda a, b: a <= b}
+        docs = [_FakeDoc(self._coll, k) for k, v in list(self._coll._docs.items())
+                if all(f in v and ops[op](v[f], val) for f, op, val in self._filters)]
+        if self._order:
+            field, direction = self._order
+            docs.sort(key=lambda d: str(d.to_dict().get(field, '')), reverse=direction == 'DESCENDING')
+        return iter(docs[:self._limit] if self._limit else docs)
+
+    get = stream
+
+
+class _FakeCollection(_FakeQuery):
+    def __init__(self):
+        self._docs = {}
+        super().__init__(self)
+
+    def document(self, doc_id=None):
+        return _FakeDoc(self, doc_id or os.urandom(10).hex())
+
+    def add(self, data):
+        doc = self.document()
+        doc.set(data)
+        return None, doc
+
+
+class FakeFirestore:
+    """Just enough of the Firestore client API for the announcement/FAQ routes"""
+
+    def __init__(self):
+        self._collections = {}
+
+    def collection(self, name):
+        return self._collections.setdefault(name, _FakeCollection())
+
+
+def install_fake_firestore():
+    """Register an in-memory firestore_utils before app.py imports the real one"""
+    mod = types.ModuleType('firestore_utils')
+    mod.db = FakeFirestore()
+    mod.UPDATES_COLLECTION = 'updates_and_announcements'
+    mod.FAQ_COLLECTION = 'faq_content'
+    mod.db.collection(mod.UPDATES_COLLECTION).document('welcome').set({
+        'title': 'Welcome', 'content': 'Load test announcement', 'is_active': True,
+        'created_at': datetime.utcnow().isoformat()})
+    mod.db.collection(mod.FAQ_COLLECTION).document('faq-1').set({
+        'question': 'How do I add an expense?', 'answer': 'Use the form.', 'order': 0})
+    sys.modules['firestore_utils'] = mod
+
+
+def install_mongomock():
+    """Swap pymongo.MongoClient for mongomock, taught the expressions the app's queries use.
+
+    mongomock lacks $substrCP (analytics.rollup_pipeline, the merchant
+    fallback) and computed fields in find() projections
+    (receipt_store.MERCHANT_PROJECTION); without them every summary, analysis
+    and PDF request would fail and the timings would measure error pages.
+    """
+    import mongomock
+    import pymongo
+    from mongomock import aggregate as mm_aggregate
+    from mongomock.collection import Collection
+
+    handle_string = mm_aggregate._Parser._handle_string_operator
+
+    def _handle_string_operator(self, operator, values):
+        if operator == '$substrCP':
+            # Python slices strings by code point, which is what $substrCP means
+            string = self.parse(values[0])
+            first, length = self.parse(values[1]), self.parse(values[2])
+            return '' if string is None else str(string)[first:first + length]
+        return handle_string(self, operator, values)
+
+    mm_aggregate._Parser._handle_string_operator = _handle_string_operator
+
+    copy_only_fields = Collection._copy_only_fields
+
+    def _copy_only_fields(self, doc, fields, container):
+        computed = {k: v for k, v in (fields or {}).items()
+                    if isinstance(v, dict) and any(op not in ('$slice', '$elemMatch') for op in v)}
+        if not computed:
+            return copy_only_fields(self, doc, fields, container)
+        rest = {k: v for k, v in fields.items() if k not in computed}
+        out = copy_only_fields(self, doc, rest or {'_id': fields.get('_id', 1)}, container)
+        for key, expr in computed.items():
+            out[key] = mm_aggregate._Parser(doc, ignore_missing_keys=True).parse(expr)
+        return out
+
+    Collection._copy_only_fields = _copy_only_fields
+    pymongo.MongoClient = mongomock.MongoClient
+
+
+def install_fake_ocr(latency: float):
+    import pytesseract
+
+    def image_to_string(image, *args, **kwargs):
+        time.sleep(latency)
+        return RECEIPT_TEXT.format(date=datetime.now().strftime('%d/%m/%Y'))
+
+    pytesseract.image_to_string = image_to_string
+
+
+def receipt_png() -> bytes:
+    from PIL import Image, ImageDraw
+    img = Image.new('L', (480, 320), 255)
+    draw = ImageDraw.Draw(img)
+    for i, line in enumerate(RECEIPT_TEXT.format(date=datetime.now().strftime('%d/%m/%Y')).splitlines()):
+        draw.text((16, 16 + i * 28), line, fill=0)
+    buf = io.BytesIO()
+    img.save(buf, 'PNG')
+    return buf.getvalue()
+
+
+# --- app boot and seeding ----------------------------------------------------
+
+def boot_app(args):
+    """Configure the environment, import app.py and serve it on a local port"""
+    os.environ.setdefault('SECRET_KEY', 'loadtest')
+    os.environ['MONGO_URI'] = args.mongo_uri or 'mongodb://mongomock.invalid:27017'
+    os.environ['MONGO_DB_NAME'] = args.db_name
+    os.environ['LLM_API_ENDPOINT'] = args.llm_endpoint or start_stub_llm(args.llm_latency_ms / 1000)
+    os.environ.setdefault('OPENAI_API_KEY', 'loadtest')
+    os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+    os.environ['LOGIN_IP_PER_MINUTE'] = '100000'
+    os.environ['LOGIN_ACCOUNT_PER_MINUTE'] = '100000'
+    os.environ['EXPORT_CACHE_DIR'] = tempfile.mkdtemp(prefix='loadtest-exports-')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    if not args.mongo_uri:
+        install_mongomock()
+        # mongomock has no text indexes; the app only needs them for /expenses/search
+        os.environ['MONGO_ENSURE_INDEXES'] = '0'
+    if args.firestore == 'fake':
+        install_fake_firestore()
+    if args.ocr == 'stub':
+        install_fake_ocr(args.ocr_latency_ms / 1000)
+
+    cwd = os.getcwd()
+    os.chdir(tempfile.mkdtemp(prefix='loadtest-'))  # uploads/ and profiles/ go to scratch space
+    import app as app_module
+    os.chdir(cwd)
+
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)  # one access-log line per request drowns the report
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return app_module, f"http://127.0.0.1:{server.server_port}"
+
+
+def seed(app_module, users: int, history_days: int, per_day: int):
+    """Create users with `history_days` of synthetic expenses; returns their emails"""
+    from dedupe import fingerprints
+    from search import search_prefixes
+
+    pw_hash = app_module.bcrypt.generate_password_hash(PASSWORD).decode('utf-8')
+    rnd = random.Random(42)
+    today = datetime.now()
+    emails = []
+    for u in range(users):
+        email = f"loadtest{u}@example.com"
+        emails.append(email)
+        app_module.users_col.delete_many({'email': email})
+        app_module.expenses_col.delete_many({'user': email})
+        app_module.users_col.insert_one({
+            'email': email, 'password': pw_hash, 'username': f"loadtest{u}",
+            'is_admin': False, 'created_at': datetime.utcnow(),
+            'settings': {'monthly_budget': 30000},
+        })
+        docs = []
+        for d in range(history_days):
+            day = today - timedelta(days=d)
+            for _ in range(rnd.randint(0, per_day * 2)):
+                category = rnd.choice(CATEGORIES)
+                merchant = rnd.choice(MERCHANTS)
+                amount = round(rnd.uniform(40, 2500), 2)
+                date_str = day.strftime('%Y-%m-%d') + f" {rnd.randint(8, 22):02d}:{rnd.randint(0, 59):02d}"
+                docs.append({
+                    'user': email, 'filename': None, 'category': category, 'amount': amount,
+                    'date': date_str, 'merchant': merchant, 'note': '',
+                    'created_at': day, 'fingerprints': fingerprints(amount, date_str, merchant),
+                    'search_prefixes': search_prefixes(merchant, '', category),
+                })
+        if docs:
+            app_module.expenses_col.insert_many(docs, ordered=False)
+    return emails
+
+
+# --- load generation ---------------------------------------------------------
+
+def parse_mix(spec: str):
+    mix = []
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in MIX_ALIASES:
+            raise SystemExit(f"unknown endpoint in --mix: {name!r} (choose from {', '.join(MIX_ALIASES)})")
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+
+def login(base: str, email: str):
+    import requests
+    s = requests.Session()
+    r = s.post(f"{base}/login", json={'email': email, 'password': PASSWORD}, timeout=30)
+    r.raise_for_status()
+    return s
+
+
+def call(session, base: str, name: str, png: bytes, rnd: random.Random):
+    method, path = MIX_ALIASES[name]
+    url = base + path
+    if name == 'upload':
+        return session.post(url, files={'file': (f"receipt{rnd.randint(0, 1 << 30)}.png", png, 'image/png')}, timeout=120)
+    if name == 'add':
+        return session.post(url, json={
+            'category': rnd.choice(CATEGORIES), 'amount': round(rnd.uniform(40, 2500), 2),
+            'merchant': rnd.choice(MERCHANTS), 'note': 'load test',
+            'date': datetime.now().strftime('%Y-%m-%dT%H:%M'), 'on_duplicate': 'allow',
+        }, timeout=120)
+    if name == 'advice':
+        return session.post(url, json={'message': rnd.choice(ADVICE_PROMPTS)}, timeout=120)
+    return session.get(url, timeout=120)
+
+
+def worker(idx: int, base: str, emails, mix, png: bytes, deadline: float, results, lock):
+    rnd = random.Random(idx)
+    session = login(base, emails[idx % len(emails)])
+    names = [n for n, _ in mix]
+    weights = [w for _, w in mix]
+    local = []
+    while time.perf_counter() < deadline:
+        name = rnd.choices(names, weights)[0]
+        t0 = time.perf_counter()
+        try:
+            r = call(session, base, name, png, rnd)
+            r.content
+            ok = r.status_code < 400 or (name == 'pdf' and r.status_code == 202)
+        except Exception:
+            ok = False
+        local.append((name, time.perf_counter() - t0, ok))
+    with lock:
+        results.extend(local)
+
+
+def percentile(sorted_vals, q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    i = min(len(sorted_vals) - 1, max(0, int(round(q / 100 * len(sorted_vals))) - 1))
+    return sorted_vals[i]
+
+
+def summarize(results, elapsed: float):
+    report = {}
+    for name in sorted({n for n, _, _ in results}):
+        lat = sorted(s for n, s, _ in results if n == name)
+        errors = sum(1 for n, _, ok in results if n == name and not ok)
+        report[name] = {
+            'endpoint': ' '.join(MIX_ALIASES[name]),
+            'requests': len(lat),
+            'errors': errors,
+            'rps': round(len(lat) / elapsed, 2),
+            'p50_ms': round(percentile(lat, 50) * 1000, 1),
+            'p95_ms': round(percentile(lat, 95) * 1000, 1),
+            'p99_ms': round(percentile(lat, 99) * 1000, 1),
+        }
+    return report
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    p.add_argument('--users', type=int, default=20)
+    p.add_argument('--history-days', type=int, default=365)
+    p.add_argument('--per-day', type=int, default=3, help='average expenses per user per day')
+    p.add_argument('--concurrency', type=int, default=8)
+    p.add_argument('--duration', type=float, default=30, help='seconds of load after warm-up')
+    p.add_argument('--mix', default=DEFAULT_MIX)
+    p.add_argument('--mongo-uri', help='real MongoDB to use instead of mongomock')
+    p.add_argument('--db-name', default='ai_expenses_loadtest')
+    p.add_argument('--firestore', choices=['fake', 'emulator'], default='fake')
+    p.add_argument('--ocr', choices=['stub', 'tesseract'], default='stub')
+    p.add_argument('--ocr-latency-ms', type=float, default=150)
+    p.add_argument('--llm-endpoint', help='OpenAI-compatible endpoint instead of the built-in stub')
+    p.add_argument('--llm-latency-ms', type=float, default=200)
+    p.add_argument('--json', help='write the report here as JSON')
+    p.add_argument('--max-p95-ms', type=float, help='fail if any endpoint p95 exceeds this')
+    args = p.parse_args()
+
+    mix = parse_mix(args.mix)
+    app_module, base = boot_app(args)
+
+    t0 = time.perf_counter()
+    emails = seed(app_module, args.users, args.history_days, args.per_day)
+    print(f"Seeded {len(emails)} users x {args.history_days} days in {time.perf_counter() - t0:.1f}s; serving at {base}")
+
+    png = receipt_png()
+    results, lock = [], threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for f in [pool.submit(worker, i, base, emails, mix, png, deadline, results, lock) for i in range(args.concurrency)]:
+            f.result()
+    elapsed = time.perf_counter() - t0
+
+    report = summarize(results, elapsed)
+    print(f"\n{len(results)} requests in {elapsed:.1f}s at concurrency {args.concurrency} "
+          f"({len(results) / elapsed:.1f} req/s)\n")
+    print(f"{'endpoint':<28}{'reqs':>7}{'errs':>6}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for r in report.values():
+        print(f"{r['endpoint']:<28}{r['requests']:>7}{r['errors']:>6}{r['rps']:>8}{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}")
+
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump({'config': vars(args), 'elapsed': elapsed, 'endpoints': report}, fh, indent=2)
+
+    if args.max_p95_ms is not None:
+        slow = [r['endpoint'] for r in report.values() if r['p95_ms'] > args.max_p95_ms]
+        if slow:
+            print(f"\np95 above {args.max_p95_ms} ms: {', '.join(slow)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""Per-process MongoClient with configurable pooling and pool metrics.
+
+The client is built on first use in each process, so a gunicorn master
+that imports the app (--preload) never hands its sockets or monitor threads
+to forked workers. Module-level handles (`db`, `db["users"]`) are proxies
+that resolve to the current process's client on every call.
+
+Pool settings come from the environment (see pool_options_from_env), and
+PoolMetrics tracks checkout wait, connections in use and the wait queue
+for /metrics and /healthz.
+"""
+from typing import Any, Dict, Optional
+from pymongo import MongoClient, monitoring
+import os
+import threading
+import time
+
+from metrics import (MONGO_CHECKOUT_FAILURES, MONGO_CHECKOUT_SECONDS, MONGO_CONNECTIONS_IN_USE,
+                     MONGO_CONNECTIONS_OPEN, MONGO_WAIT_QUEUE, MongoMetrics)
+
+# env var -> (MongoClient option, type)
+POOL_ENV = {
+    'MONGO_MAX_POOL_SIZE': ('maxPoolSize', int),
+    'MONGO_MIN_POOL_SIZE': ('minPoolSize', int),
+    'MONGO_MAX_IDLE_TIME_MS': ('maxIdleTimeMS', int),
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': ('waitQueueTimeoutMS', int),
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': ('serverSelectionTimeoutMS', int),
+    'MONGO_COMPRESSORS': ('compressors', str),  # e.g. "zstd,snappy,zlib"
+    'MONGO_ZLIB_LEVEL': ('zlibCompressionLevel', int),
+}
+DEFAULT_MAX_POOL_SIZE = 100  # PyMongo's own default
+SATURATED = 0.9
+
+
+def pool_options_from_env(environ=os.environ) -> Dict[str, Any]:
+    opts = {}
+    for var, (option, cast) in POOL_ENV.items():
+        value = environ.get(var)
+        if value:
+            opts[option] = cast(value)
+    return opts
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool listener feeding the pool gauges and this process's /healthz figures"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # address -> {'open', 'in_use', 'waiting'}
+        self._pools: Dict[str, Dict[str, int]] = {}
+        self._local = threading.local()
+
+    def _bump(self, address, field: str, delta: int):
+        addr = '%s:%s' % address
+        with self._lock:
+            pool = self._pools.setdefault(addr, {'open': 0, 'in_use': 0, 'waiting': 0})
+            pool[field] = max(pool[field] + delta, 0)
+            value = pool[field]
+        gauge = {'open': MONGO_CONNECTIONS_OPEN, 'in_use': MONGO_CONNECTIONS_IN_USE, 'waiting': MONGO_WAIT_QUEUE}[field]
+        gauge.set(value, address=addr)
+
+    def _waited(self, event) -> float:
+        # PyMongo >= 4.7 reports the wait itself; otherwise time it from check_out_started,
+        # which fires on the same thread
+        duration = getattr(event, 'duration', None)
+        if duration is not None:
+            return duration
+        t0 = getattr(self._local, 't0', None)
+        return time.perf_counter() - t0 if t0 is not None else 0.0
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            pools = list(self._pools.values())
+        return {k: sum(p[k] for p in pools) for k in ('open', 'in_use', 'waiting')}
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop('%s:%s' % event.address, None)
+
+    def connection_created(self, event):
+        self._bump(event.address, 'open', 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._bump(event.address, 'open', -1)
+
+    def connection_check_out_started(self, event):
+        self._local.t0 = time.perf_counter()
+        self._bump(event.address, 'waiting', 1)
+
+    def connection_check_out_failed(self, event):
+        self._bump(event.address, 'waiting', -1)
+        MONGO_CHECKOUT_SECONDS.observe(self._waited(event), address='%s:%s' % event.address)
+        MONGO_CHECKOUT_FAILURES.inc(address='%s:%s' % event.address, reason=str(event.reason))
+
+    def connection_checked_out(self, event):
+        self._bump(event.address, 'waiting', -1)
+        self._bump(event.address, 'in_use', 1)
+        MONGO_CHECKOUT_SECONDS.observe(self._waited(event), address='%s:%s' % event.address)
+
+    def connection_checked_in(self, event):
+        self._bump(event.address, 'in_use', -1)
+
+
+class Mongo:
+    """Lazily built, fork-aware MongoClient for one database"""
+
+    def __init__(self, uri: str, db_name: str, **options):
+        self.uri = uri
+        self.db_name = db_name
+        self.options = options
+        self.max_pool_size = options.get('maxPoolSize', DEFAULT_MAX_POOL_SIZE)
+        self._client: Optional[MongoClient] = None
+        self._db = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self.pool = PoolMetrics()
+        self.db = DatabaseProxy(self)
+
+    @property
+    def client(self) -> MongoClient:
+        pid = os.getpid()
+        if self._client is None or self._pid != pid:
+            with self._lock:
+                if self._client is None or self._pid != pid:
+                    # A client inherited across fork is abandoned, not closed: its
+                    # sockets are shared with the parent. Pool counts start over too.
+                    if self._pid is not None:
+                        self.pool = PoolMetrics()
+                    self._client = MongoClient(self.uri, event_listeners=[MongoMetrics(), self.pool],
+                                               **self.options)
+                    self._db = self._client[self.db_name]
+                    self._pid = pid
+        return self._client
+
+    def database(self):
+        self.client  # (re)builds the client in a new process
+        return self._db
+
+    def health(self, timeout: float = 2.0) -> Dict[str, Any]:
+        """Ping plus this process's pool saturation"""
+        import pymongo
+        t0 = time.perf_counter()
+        try:
+            if hasattr(pymongo, 'timeout'):  # PyMongo >= 4.2 caps the whole operation
+                with pymongo.timeout(timeout):
+                    self.client.admin.command('ping')
+            else:
+                self.client.admin.command('ping')
+            ok, error = True, None
+        except Exception as e:
+            ok, error = False, type(e).__name__
+        ping_ms = round((time.perf_counter() - t0) * 1000, 1)
+
+        pool = self.pool.snapshot()
+        saturation = round(pool['in_use'] / self.max_pool_size, 3) if self.max_pool_size else 0.0
+        # Checkouts only queue once every connection is in use
+        status = 'down' if not ok else ('saturated' if saturation >= SATURATED else 'ok')
+        out = {'status': status, 'mongo': {'ok': ok, 'ping_ms': ping_ms},
+               'pool': {**pool, 'max': self.max_pool_size, 'saturation': saturation}, 'pid': os.getpid()}
+        if error:
+            out['mongo']['error'] = error
+        return out
+
+
+class DatabaseProxy:
+    """Stands in for a pymongo Database; each access goes to this process's client"""
+
+    def __init__(self, mongo: Mongo):
+        self._mongo = mongo
+
+    def __getitem__(self, name: str) -> 'CollectionProxy':
+        return CollectionProxy(self._mongo, name)
+
+    def __getattr__(self, name: str):
+        return getattr(self._mongo.database(), name)
+
+
+class CollectionProxy:
+    """Stands in for a pymongo Collection held at module level"""
+
+    def __init__(self, mongo: Mongo, name: str):
+        self._mongo = mongo
+        self._db = None
+        self._collection = None
+        self.name = name
+
+    def _current(self):
+        db = self._mongo.database()
+        if db is not self._db:
+            self._db, self._collection = db, db[self.name]
+        return self._collection
+
+    def __getattr__(self, attr: str):
+        return getattr(self._current(), attr)
+
+    def __getitem__(self, sub: str):
+        return self._current()[sub]
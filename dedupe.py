@@ -0,0 +1,125 @@
+from typing import Any, Dict, List, Optional
+from pymongo import UpdateOne
+import hashlib
+
+from receipt_parsing import merchant_key
+
+# MinHash/LSH settings: a probable duplicate shares at least one band
+SHINGLE_SIZE = 3
+BANDS = 4
+ROWS_PER_BAND = 2
+
+
+def _shingles(s: str) -> set:
+    s = s.replace(' ', '')
+    if len(s) <= SHINGLE_SIZE:
+        return {s} if s else set()
+    return {s[i:i + SHINGLE_SIZE] for i in range(len(s) - SHINGLE_SIZE + 1)}
+
+
+def _minhash_bands(shingles: set) -> List[str]:
+    bands = []
+    for b in range(BANDS):
+        mins = []
+        for r in range(ROWS_PER_BAND):
+            seed = str(b * ROWS_PER_BAND + r).encode()
+            mins.append(min(int.from_bytes(hashlib.blake2b(seed + sh.encode(), digest_size=8).digest(), 'big')
+                            for sh in shingles))
+        bands.append(hashlib.blake2b(repr(mins).encode(), digest_size=6).hexdigest())
+    return bands
+
+
+def fingerprints(amount: Any, date: Any, text: str) -> List[str]:
+    """Fingerprints for an expense: (day, rounded amount) plus one LSH band of the merchant each.
+
+    Expenses without merchant text get none; day and amount alone would pair
+    unrelated manual entries.
+    """
+    sh = _shingles(merchant_key(text))
+    if not sh:
+        return []
+    prefix = f"{str(date or '')[:10]}|{round(float(amount or 0))}"
+    return [f"{prefix}|{i}:{h}" for i, h in enumerate(_minhash_bands(sh))]
+
+
+def find_duplicate(expenses_col, user: str, fps: List[str]) -> Optional[Dict[str, Any]]:
+    """Indexed lookup of an existing expense sharing any fingerprint"""
+    if not fps:
+        return None
+    return expenses_col.find_one(
+        {"user": user, "fingerprints": {"$in": fps}},
+        {"_id": 1, "date": 1, "amount": 1, "category": 1, "merchant": 1, "filename": 1}
+    )
+
+
+def describe(doc: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": str(doc.get("_id")),
+        "date": doc.get("date"),
+        "amount": doc.get("amount"),
+        "category": doc.get("category"),
+        "merchant": doc.get("merchant"),
+        "filename": doc.get("filename"),
+    }
+
+
+def backfill_fingerprints(expenses_col, user: Optional[str] = None, batch: int = 1000) -> int:
+    """Compute fingerprints for expenses that predate them (all users unless `user` is given).
+
+    Also recomputes the old merchant-less "day|amount|-" fingerprint, which is no longer issued.
+    """
+    ops, updated = [], 0
+    query: Dict[str, Any] = {"$or": [{"fingerprints": {"$exists": False}}, {"fingerprints": {"$regex": r"\|-$"}}]}
+    if user:
+        query["user"] = user
+    cursor = expenses_col.find(
+        query, {"_id": 1, "date": 1, "amount": 1, "merchant": 1, "text": 1}
+    ).batch_size(batch)
+    for x in cursor:
+        fps = fingerprints(x.get("amount"), x.get("date"), x.get("merchant") or x.get("text") or '')
+        ops.append(UpdateOne({"_id": x["_id"]}, {"$set": {"fingerprints": fps}}))
+        if len(ops) >= batch:
+            updated += expenses_col.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += expenses_col.bulk_write(ops, ordered=False).modified_count
+    return updated
+
+
+def duplicate_report(expenses_col, user: str) -> List[Dict[str, Any]]:
+    """Groups of a user's expenses that share a fingerprint"""
+    rows = expenses_col.aggregate([
+        {"$match": {"user": user, "fingerprints": {"$exists": True}}},
+        {"$unwind": "$fingerprints"},
+        {"$group": {"_id": "$fingerprints", "ids": {"$addToSet": "$_id"}}},
+        {"$match": {"ids.1": {"$exists": True}}}
+    ])
+
+    # Merge overlapping groups (the same pair can match on several bands) with a union-find
+    parent: Dict[Any, Any] = {}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for r in rows:
+        ids = r["ids"]
+        for i in ids:
+            parent.setdefault(i, i)
+        root = find(ids[0])
+        for i in ids[1:]:
+            parent[find(i)] = root
+    if not parent:
+        return []
+
+    docs = {d["_id"]: d for d in expenses_col.find(
+        {"_id": {"$in": list(parent)}},
+        {"_id": 1, "date": 1, "amount": 1, "category": 1, "merchant": 1, "filename": 1}
+    )}
+    groups: Dict[Any, List[Any]] = {}
+    for i in sorted(parent):
+        groups.setdefault(find(i), []).append(i)
+    return [{"expenses": [describe(docs[i]) for i in ids if i in docs]}
+            for ids in sorted(groups.values(), key=lambda g: g[0])]
@@ -0,0 +1,194 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+import hashlib
+import json
+import os
+import threading
+import time
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def export_key(kind: str, user: str, start: str, end: str, version: int) -> str:
+    """Content address for an export: same user, range and data version -> same file"""
+    raw = f"{kind}|{user}|{start}|{end}|{version}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def _iter_handle(fh, chunk_size: int = STREAM_CHUNK_SIZE):
+    try:
+        while True:
+            chunk = fh.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        fh.close()
+
+
+class ExportCache:
+    """On-disk cache of generated exports with size-bounded LRU eviction.
+
+    Recency is tracked through file mtimes so the cache survives restarts
+    and can be shared by workers on the same host.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffix: str = '.pdf'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.suffix)
+
+    def open(self, key: str) -> Optional[Tuple[object, int]]:
+        """Return (generator, size) for a cached export, or None on a miss.
+
+        The file is opened eagerly so a concurrent eviction cannot pull it
+        out from under a response that is still streaming.
+        """
+        path = self.path_for(key)
+        try:
+            fh = open(path, 'rb')
+        except OSError:
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return _iter_handle(fh), os.fstat(fh.fileno()).st_size
+
+    def build(self, key: str, render: Callable[[object], None]) -> str:
+        """Run `render(fileobj)` into a temp file and atomically publish it under `key`"""
+        path = self.path_for(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'wb') as fh:
+                render(fh)
+            os.replace(tmp, path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self.evict()
+        return path
+
+    def evict(self):
+        """Drop least recently used exports until the cache fits in max_bytes"""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.directory):
+                if not name.endswith(self.suffix):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name))
+                total += st.st_size
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    total -= size
+                except OSError:
+                    pass
+
+
+class ExportJobs:
+    """Background generation of large exports, polled by content key.
+
+    Job state is kept as small JSON files in the export cache directory, so
+    the status poll and the download can land on any worker of the host
+    (the same scope ExportCache is shared at). The rendering itself runs on
+    the worker that accepted the job; a job whose worker died is retried
+    once it has been 'running' for longer than `stale_seconds`, and a
+    finished job whose file the cache has since evicted is rebuilt.
+    """
+
+    def __init__(self, cache: ExportCache, max_workers: int = 2, keep_seconds: int = 3600,
+                 stale_seconds: int = 900):
+        self.cache = cache
+        self.directory = cache.directory
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='export')
+        self._lock = threading.Lock()
+        self.keep_seconds = keep_seconds
+        self.stale_seconds = stale_seconds
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.job.json')
+
+    def _read(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._path(key)) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, job: dict):
+        path = self._path(job['key'])
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as fh:
+            json.dump(job, fh)
+        os.replace(tmp, path)
+
+    def _set_state(self, job: dict, state: str):
+        job = dict(job, status=state, updated=time.time())
+        self._write(job)
+        return job
+
+    def submit(self, key: str, owner: str, fn: Callable[[], object]) -> dict:
+        with self._lock:
+            self._prune()
+            job = self._read(key)
+            if job and job['owner'] == owner and self._live(job):
+                return job
+            job = self._set_state({'key': key, 'owner': owner, 'created': time.time()}, 'pending')
+
+            def run():
+                current = self._set_state(job, 'running')
+                try:
+                    fn()
+                except Exception:
+                    self._set_state(current, 'failed')
+                    raise
+                self._set_state(current, 'ready')
+
+            self._pool.submit(run)
+            return job
+
+    def status(self, key: str, owner: str) -> Optional[dict]:
+        job = self._read(key)
+        if not job or job['owner'] != owner:
+            return None
+        state = job['status']
+        if not self._live(job):
+            state = {'running': 'failed', 'ready': 'expired'}.get(state, state)
+        return {'job': key, 'status': state}
+
+    def _live(self, job: dict) -> bool:
+        """Ready with its file still cached, or still expected to finish"""
+        if job['status'] == 'ready':
+            return os.path.exists(self.cache.path_for(job['key']))
+        if job['status'] in ('pending', 'running'):
+            return time.time() - job.get('updated', job['created']) < self.stale_seconds
+        return False
+
+    def _prune(self):
+        cutoff = time.time() - self.keep_seconds
+        for name in os.listdir(self.directory):
+            if not name.endswith('.job.json'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
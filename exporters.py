@@ -0,0 +1,123 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List
+import csv
+import io
+import json
+
+from receipt_store import MERCHANT_PROJECTION
+
+# Columns written for every expense, in order
+EXPORT_FIELDS = ['id', 'date', 'category', 'amount', 'merchant', 'note', 'filename', 'filetype', 'source']
+
+# Mongo projection matching EXPORT_FIELDS; receipt text is opt-in because of its size
+EXPORT_PROJECTION = {'date': 1, 'category': 1, 'amount': 1, 'merchant': MERCHANT_PROJECTION, 'note': 1,
+                     'filename': 1, 'filetype': 1, 'source': 1}
+
+PARQUET_ROW_GROUP = 10000
+
+
+def export_row(doc: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    row = {}
+    for f in fields:
+        if f == 'id':
+            row[f] = str(doc.get('_id', ''))
+        elif f == 'amount':
+            row[f] = float(doc.get('amount') or 0)
+        elif f == 'category':
+            row[f] = doc.get('category') or 'Misc'
+        else:
+            v = doc.get(f)
+            row[f] = v.isoformat() if isinstance(v, datetime) else v
+    return row
+
+
+class _LineBuffer:
+    """Minimal file object that csv.writer can write into and we can drain"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, s):
+        self.parts.append(s)
+
+    def drain(self) -> str:
+        out = ''.join(self.parts)
+        self.parts = []
+        return out
+
+
+def iter_csv(cursor: Iterable[dict], fields: List[str], flush_rows: int = 500) -> Iterator[str]:
+    buf = _LineBuffer()
+    writer = csv.DictWriter(buf, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    n = 0
+    for doc in cursor:
+        writer.writerow(export_row(doc, fields))
+        n += 1
+        if n % flush_rows == 0:
+            yield buf.drain()
+    yield buf.drain()
+
+
+def iter_jsonl(cursor: Iterable[dict], fields: List[str], flush_rows: int = 500) -> Iterator[str]:
+    lines = []
+    for doc in cursor:
+        lines.append(json.dumps(export_row(doc, fields), ensure_ascii=False, default=str))
+        if len(lines) >= flush_rows:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+class _DrainSink(io.RawIOBase):
+    """Write-only stream that hands back whatever has been written since the last drain"""
+
+    def __init__(self):
+        self._buf = io.BytesIO()
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        n = self._buf.write(b)
+        self._pos += n
+        return n
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = self._buf.getvalue()
+        self._buf = io.BytesIO()
+        return data
+
+
+def iter_parquet(cursor: Iterable[dict], fields: List[str], row_group: int = PARQUET_ROW_GROUP) -> Iterator[bytes]:
+    """Stream a Parquet file one row group at a time (requires pyarrow)"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(f, pa.float64() if f == 'amount' else pa.string()) for f in fields])
+    sink = _DrainSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        cols = {f: [] for f in fields}
+        n = 0
+        for doc in cursor:
+            row = export_row(doc, fields)
+            for f in fields:
+                v = row.get(f)
+                cols[f].append(v if v is None or f == 'amount' else str(v))
+            n += 1
+            if n >= row_group:
+                writer.write_table(pa.table(cols, schema=schema))
+                cols = {f: [] for f in fields}
+                n = 0
+                yield sink.drain()
+        if n:
+            writer.write_table(pa.table(cols, schema=schema))
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -1,6 +1,9 @@
 from firebase_admin import credentials, firestore, initialize_app
+import logging
 import os
 
+log = logging.getLogger('expenses.firestore')
+
 # Initialize Firestore
 def init_firestore():
     # Use the service account key file if it exists
@@ -9,9 +12,11 @@ def init_firestore():
     if os.path.exists(service_account_path):
         cred = credentials.Certificate(service_account_path)
         firebase_app = initialize_app(cred)
+        log.info("Firestore initialised", extra={"credentials": "service_account"})
     else:
         # For development, you can use the default credentials if running in a GCP environment
         firebase_app = initialize_app()
+        log.info("Firestore initialised", extra={"credentials": "application_default"})
     
     return firestore.client()
 
@@ -27,6 +32,7 @@ def get_updates():
 
 def add_update(title, content, user_id):
     """Add a new update or announcement"""
+    log.info("Adding update", extra={"user": user_id})
     update_ref = db.collection(UPDATES_COLLECTION).document()
     update_ref.set({
         'title': title,
@@ -48,6 +54,7 @@ def update_update(update_id, title, content):
 
 def delete_update(update_id):
     """Delete an update"""
+    log.info("Deleting update", extra={"update_id": update_id})
     db.collection(UPDATES_COLLECTION).document(update_id).delete()
 
 def get_faqs():
@@ -56,6 +63,7 @@ def get_faqs():
 
 def add_faq(question, answer, user_id):
     """Add a new FAQ"""
+    log.info("Adding FAQ", extra={"user": user_id})
     # Get the next order number
     last_faq = db.collection(FAQ_COLLECTION).order_by('order', direction='DESCENDING').limit(1).get()
     next_order = 1
@@ -84,6 +92,7 @@ def update_faq(faq_id, question, answer):
 
 def delete_faq(faq_id):
     """Delete an FAQ"""
+    log.info("Deleting FAQ", extra={"faq_id": faq_id})
     db.collection(FAQ_COLLECTION).document(faq_id).delete()
 
 def reorder_faq(faq_id, new_order):
@@ -0,0 +1,404 @@
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from pymongo.errors import BulkWriteError
+import numpy as np
+from dedupe import fingerprints
+from receipt_parsing import merchant_key
+from search import search_prefixes
+import csv
+import io
+import re
+import time
+
+IMPORT_CHUNK_SIZE = 2000
+MAX_REJECT_SAMPLES = 50
+
+# How a single signed "amount" column marks spending: 'auto' decides from the
+# first chunk by majority sign (spending outnumbers salary and refunds both in
+# bank exports, where debits are negative, and in expense-only exports)
+SIGN_CONVENTIONS = ('auto', 'debit-negative', 'debit-positive')
+
+DATE_FORMATS = [
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%d/%m/%Y",
+    "%d-%m-%Y",
+    "%m/%d/%Y",
+    "%d/%m/%y",
+    "%d %b %Y",
+    "%d-%b-%Y",
+    "%Y%m%d%H%M%S",
+    "%Y%m%d",
+]
+
+# Header aliases seen in common bank/statement CSV exports
+COLUMN_ALIASES = {
+    "date": ["date", "transaction date", "txn date", "value date", "posted date", "posting date"],
+    "amount": ["amount", "amt", "transaction amount", "value"],
+    "debit": ["debit", "withdrawal", "withdrawal amt", "withdrawal amount", "dr"],
+    "credit": ["credit", "deposit", "deposit amt", "deposit amount", "cr"],
+    "merchant": ["merchant", "payee", "name", "description", "narration", "particulars", "details"],
+    "note": ["note", "memo", "remarks", "reference"],
+    "category": ["category"],
+}
+
+_AMOUNT_JUNK = re.compile(r"[^0-9.\-]")
+_OFX_TAG = re.compile(r"<([A-Z0-9.]+)>([^<\r\n]*)")
+
+
+def _normalise_header(fields: List[str]) -> Dict[str, str]:
+    lookup = {(f or '').strip().lower(): f for f in fields}
+    mapping = {}
+    for key, aliases in COLUMN_ALIASES.items():
+        for a in aliases:
+            if a in lookup:
+                mapping[key] = lookup[a]
+                break
+    return mapping
+
+
+def iter_csv_records(stream: io.TextIOBase) -> Iterator[Dict[str, str]]:
+    """Yield canonical records (date/amount/merchant/note/category) from a CSV stream"""
+    reader = csv.DictReader(stream)
+    cols = _normalise_header(reader.fieldnames or [])
+    if "date" not in cols or not ({"amount", "debit"} & cols.keys()):
+        raise ValueError("CSV must have a date column and an amount or debit column")
+    for row in reader:
+        amount = row.get(cols["amount"]) if "amount" in cols else None
+        signed = bool((amount or '').strip())
+        if not signed and "debit" in cols:
+            amount = row.get(cols["debit"])
+        credit = row.get(cols["credit"]) if "credit" in cols else None
+        yield {
+            "date": row.get(cols["date"]),
+            "amount": amount,
+            # A single amount column carries credits as well; a debit column does not
+            "signed": signed,
+            "credit": credit,
+            "merchant": row.get(cols["merchant"]) if "merchant" in cols else "",
+            "note": row.get(cols["note"]) if "note" in cols else "",
+            "category": row.get(cols["category"]) if "category" in cols else "",
+            "external_id": None,
+        }
+
+
+def iter_ofx_records(stream: io.TextIOBase) -> Iterator[Dict[str, str]]:
+    """Yield records from the <STMTTRN> blocks of an OFX/QFX statement, line by line"""
+    current = None
+    for raw in stream:
+        line = raw.strip()
+        if not line:
+            continue
+        upper = line.upper()
+        if upper.startswith("<STMTTRN>"):
+            current = {}
+            continue
+        if upper.startswith("</STMTTRN>"):
+            if current is not None:
+                amt = (current.get("TRNAMT") or "").strip()
+                # OFX debits are negative; deposits are not expenses
+                is_debit = amt.startswith("-")
+                yield {
+                    "date": (current.get("DTPOSTED") or "")[:14],
+                    "amount": amt.lstrip("-") if is_debit else "",
+                    "credit": "" if is_debit else amt,
+                    "merchant": current.get("NAME") or current.get("PAYEE") or "",
+                    "note": current.get("MEMO") or "",
+                    "category": "",
+                    "external_id": current.get("FITID"),
+                }
+            current = None
+            continue
+        if current is not None:
+            for tag, val in _OFX_TAG.findall(line):
+                current[tag.upper()] = val.strip()
+
+
+def _chunks(records: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for r in records:
+        chunk.append(r)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parse_amounts(raw: List[Optional[str]]) -> np.ndarray:
+    """Vectorised amount parsing, sign kept; unparseable values become NaN"""
+    cleaned = [_AMOUNT_JUNK.sub('', s or '') for s in raw]
+    try:
+        return np.asarray(cleaned, dtype=np.float64)
+    except ValueError:
+        out = np.full(len(cleaned), np.nan)
+        for i, s in enumerate(cleaned):
+            try:
+                out[i] = float(s)
+            except ValueError:
+                pass
+        return out
+
+
+def _parse_dates(raw: List[Optional[str]]) -> List[Optional[str]]:
+    """Parse a date column, guessing the format once and reusing it for the chunk"""
+    fmt = None
+    out = []
+    for s in raw:
+        s = (s or '').strip()
+        d = None
+        if fmt:
+            try:
+                d = datetime.strptime(s, fmt)
+            except ValueError:
+                d = None
+        if d is None:
+            for f in DATE_FORMATS:
+                try:
+                    d = datetime.strptime(s, f)
+                    fmt = f
+                    break
+                except ValueError:
+                    continue
+        out.append(d.strftime("%Y-%m-%d %H:%M") if d else None)
+    return out
+
+
+def _norm_text(s: str) -> str:
+    return re.sub(r"\s+", " ", (s or '').strip().lower())
+
+
+def dedupe_key(date: str, amount: float, merchant: str) -> Tuple[str, float, str]:
+    return (str(date or '')[:10], round(float(amount or 0), 2), merchant_key(merchant))
+
+
+def import_expenses(records: Iterable[Dict[str, Any]], user: str, expenses_col,
+                    categorize: Callable[[str], str],
+                    assess: Callable[[str, float, str], tuple],
+                    filename: Optional[str] = None,
+                    chunk_size: int = IMPORT_CHUNK_SIZE,
+                    sign_convention: str = 'auto') -> Dict[str, Any]:
+    """Validate, categorise, de-duplicate and bulk insert imported records.
+
+    A row is a duplicate when its external id was already seen, or when the
+    database already holds as many rows with the same date, amount and
+    merchant as the file has supplied so far; two identical purchases in one
+    file are both imported.
+    """
+    if sign_convention not in SIGN_CONVENTIONS:
+        raise ValueError(f"sign must be one of: {', '.join(SIGN_CONVENTIONS)}")
+    t0 = time.perf_counter()
+    report = {"rows": 0, "imported": 0, "duplicates": 0, "rejected": 0, "rejects": []}
+    stored: Counter = Counter()  # dedupe key -> matching rows in the database not yet matched by the file
+    counted = set()  # _ids already in `stored`, or inserted by this import
+    external_ids = set()
+    category_cache: Dict[str, str] = {}
+    assess_cache: Dict[tuple, str] = {}
+    line_no = 1  # header
+
+    def reject(line: int, reason: str):
+        report["rejected"] += 1
+        if len(report["rejects"]) < MAX_REJECT_SAMPLES:
+            report["rejects"].append({"line": line, "reason": reason})
+
+    for chunk in _chunks(records, chunk_size):
+        n = len(chunk)
+        report["rows"] += n
+        first_line = line_no + 1
+        line_no += n
+
+        # Columnar validation for the whole chunk
+        raw = _parse_amounts([r.get("amount") for r in chunk])
+        signed = np.array([bool(r.get("signed")) for r in chunk], dtype=bool)
+        if sign_convention == 'auto' and (signed & np.isfinite(raw)).any():
+            vals = raw[signed & np.isfinite(raw)]
+            sign_convention = 'debit-negative' if (vals < 0).sum() > (vals > 0).sum() else 'debit-positive'
+        if sign_convention == 'debit-negative':
+            amounts = np.where(signed, -raw, np.abs(raw))
+        else:
+            amounts = np.where(signed, raw, np.abs(raw))
+        dates = _parse_dates([r.get("date") for r in chunk])
+        valid = np.isfinite(amounts) & (amounts > 0)
+
+        # Existing rows in the chunk's date span, for de-duplication
+        span = [d for d in dates if d]
+        if span:
+            existing = expenses_col.find(
+                {"user": user, "date": {"$gte": min(span)[:10], "$lte": max(span)[:10] + "~"}},
+                {"_id": 1, "date": 1, "amount": 1, "merchant": 1, "text": 1, "external_id": 1}
+            )
+            for x in existing:
+                # Chunk date spans overlap; count each stored row once
+                if x["_id"] in counted:
+                    continue
+                counted.add(x["_id"])
+                stored[dedupe_key(x.get("date"), x.get("amount"), x.get("merchant") or x.get("text"))] += 1
+                if x.get("external_id"):
+                    external_ids.add(x["external_id"])
+
+        docs = []
+        doc_lines = []
+        now = datetime.now()
+        for i, r in enumerate(chunk):
+            line = first_line + i
+            if not dates[i]:
+                reject(line, "invalid date")
+                continue
+            if not valid[i]:
+                is_credit = (signed[i] and amounts[i] < 0) or bool((r.get("credit") or '').strip())
+                reject(line, "credit entry" if is_credit else "invalid amount")
+                continue
+            amount = float(amounts[i])
+            merchant = (r.get("merchant") or '').strip()
+            note = (r.get("note") or '').strip()
+            ext = r.get("external_id")
+            key = dedupe_key(dates[i], amount, merchant)
+            if ext and ext in external_ids:
+                report["duplicates"] += 1
+                continue
+            if ext:
+                external_ids.add(ext)
+            if stored[key] > 0:
+                stored[key] -= 1
+                report["duplicates"] += 1
+                continue
+
+            text_blob = "\n".join(filter(None, [merchant, note]))
+            category = (r.get("category") or '').strip()
+            if not category:
+                norm = _norm_text(text_blob)
+                category = category_cache.get(norm)
+                if category is None:
+                    category = category_cache[norm] = categorize(text_blob)
+            # Assessment depends only on category, amount band and text
+            a_key = (category, amount >= 500, amount >= 2000, amount >= 5000, _norm_text(text_blob))
+            label = assess_cache.get(a_key)
+            if label is None:
+                label = assess_cache[a_key] = assess(category, amount, text_blob)[0]
+
+            doc = {
+                'user': user,
+                'filename': filename,
+                'category': category,
+                'amount': amount,
+                'text': text_blob,
+                'date': dates[i],
+                'merchant': merchant,
+                'note': note,
+                'assessment': label,
+                'source': 'import',
+                'created_at': now
+            }
+            doc['fingerprints'] = fingerprints(amount, dates[i], merchant or note)
+            doc['search_prefixes'] = search_prefixes(merchant, note, category)
+            if ext:
+                doc['external_id'] = ext
+            docs.append(doc)
+            doc_lines.append(line)
+
+        if docs:
+            try:
+                res = expenses_col.insert_many(docs, ordered=False)
+                report["imported"] += len(res.inserted_ids)
+            except BulkWriteError as e:
+                report["imported"] += e.details.get("nInserted", 0)
+                for err in e.details.get("writeErrors", []):
+                    reject(doc_lines[err.get("index", 0)], err.get("errmsg", "write error"))
+            # insert_many sets _id on each doc; later chunks must not count these as stored rows
+            counted.update(d["_id"] for d in docs if "_id" in d)
+
+    elapsed = time.perf_counter() - t0
+    report["sign_convention"] = sign_convention
+    report["seconds"] = round(elapsed, 3)
+    report["rows_per_second"] = round(report["rows"] / elapsed, 1) if elapsed > 0 else None
+    return report
+
+
+MAX_BATCH = 200
+CLIENT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{8,64}$")
+
+
+def ingest_batch(items: List[Dict[str, Any]], user: str, expenses_col,
+                 categorize: Callable[[str], str],
+                 assess: Callable[[str, float, str], tuple]) -> Dict[str, Any]:
+    """Insert a batch of client-queued expenses with one insert_many.
+
+    Each item carries a client-generated `client_id`; items whose id is
+    already stored for the user (a replayed sync) are reported as
+    duplicates rather than inserted again. Results are returned per item,
+    in request order, so the client knows which entries it can drop.
+    """
+    results: List[Dict[str, Any]] = [{} for _ in items]
+    ids = [str(it.get('client_id') or '') for it in items]
+    amounts = _parse_amounts([str(it.get('amount') or '') for it in items])
+    now = datetime.now()
+    dates = _parse_dates([str(it.get('date') or now.strftime("%Y-%m-%d %H:%M")).replace('T', ' ')[:16]
+                          for it in items])
+
+    existing = set()
+    well_formed = [c for c in ids if CLIENT_ID_RE.match(c)]
+    if well_formed:
+        existing = {x['client_id'] for x in expenses_col.find(
+            {"user": user, "client_id": {"$in": well_formed}}, {"_id": 0, "client_id": 1})}
+
+    docs, positions = [], []
+    for i, it in enumerate(items):
+        cid = ids[i]
+        results[i]['client_id'] = cid
+        if not CLIENT_ID_RE.match(cid):
+            results[i].update(status='invalid', error='missing or malformed client_id')
+            continue
+        if cid in existing:
+            results[i]['status'] = 'duplicate'
+            continue
+        if not np.isfinite(amounts[i]) or amounts[i] <= 0:
+            results[i].update(status='invalid', error='invalid amount')
+            continue
+        if not dates[i]:
+            results[i].update(status='invalid', error='invalid date')
+            continue
+        existing.add(cid)
+
+        amount = float(amounts[i])
+        merchant = str(it.get('merchant') or '').strip()
+        note = str(it.get('note') or '').strip()
+        category = str(it.get('category') or '').strip() or categorize("\n".join(filter(None, [merchant, note])))
+        text_blob = "\n".join(filter(None, [merchant, note, f"Category: {category}"]))
+        docs.append({
+            'user': user,
+            'filename': None,
+            'category': category,
+            'amount': amount,
+            'text': text_blob,
+            'date': dates[i],
+            'merchant': merchant,
+            'note': note,
+            'assessment': assess(category, amount, text_blob)[0],
+            'source': 'offline',
+            'client_id': cid,
+            'created_at': now,
+            'fingerprints': fingerprints(amount, dates[i], merchant or note),
+            'search_prefixes': search_prefixes(merchant, note, category),
+        })
+        positions.append(i)
+
+    failed = {}
+    if docs:
+        try:
+            expenses_col.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # 11000: a concurrent replay of the same client_id won the race
+            for err in e.details.get("writeErrors", []):
+                failed[err.get("index", 0)] = err
+    for j, (i, doc) in enumerate(zip(positions, docs)):
+        err = failed.get(j)
+        if err is None:
+            results[i].update(status='created', id=str(doc['_id']))
+        elif err.get("code") == 11000:
+            results[i]['status'] = 'duplicate'
+        else:
+            results[i].update(status='error', error=err.get("errmsg", "write error"))
+
+    counts = {s: sum(1 for r in results if r.get('status') == s) for s in ('created', 'duplicate', 'invalid', 'error')}
+    return {"results": results, **counts}
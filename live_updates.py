@@ -0,0 +1,191 @@
+"""Per-user live updates pushed to open dashboards over Server-Sent Events.
+
+Write routes publish a compact change (the refreshed month summary and
+category totals) once; every tab the user has open receives it instead of
+re-fetching and re-computing the summary itself.
+
+The broker is pluggable: MemoryBroker fans out within one process (and is
+what tests/benchmarks use), RedisBroker relays through Redis pub/sub so
+several workers share the same channels.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, Optional, Set
+import hashlib
+import json
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger('expenses.live')
+
+HEARTBEAT_SECONDS = 15
+SUBSCRIBER_QUEUE = 64
+
+
+class Subscription:
+    def __init__(self, broker, channel: str, maxsize: int = SUBSCRIBER_QUEUE):
+        self.broker = broker
+        self.channel = channel
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+
+    def deliver(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # A stalled client only needs the latest state; drop the oldest change
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.queue.put_nowait(message)
+
+    def get(self, timeout: float) -> Optional[str]:
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class MemoryBroker:
+    """In-process fan-out; enough for a single worker"""
+
+    def __init__(self):
+        self._subs: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str) -> Subscription:
+        sub = Subscription(self, channel)
+        with self._lock:
+            self._subs.setdefault(channel, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subs.get(sub.channel)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.channel]
+
+    def subscribers(self, channel: str) -> int:
+        with self._lock:
+            return len(self._subs.get(channel, ()))
+
+    def publish(self, channel: str, message: str):
+        with self._lock:
+            subs = list(self._subs.get(channel, ()))
+        for sub in subs:
+            sub.deliver(message)
+
+
+class RedisBroker(MemoryBroker):
+    """Relays through Redis pub/sub so a change on one worker reaches streams on every worker"""
+
+    PREFIX = 'live:'
+
+    def __init__(self, url: str):
+        import redis
+        super().__init__()
+        self._r = redis.Redis.from_url(url)
+        self._pubsub = self._r.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.psubscribe(**{self.PREFIX + '*': self._on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def _on_message(self, msg):
+        channel = msg['channel'].decode()[len(self.PREFIX):]
+        MemoryBroker.publish(self, channel, msg['data'].decode())
+
+    def subscribers(self, channel: str) -> int:
+        # Listeners may be on other workers
+        return 1
+
+    def publish(self, channel: str, message: str):
+        self._r.publish(self.PREFIX + channel, message)
+
+
+def channel_for(user: str) -> str:
+    return hashlib.sha256(user.encode()).hexdigest()[:32]
+
+
+def sse_frame(event: str, data: Any, event_id: Optional[str] = None) -> str:
+    head = f"id: {event_id}\n" if event_id else ''
+    return f"{head}event: {event}\ndata: {json.dumps(data, default=str, separators=(',', ':'))}\n\n"
+
+
+class LiveUpdates:
+    def __init__(self, broker, max_streams_per_user: int = 5, workers: int = 2):
+        self.broker = broker
+        self.max_streams_per_user = max_streams_per_user
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='live')
+        self._open: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, user: str, event: str, build: Callable[[], Dict[str, Any]]):
+        """Build and push a change off the request thread, skipping the work when nobody listens"""
+        channel = channel_for(user)
+        if not self.broker.subscribers(channel):
+            return
+
+        def run():
+            try:
+                self.broker.publish(channel, sse_frame(event, build(), event_id=str(time.time_ns())))
+            except Exception:
+                log.exception('Live update publish failed')
+
+        self._pool.submit(run)
+
+    def stream(self, user: str, hello: Dict[str, Any], heartbeat: float = HEARTBEAT_SECONDS) -> Optional['EventStream']:
+        """SSE body for one client, or None when the user already has too many open.
+
+        The slot is held until the server closes the response (WSGI calls
+        close() even when the body is never iterated, e.g. for HEAD), and the
+        broker subscription only exists while the body is being read.
+
+        The stream never ends on its own, so it needs a threaded or gevent
+        worker (gunicorn --threads N / -k gevent); under sync workers every
+        open tab occupies a whole worker.
+        """
+        with self._lock:
+            if self._open.get(user, 0) >= self.max_streams_per_user:
+                return None
+            self._open[user] = self._open.get(user, 0) + 1
+
+        def release():
+            with self._lock:
+                self._open[user] -= 1
+                if not self._open[user]:
+                    del self._open[user]
+
+        def gen():
+            sub = self.broker.subscribe(channel_for(user))
+            try:
+                yield f"retry: 5000\n\n{sse_frame('hello', hello)}"
+                while True:
+                    msg = sub.get(timeout=heartbeat)
+                    # Comment lines keep proxies from closing an idle stream
+                    yield msg if msg is not None else ": ping\n\n"
+            finally:
+                sub.close()
+
+        return EventStream(gen(), release)
+
+
+class EventStream:
+    """Iterable SSE body whose close() releases the per-user slot exactly once"""
+
+    def __init__(self, gen: Iterator[str], release: Callable[[], None]):
+        self._gen = gen
+        self._release: Optional[Callable[[], None]] = release
+
+    def __iter__(self) -> Iterator[str]:
+        return self._gen
+
+    def close(self):
+        self._gen.close()
+        release, self._release = self._release, None
+        if release:
+            release()
@@ -0,0 +1,150 @@
+"""Structured JSON logging with a queue-backed, non-blocking handler.
+
+Request handlers only enqueue records; a background listener thread does
+the actual write to stdout. Every record carries the request id, receipt
+text and similar fields are redacted, and chatty events can be sampled
+with extra={'sample_rate': 0.05}.
+"""
+from typing import Optional
+import atexit
+import copy
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+
+LOGGER_NAME = 'expenses'
+
+# Fields never written verbatim
+REDACT_FIELDS = {'text', 'receipt_text', 'extracted_text', 'password', 'content', 'message_text'}
+# Fields holding email addresses, which are masked
+EMAIL_FIELDS = {'user', 'email'}
+
+_STD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('request_id', default=None)
+
+
+def mask_email(value: str) -> str:
+    name, _, domain = str(value).partition('@')
+    if not domain:
+        return name[:2] + '***'
+    return f"{name[:2]}***@{domain}"
+
+
+class ContextFilter(logging.Filter):
+    """Attach the request id, apply sampling and redact sensitive fields"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, 'sample_rate', None)
+        if rate is not None and random.random() >= float(rate):
+            return False
+        record.request_id = request_id_var.get()
+        for key in REDACT_FIELDS:
+            if key in record.__dict__:
+                val = record.__dict__[key]
+                record.__dict__[key] = f"[redacted {len(val)} chars]" if isinstance(val, str) else '[redacted]'
+        for key in EMAIL_FIELDS:
+            if isinstance(record.__dict__.get(key), str):
+                record.__dict__[key] = mask_email(record.__dict__[key])
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            out['request_id'] = record.request_id
+        for k, v in record.__dict__.items():
+            if k not in _STD_ATTRS and k != 'sample_rate' and not k.startswith('_'):
+                out[k] = v
+        if record.exc_info:
+            out['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            out['exc'] = record.exc_text
+        return json.dumps(out, default=str, ensure_ascii=False)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never block the caller: when the queue is full the record is dropped and counted"""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # Keep the traceback in its own field rather than folded into the message
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: Optional[str] = None, queue_size: int = 10000) -> logging.Logger:
+    """Route the app's loggers through a bounded queue to a JSON stdout writer (idempotent)"""
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    if _listener is not None:
+        return logger
+
+    q: queue.Queue = queue.Queue(maxsize=queue_size)
+    qh = DroppingQueueHandler(q)
+    qh.addFilter(ContextFilter())
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter())
+    _listener = logging.handlers.QueueListener(q, stream, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    logger.setLevel((level or os.getenv('LOG_LEVEL', 'INFO')).upper())
+    logger.handlers = [qh]
+    logger.propagate = False
+    return logger
+
+
+def init_app(app):
+    """Assign each request an id (honouring a sane incoming X-Request-ID) and echo it back"""
+    from flask import g, request
+
+    @app.before_request
+    def _assign_request_id():
+        rid = request.headers.get('X-Request-ID', '')
+        if not _REQUEST_ID_RE.match(rid):
+            rid = uuid.uuid4().hex
+        g.request_id = rid
+        request_id_var.set(rid)
+
+    @app.after_request
+    def _echo_request_id(response):
+        rid = getattr(g, 'request_id', None)
+        if rid:
+            response.headers['X-Request-ID'] = rid
+        return response
+
+    @app.teardown_request
+    def _clear_request_id(_exc):
+        request_id_var.set(None)
@@ -0,0 +1,214 @@
+"""Retention and compaction for chat history and receipt text.
+
+Meant to run on a schedule (cron, a k8s CronJob), e.g. nightly:
+
+    python maintenance.py              # apply retention, summarise, compact, report
+    python maintenance.py --dry-run    # only report what would change
+    python maintenance.py --compact    # also run MongoDB `compact` to hand space back to the OS
+
+Each run:
+  * keeps a TTL index on chats.created_at (CHAT_RETENTION_DAYS) as a backstop
+    for history the job never gets to, backfilling created_at on old messages;
+  * folds messages older than CHAT_SUMMARIZE_AFTER_DAYS into one compact
+    chat_summaries document per user (read by get_user_context) and deletes them;
+  * re-compresses receipt text older than OCR_COMPACT_AFTER_DAYS at the highest level;
+  * fingerprints expenses that predate duplicate detection, and gives them
+    the search_prefixes prefix search matches on;
+  * reports collection sizes before and after, i.e. the space reclaimed.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+import os
+import re
+import sys
+
+from dedupe import backfill_fingerprints
+from receipt_store import ReceiptTextStore, migrate_inline_text
+from search import backfill_search_prefixes
+
+CHAT_TTL_INDEX = 'chat_retention_ttl'
+CHATS, SUMMARIES, RECEIPT_TEXTS = 'chats', 'chat_summaries', 'receipt_texts'
+REPORTED = ['chats', 'chat_summaries', 'receipt_texts', 'expenses']
+
+TOPICS_KEPT = 20
+QUESTIONS_KEPT = 5
+QUESTION_CHARS = 160
+
+_WORD = re.compile(r"[a-z]{4,}")
+STOPWORDS = {
+    'what', 'when', 'where', 'which', 'with', 'this', 'that', 'have', 'from', 'your', 'about', 'would',
+    'could', 'should', 'there', 'their', 'them', 'they', 'much', 'many', 'more', 'most', 'some', 'does',
+    'spend', 'spent', 'spending', 'please', 'want', 'need', 'like', 'tell', 'show', 'give', 'help', 'into',
+    'been', 'will', 'than', 'then', 'also', 'just', 'only', 'make', 'over', 'last', 'next', 'month',
+}
+
+
+def config_from_env(environ=os.environ) -> Dict[str, int]:
+    cfg = {
+        'retention_days': int(environ.get('CHAT_RETENTION_DAYS', '180')),
+        'summarize_after_days': int(environ.get('CHAT_SUMMARIZE_AFTER_DAYS', '30')),
+        'ocr_compact_after_days': int(environ.get('OCR_COMPACT_AFTER_DAYS', '30')),
+    }
+    if cfg['summarize_after_days'] >= cfg['retention_days']:
+        # The TTL monitor would delete messages before they are summarised
+        raise ValueError("CHAT_SUMMARIZE_AFTER_DAYS must be smaller than CHAT_RETENTION_DAYS")
+    return cfg
+
+
+def ensure_chat_ttl(chats, retention_days: int) -> str:
+    """Create the TTL index, or change its expiry in place when the retention changed"""
+    seconds = retention_days * 86400
+    current = chats.index_information().get(CHAT_TTL_INDEX)
+    if current is None:
+        chats.create_index([('created_at', 1)], name=CHAT_TTL_INDEX, expireAfterSeconds=seconds)
+        return 'created'
+    if current.get('expireAfterSeconds') != seconds:
+        chats.database.command('collMod', chats.name,
+                               index={'name': CHAT_TTL_INDEX, 'expireAfterSeconds': seconds})
+        return 'updated'
+    return 'unchanged'
+
+
+def backfill_chat_timestamps(chats) -> int:
+    """Give messages saved before created_at existed a real date, parsed from their `date` string"""
+    # `date` was written in the server's local time; created_at is UTC like every BSON date
+    offset = datetime.now().astimezone().strftime('%z')
+    res = chats.update_many({'created_at': {'$exists': False}}, [{'$set': {'created_at': {
+        '$dateFromString': {'dateString': '$date', 'format': '%Y-%m-%d %H:%M', 'timezone': offset,
+                            'onError': '$$NOW', 'onNull': '$$NOW'}
+    }}}])
+    return res.modified_count
+
+
+def summarize_messages(messages: Iterable[Dict[str, Any]], previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Fold chat messages (oldest first) into a compact summary, extending `previous`"""
+    prev = previous or {}
+    topics = Counter(prev.get('topics') or {})
+    questions: List[str] = list(prev.get('recent_questions') or [])
+    count = int(prev.get('messages') or 0)
+    first_at, last_at = prev.get('first_at'), prev.get('last_at')
+    for m in messages:
+        count += 1
+        first_at = first_at or m.get('created_at')
+        last_at = m.get('created_at') or last_at
+        if m.get('role') != 'user':
+            continue
+        text = (m.get('text') or '').strip()
+        topics.update(w for w in _WORD.findall(text.lower()) if w not in STOPWORDS)
+        if text:
+            questions.append(text[:QUESTION_CHARS])
+    top = dict(topics.most_common(TOPICS_KEPT))
+    questions = questions[-QUESTIONS_KEPT:]
+
+    parts = [f"{count} earlier messages"]
+    if first_at and last_at:
+        parts[0] += f" between {first_at:%d %b %Y} and {last_at:%d %b %Y}"
+    if top:
+        parts.append("Frequent topics: " + ', '.join(list(top)[:10]))
+    if questions:
+        parts.append("Recent questions: " + '; '.join(f'"{q}"' for q in questions))
+    return {'messages': count, 'first_at': first_at, 'last_at': last_at, 'topics': top,
+            'recent_questions': questions, 'text': '. '.join(parts) + '.'}
+
+
+def summarize_old_chats(db, before: datetime, dry_run: bool = False, batch: int = 1000) -> Dict[str, int]:
+    """Replace each user's messages older than `before` with their chat_summaries document"""
+    chats, summaries = db[CHATS], db[SUMMARIES]
+    users = chats.distinct('user', {'created_at': {'$lt': before}})
+    folded = deleted = freed = 0
+    for user in users:
+        prev = summaries.find_one({'user': user}) or {}
+        old = list(chats.find({'user': user, 'created_at': {'$lt': before}},
+                              {'role': 1, 'text': 1, 'created_at': 1}).sort('created_at', 1))
+        # Messages at or before last_at were folded by a run that stopped before deleting them
+        fresh = [m for m in old if not prev.get('last_at') or m['created_at'] > prev['last_at']]
+        freed += sum(len((m.get('text') or '').encode('utf-8')) for m in old)
+        folded += len(fresh)
+        deleted += len(old)
+        if dry_run:
+            continue
+        if fresh:
+            summary = summarize_messages(fresh, prev)
+            summaries.update_one({'user': user}, {'$set': {**summary, 'updated_at': datetime.utcnow()}}, upsert=True)
+        ids = [m['_id'] for m in old]
+        for i in range(0, len(ids), batch):
+            chats.delete_many({'_id': {'$in': ids[i:i + batch]}})
+        # Cached chat history/ETags are keyed on data_version (see app._bump_data_version)
+        db['users'].update_one({'email': user}, {'$inc': {'data_version': 1}})
+    return {'users': len(users), 'messages_summarized': folded, 'messages_deleted': deleted, 'text_bytes_freed': freed}
+
+
+def storage_stats(db, names: List[str] = REPORTED) -> Dict[str, Dict[str, int]]:
+    out = {}
+    for name in names:
+        try:
+            st = next(db[name].aggregate([{'$collStats': {'storageStats': {}}}]), {}).get('storageStats', {})
+        except Exception:
+            st = {}
+        out[name] = {'count': int(st.get('count', 0)), 'data_bytes': int(st.get('size', 0)),
+                     'storage_bytes': int(st.get('storageSize', 0)), 'index_bytes': int(st.get('totalIndexSize', 0))}
+    return out
+
+
+def run(db, retention_days: int = 180, summarize_after_days: int = 30, ocr_compact_after_days: int = 30,
+        dry_run: bool = False, compact: bool = False) -> Dict[str, Any]:
+    """One maintenance pass; returns a report of what changed and the space reclaimed"""
+    # All stored dates (created_at, ObjectId timestamps) are UTC
+    now = datetime.utcnow()
+    report: Dict[str, Any] = {'started_at': now, 'dry_run': dry_run, 'before': storage_stats(db)}
+    if not dry_run:
+        report['ttl_index'] = ensure_chat_ttl(db[CHATS], retention_days)
+        report['timestamps_backfilled'] = backfill_chat_timestamps(db[CHATS])
+    report['chats'] = summarize_old_chats(db, now - timedelta(days=summarize_after_days), dry_run=dry_run)
+    if not dry_run:
+        store = ReceiptTextStore(db[RECEIPT_TEXTS])
+        report['receipt_text'] = {
+            **migrate_inline_text(db['expenses'], store),
+            **store.compact(now - timedelta(days=ocr_compact_after_days)),
+        }
+        report['fingerprints_backfilled'] = backfill_fingerprints(db['expenses'])
+        report['search_prefixes_backfilled'] = backfill_search_prefixes(db['expenses'])
+        if compact:
+            # WiredTiger keeps freed pages for reuse unless compacted; this blocks the collection
+            report['compact'] = {name: db.command('compact', name).get('bytesFreed', 0)
+                                 for name in (CHATS, RECEIPT_TEXTS, 'expenses')}
+    report['after'] = storage_stats(db)
+    report['reclaimed'] = {
+        name: {k: report['before'][name][k] - report['after'][name][k] for k in ('data_bytes', 'storage_bytes')}
+        for name in report['before']
+    }
+    report['seconds'] = round((datetime.utcnow() - now).total_seconds(), 2)
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"Maintenance {'dry run ' if report['dry_run'] else ''}finished in {report['seconds']}s")
+    for key in ('ttl_index', 'timestamps_backfilled', 'chats', 'receipt_text', 'fingerprints_backfilled',
+                'search_prefixes_backfilled', 'compact'):
+        if key in report:
+            print(f"  {key}: {report[key]}")
+    print(f"\n  {'collection':<16}{'docs':>10}{'data before':>14}{'data after':>14}{'storage freed':>15}")
+    for name, b in report['before'].items():
+        a = report['after'][name]
+        print(f"  {name:<16}{a['count']:>10,}{b['data_bytes']:>14,}{a['data_bytes']:>14,}"
+              f"{report['reclaimed'][name]['storage_bytes']:>15,}")
+
+
+def main(argv: List[str]) -> int:
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    mongo_uri = os.getenv('MONGO_URI')
+    if not mongo_uri:
+        print("No MONGO_URI environment variable set. Please check your .env file.")
+        return 1
+    db = MongoClient(mongo_uri)[os.getenv('MONGO_DB_NAME', 'ai_expenses')]
+    report = run(db, **config_from_env(), dry_run='--dry-run' in argv, compact='--compact' in argv)
+    print_report(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
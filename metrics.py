@@ -0,0 +1,250 @@
+"""In-process request/dependency metrics with a Prometheus text exposition.
+
+Flask routes are timed via init_app(); MongoDB commands through the
+MongoMetrics command listener; anything else (Firestore, LLM, Tesseract)
+through the track() context manager.
+"""
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from pymongo import monitoring
+import contextvars
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50)
+WAIT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ''
+    esc = [(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in items]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in esc) + '}'
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help = name, help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        k = _key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def expose(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        with self._lock:
+            for k, v in self._values.items():
+                yield f'{self.name}{_fmt_labels(k)} {v}'
+
+
+class Gauge:
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help = name, help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        k = _key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def expose(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} gauge'
+        with self._lock:
+            for k, v in self._values.items():
+                yield f'{self.name}{_fmt_labels(k)} {v}'
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.help = name, help_text
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        k = _key(labels)
+        with self._lock:
+            st = self._values.get(k)
+            if st is None:
+                st = self._values[k] = [[0] * len(self.buckets), 0.0, 0]
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    st[0][i] += 1
+            st[1] += value
+            st[2] += 1
+
+    def expose(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        with self._lock:
+            for k, (counts, total, n) in self._values.items():
+                for b, c in zip(self.buckets, counts):
+                    yield f'{self.name}_bucket{_fmt_labels(k, ("le", repr(float(b))))} {c}'
+                yield f'{self.name}_bucket{_fmt_labels(k, ("le", "+Inf"))} {n}'
+                yield f'{self.name}_sum{_fmt_labels(k)} {total}'
+                yield f'{self.name}_count{_fmt_labels(k)} {n}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def expose(self) -> str:
+        lines = []
+        for m in self._metrics:
+            lines.extend(m.expose())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'http_request_duration_seconds', 'Request latency by endpoint'))
+RESPONSE_BYTES = REGISTRY.register(Histogram(
+    'http_response_size_bytes', 'Response body size by endpoint', SIZE_BUCKETS))
+DEP_SECONDS = REGISTRY.register(Histogram(
+    'dependency_call_duration_seconds', 'Duration of calls to MongoDB, Firestore, the LLM and Tesseract'))
+DEP_CALLS = REGISTRY.register(Counter(
+    'dependency_calls_total', 'Calls to external dependencies'))
+DEP_ERRORS = REGISTRY.register(Counter(
+    'dependency_errors_total', 'Failed calls to external dependencies'))
+DEP_CALLS_PER_REQUEST = REGISTRY.register(Histogram(
+    'dependency_calls_per_request', 'Dependency round-trips made while serving one request', COUNT_BUCKETS))
+DEP_SECONDS_PER_REQUEST = REGISTRY.register(Histogram(
+    'dependency_seconds_per_request', 'Time spent in dependencies while serving one request'))
+MONGO_CHECKOUT_SECONDS = REGISTRY.register(Histogram(
+    'mongo_pool_checkout_wait_seconds', 'Time spent waiting for a pooled MongoDB connection', WAIT_BUCKETS))
+MONGO_CHECKOUT_FAILURES = REGISTRY.register(Counter(
+    'mongo_pool_checkout_failures_total', 'Connection checkouts that timed out or failed'))
+MONGO_CONNECTIONS_IN_USE = REGISTRY.register(Gauge(
+    'mongo_pool_connections_in_use', 'MongoDB connections currently checked out'))
+MONGO_CONNECTIONS_OPEN = REGISTRY.register(Gauge(
+    'mongo_pool_connections_open', 'MongoDB connections open in the pool'))
+MONGO_WAIT_QUEUE = REGISTRY.register(Gauge(
+    'mongo_pool_wait_queue', 'Threads waiting to check out a MongoDB connection'))
+WRITE_BUFFER_DEPTH = REGISTRY.register(Gauge(
+    'write_buffer_depth', 'Documents queued in the write-behind buffer'))
+WRITE_BUFFER_FLUSH_SECONDS = REGISTRY.register(Histogram(
+    'write_buffer_flush_seconds', 'Duration of one bulk insert from the write-behind buffer'))
+WRITE_BUFFER_FLUSH_DOCS = REGISTRY.register(Histogram(
+    'write_buffer_flush_documents', 'Documents written per bulk insert', (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)))
+WRITE_BUFFER_ERRORS = REGISTRY.register(Counter(
+    'write_buffer_flush_errors_total', 'Bulk inserts that failed and were requeued'))
+WRITE_BUFFER_DROPPED = REGISTRY.register(Counter(
+    'write_buffer_dropped_total', 'Documents dropped because the buffer was full or could not be written at shutdown'))
+
+# Per-request tallies: {dep: [calls, seconds]}
+_request_deps: contextvars.ContextVar[Optional[Dict[str, list]]] = contextvars.ContextVar('request_deps', default=None)
+
+# Callables (dep, op, seconds, ok) notified of every dependency call, e.g. the profiler
+_listeners: List[Callable[[str, str, float, bool], None]] = []
+
+
+def add_listener(fn: Callable[[str, str, float, bool], None]):
+    _listeners.append(fn)
+
+
+def record(dep: str, op: str, seconds: float, ok: bool = True):
+    DEP_SECONDS.observe(seconds, dep=dep, op=op)
+    DEP_CALLS.inc(dep=dep, op=op)
+    if not ok:
+        DEP_ERRORS.inc(dep=dep, op=op)
+    tally = _request_deps.get()
+    if tally is not None:
+        t = tally.setdefault(dep, [0, 0.0])
+        t[0] += 1
+        t[1] += seconds
+    for fn in _listeners:
+        fn(dep, op, seconds, ok)
+
+
+@contextmanager
+def track(dep: str, op: str):
+    """Time a dependency call: `with track('llm', 'chat'): ...`"""
+    t0 = time.perf_counter()
+    ok = True
+    try:
+        yield
+    except Exception:
+        ok = False
+        raise
+    finally:
+        record(dep, op, time.perf_counter() - t0, ok)
+
+
+class MongoMetrics(monitoring.CommandListener):
+    """PyMongo command listener feeding dependency metrics.
+
+    Events arrive on the thread that issued the command, so the per-request
+    tally context is the right one.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        record('mongo', event.command_name, event.duration_micros / 1e6, True)
+
+    def failed(self, event):
+        record('mongo', event.command_name, event.duration_micros / 1e6, False)
+
+
+def init_app(app, token: Optional[str] = None):
+    """Time every request and expose the registry at /metrics"""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_t0 = time.perf_counter()
+        _request_deps.set({})
+
+    @app.after_request
+    def _metrics_observe(response):
+        t0 = getattr(g, '_metrics_t0', None)
+        if t0 is None:
+            return response
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - t0, endpoint=endpoint,
+                                method=request.method, status=response.status_code)
+        if not response.is_streamed:
+            RESPONSE_BYTES.observe(response.calculate_content_length() or 0, endpoint=endpoint)
+        tally = _request_deps.get() or {}
+        for dep in ('mongo', 'firestore', 'llm', 'tesseract'):
+            calls, secs = tally.get(dep, (0, 0.0))
+            DEP_CALLS_PER_REQUEST.observe(calls, endpoint=endpoint, dep=dep)
+            if calls:
+                DEP_SECONDS_PER_REQUEST.observe(secs, endpoint=endpoint, dep=dep)
+        return response
+
+    @app.teardown_request
+    def _metrics_reset(_exc):
+        _request_deps.set(None)
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        if token and request.headers.get('Authorization') != f'Bearer {token}':
+            return ('', 404)
+        return Response(REGISTRY.expose(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,120 @@
+"""MongoDB index bootstrap and COLLSCAN report.
+
+Run by the app on each worker's first request via ensure_indexes(db), or from the command line:
+
+    python mongo_indexes.py            # create/verify indexes
+    python mongo_indexes.py --explain  # also explain the app's hot queries
+"""
+from typing import Any, Dict, List
+from pymongo.errors import OperationFailure
+import os
+import sys
+
+from search import PREFIX_INDEX, TEXT_INDEX, TEXT_INDEX_WEIGHTS
+
+# collection -> [(keys, options)]
+INDEXES: Dict[str, List[tuple]] = {
+    "users": [
+        ([("email", 1)], {"unique": True}),
+        ([("is_admin", 1)], {"partialFilterExpression": {"is_admin": True}}),
+    ],
+    "expenses": [
+        ([("user", 1), ("date", -1)], {}),
+        ([("user", 1), ("_id", -1)], {}),
+        ([("user", 1), ("fingerprints", 1)], {}),
+        ([("user", 1), ("client_id", 1)], {"unique": True, "partialFilterExpression": {"client_id": {"$exists": True}}}),
+        (PREFIX_INDEX, {}),
+        (TEXT_INDEX, {"name": "expense_text", "weights": TEXT_INDEX_WEIGHTS}),
+    ],
+    "chats": [
+        ([("user", 1), ("date", -1)], {}),
+        ([("user", 1), ("created_at", 1)], {}),
+    ],
+    "chat_summaries": [
+        ([("user", 1)], {"unique": True}),
+    ],
+    "receipt_texts": [
+        ([("user", 1)], {}),
+    ],
+}
+
+# Representative queries from app.py: (name, collection, filter, sort)
+HOT_QUERIES = [
+    ("login/register/settings", "users", {"email": "probe@example.com"}, None),
+    ("admin exists", "users", {"is_admin": True}, None),
+    ("summary/analysis", "expenses", {"user": "probe@example.com"}, None),
+    ("period range", "expenses", {"user": "probe@example.com", "date": {"$gte": "2025-01-01", "$lt": "2025-02-01"}}, [("date", -1)]),
+    ("delete_last/last receipt", "expenses", {"user": "probe@example.com"}, [("_id", -1)]),
+    ("offline replay check", "expenses", {"user": "probe@example.com", "client_id": {"$in": ["x"]}}, None),
+    ("duplicate lookup", "expenses", {"user": "probe@example.com", "fingerprints": {"$in": ["x"]}}, None),
+    ("chat context", "chats", {"user": "probe@example.com"}, [("date", -1)]),
+    ("chat summary", "chat_summaries", {"user": "probe@example.com"}, None),
+]
+
+
+def ensure_indexes(db, verbose: bool = False) -> List[Dict[str, Any]]:
+    """Idempotently create every index in INDEXES; returns one result row per index"""
+    results = []
+    for coll, specs in INDEXES.items():
+        for keys, opts in specs:
+            name = opts.get("name") or "_".join(f"{k}_{d}" for k, d in keys)
+            row = {"collection": coll, "name": name, "ok": True}
+            try:
+                db[coll].create_index(keys, **opts)
+            except OperationFailure as e:
+                # e.g. duplicate emails blocking the unique index, or an older index with other options
+                row.update(ok=False, error=str(e))
+            results.append(row)
+            if verbose:
+                print(f"{'✅' if row['ok'] else '❌'} {coll}.{row['name']}" + ('' if row['ok'] else f": {row['error']}"))
+    return results
+
+
+def _stages(plan: Dict[str, Any]):
+    yield plan.get("stage")
+    if "inputStage" in plan:
+        yield from _stages(plan["inputStage"])
+    for p in plan.get("inputStages", []):
+        yield from _stages(p)
+
+
+def collscan_report(db) -> List[Dict[str, Any]]:
+    """Explain the hot queries and flag any whose winning plan still scans the collection"""
+    report = []
+    for name, coll, flt, sort in HOT_QUERIES:
+        cur = db[coll].find(flt)
+        if sort:
+            cur = cur.sort(sort)
+        plan = cur.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = [s for s in _stages(plan) if s]
+        report.append({"query": name, "collection": coll, "stages": stages, "collscan": "COLLSCAN" in stages})
+    return report
+
+
+def main(argv: List[str]) -> int:
+    from dotenv import load_dotenv
+    from pymongo import MongoClient
+
+    load_dotenv()
+    mongo_uri = os.getenv('MONGO_URI')
+    if not mongo_uri:
+        print("No MONGO_URI environment variable set. Please check your .env file.")
+        return 1
+    db = MongoClient(mongo_uri)[os.getenv('MONGO_DB_NAME', 'ai_expenses')]
+
+    print("Ensuring MongoDB indexes...")
+    results = ensure_indexes(db, verbose=True)
+    status = 0 if all(r["ok"] for r in results) else 1
+
+    if "--explain" in argv:
+        print("\nQuery plans:")
+        for r in collscan_report(db):
+            flag = "❌ COLLSCAN" if r["collscan"] else "✅"
+            print(f"{flag} {r['collection']}: {r['query']} -> {' <- '.join(r['stages'])}")
+            if r["collscan"]:
+                status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
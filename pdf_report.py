@@ -0,0 +1,185 @@
+from reportlab.pdfgen import canvas as _pdf_canvas
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from typing import Any, Dict, Iterable, List, Optional
+
+# Layout constants
+PAGE_WIDTH, PAGE_HEIGHT = A4
+X_MARGIN = 20 * mm
+TOP_MARGIN = 25 * mm
+BOTTOM_MARGIN = 20 * mm
+ROW_HEIGHT = 6 * mm
+CHART_HEIGHT = 60 * mm
+
+# Transaction table columns: (title, x offset from margin, width in characters)
+TABLE_COLUMNS = [
+    ('Date', 0, 16),
+    ('Merchant', 35 * mm, 40),
+    ('Category', 110 * mm, 16),
+    ('Amount', 150 * mm, 14),
+]
+
+
+class ReportWriter:
+    """Thin wrapper around a reportlab canvas that breaks pages automatically"""
+
+    def __init__(self, out, title: str):
+        self.c = _pdf_canvas.Canvas(out, pagesize=A4, pageCompression=1)
+        self.title = title
+        self.page = 1
+        self.y = PAGE_HEIGHT - TOP_MARGIN
+        self._table_header = False
+
+    def ensure_space(self, needed: float):
+        if self.y - needed < BOTTOM_MARGIN:
+            self.new_page()
+
+    def new_page(self):
+        self._footer()
+        self.c.showPage()
+        self.page += 1
+        self.y = PAGE_HEIGHT - TOP_MARGIN
+        self.c.setFont('Helvetica-Oblique', 9)
+        self.c.drawString(X_MARGIN, self.y, self.title)
+        self.y -= 8 * mm
+        if self._table_header:
+            self._draw_table_header()
+
+    def line(self, txt, dy=8 * mm, size=12, bold=False):
+        self.ensure_space(dy)
+        self.c.setFont('Helvetica-Bold' if bold else 'Helvetica', size)
+        self.c.drawString(X_MARGIN, self.y, str(txt))
+        self.y -= dy
+
+    def gap(self, dy=4 * mm):
+        self.y -= dy
+
+    def _footer(self):
+        self.c.setFont('Helvetica', 8)
+        self.c.drawRightString(PAGE_WIDTH - X_MARGIN, BOTTOM_MARGIN / 2, f'Page {self.page}')
+
+    def trend_chart(self, trend: List[Dict[str, Any]]):
+        """Draw a per-day bar chart of spend"""
+        if not trend:
+            self.line('- No expenses in this period', dy=ROW_HEIGHT)
+            return
+        self.ensure_space(CHART_HEIGHT + 10 * mm)
+        chart_w = PAGE_WIDTH - 2 * X_MARGIN
+        base_y = self.y - CHART_HEIGHT
+        peak = max(float(t.get('total') or 0) for t in trend) or 1.0
+        bar_w = chart_w / len(trend)
+
+        self.c.setLineWidth(0.5)
+        self.c.line(X_MARGIN, base_y, X_MARGIN + chart_w, base_y)
+        self.c.setFillColorRGB(0.31, 0.47, 0.86)
+        for i, t in enumerate(trend):
+            h = (float(t.get('total') or 0) / peak) * (CHART_HEIGHT - 6 * mm)
+            self.c.rect(X_MARGIN + i * bar_w + bar_w * 0.1, base_y, bar_w * 0.8, h, stroke=0, fill=1)
+        self.c.setFillColorRGB(0, 0, 0)
+
+        self.c.setFont('Helvetica', 7)
+        self.c.drawString(X_MARGIN, self.y - 3 * mm, f'Peak: ₹{peak:.0f}')
+        self.c.drawString(X_MARGIN, base_y - 4 * mm, str(trend[0].get('date')))
+        self.c.drawRightString(X_MARGIN + chart_w, base_y - 4 * mm, str(trend[-1].get('date')))
+        self.y = base_y - 10 * mm
+
+    def _draw_table_header(self):
+        self.c.setFont('Helvetica-Bold', 10)
+        for title, dx, _ in TABLE_COLUMNS:
+            self.c.drawString(X_MARGIN + dx, self.y, title)
+        self.y -= ROW_HEIGHT
+
+    def table(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Draw transaction rows, repeating the header on each page. Returns row count."""
+        self.ensure_space(2 * ROW_HEIGHT)
+        self._draw_table_header()
+        self._table_header = True
+        count = 0
+        for r in rows:
+            self.ensure_space(ROW_HEIGHT)
+            self.c.setFont('Helvetica', 9)
+            values = (
+                r.get('date'),
+                r.get('merchant'),
+                r.get('category'),
+                f"₹{float(r.get('amount') or 0):.2f}",
+            )
+            for (_, dx, width), val in zip(TABLE_COLUMNS, values):
+                self.c.drawString(X_MARGIN + dx, self.y, str(val or '')[:width])
+            self.y -= ROW_HEIGHT
+            count += 1
+        self._table_header = False
+        if not count:
+            self.line('- No transactions in this period', dy=ROW_HEIGHT)
+        return count
+
+    def save(self):
+        self._footer()
+        self.c.showPage()
+        self.c.save()
+
+
+def render_analysis_report(out, user: str, period: Dict[str, str],
+                           grouped: List[Dict[str, Any]],
+                           trend: List[Dict[str, Any]],
+                           rows: Iterable[Dict[str, Any]],
+                           settings: Optional[dict] = None,
+                           last_receipt: Optional[dict] = None) -> int:
+    """Render the analysis report to `out` (path or file object).
+
+    `rows` is consumed lazily so callers can pass a database cursor without
+    materialising the period. Returns the number of transaction rows drawn.
+    """
+    settings = settings or {}
+    w = ReportWriter(out, f"AI-Expenses Tracker — {user} — {period.get('start')} to {period.get('end')}")
+
+    # Title
+    w.line('AI-Expenses Tracker — Analysis', size=16, bold=True)
+    w.line(f'User: {user}', dy=6 * mm)
+    w.line(f"Period: {period.get('start')} to {period.get('end')}", dy=6 * mm)
+    w.gap()
+
+    # Budget/caps
+    mb = settings.get('monthly_budget')
+    if mb:
+        w.line(f'Monthly Budget: ₹{float(mb):.0f}', dy=6 * mm)
+    caps = settings.get('caps') or {}
+    if caps:
+        w.line('Category Caps:', bold=True)
+        for k, v in caps.items():
+            w.line(f'- {k}: ₹{float(v or 0):.0f}', dy=6 * mm)
+        w.gap()
+
+    # Summary
+    w.line('Summary by Category:', bold=True)
+    if grouped:
+        for x in grouped:
+            w.line(f"- {x.get('_id')}: ₹{float(x.get('total') or 0):.0f}", dy=6 * mm)
+        w.line(f"Total: ₹{sum(float(x.get('total') or 0) for x in grouped):.0f}", dy=6 * mm, bold=True)
+    else:
+        w.line('- No expenses yet', dy=6 * mm)
+    w.gap()
+
+    # Last assessment
+    if last_receipt:
+        w.line('Last Receipt Assessment:', bold=True)
+        w.line(f"- Category: {last_receipt.get('category')} · Amount: ₹{float(last_receipt.get('amount') or 0):.0f}", dy=6 * mm)
+        w.line(f"- Label: {last_receipt.get('assessment')} — {last_receipt.get('reason') or ''}", dy=6 * mm)
+        tips = last_receipt.get('tips') or []
+        if tips:
+            w.line('- Tips:', dy=6 * mm)
+            for t in tips[:5]:
+                w.line(f"  • {t}", dy=6 * mm)
+        w.gap()
+
+    # Daily trend
+    w.line('Daily Spend:', bold=True)
+    w.trend_chart(trend)
+
+    # Transactions
+    w.line('Transactions:', bold=True)
+    count = w.table(rows)
+
+    w.save()
+    return count
+
@@ -0,0 +1,200 @@
+"""Admin-only, per-request sampling profiler and a rolling slow-request log.
+
+A request is profiled when an admin sends `X-Profile: 1` (or `?__profile=1`).
+The request thread's stack is sampled from a helper thread; the result is
+written to PROFILE_DIR as folded stacks (for flamegraph.pl/speedscope), a
+self-contained SVG flamegraph and a JSON file with the DB/HTTP/OCR spans
+recorded through metrics.track()/the Mongo listener.
+"""
+from collections import Counter, deque
+from typing import Any, Callable, Dict, List, Optional
+from xml.sax.saxutils import escape
+import contextvars
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+import metrics
+
+DEFAULT_INTERVAL = 0.005
+MAX_DEPTH = 128
+
+_spans: contextvars.ContextVar[Optional[List[dict]]] = contextvars.ContextVar('profile_spans', default=None)
+
+
+def _on_dependency(dep: str, op: str, seconds: float, ok: bool):
+    spans = _spans.get()
+    if spans is not None:
+        spans.append({'dep': dep, 'op': op, 'end': time.perf_counter(), 'seconds': seconds, 'ok': ok})
+
+
+metrics.add_listener(_on_dependency)
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack at a fixed interval"""
+
+    def __init__(self, thread_id: int, interval: float = DEFAULT_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self) -> str:
+        return '\n'.join(f"{stack} {n}" for stack, n in self.stacks.most_common()) + '\n'
+
+
+def render_flamegraph(stacks: Counter, spans: List[dict], title: str, elapsed: float,
+                      width: int = 1200, row: int = 16) -> str:
+    """Minimal SVG flamegraph with a span timeline across the top"""
+    total = sum(stacks.values()) or 1
+    tree: Dict[str, Any] = {'n': 0, 'kids': {}}
+    for stack, n in stacks.items():
+        node = tree
+        node['n'] += n
+        for fn in stack.split(';'):
+            node = node['kids'].setdefault(fn, {'n': 0, 'kids': {}})
+            node['n'] += n
+
+    rects = []
+    max_depth = [0]
+
+    def walk(node, x, depth):
+        max_depth[0] = max(max_depth[0], depth)
+        for name, kid in sorted(node['kids'].items()):
+            w = kid['n'] / total * width
+            if w >= 0.5:
+                rects.append((x, depth, w, name, kid['n']))
+                walk(kid, x, depth + 1)
+            x += w
+
+    walk(tree, 0.0, 0)
+
+    span_rows = 2 if spans else 0
+    top = 24 + span_rows * row
+    height = top + (max_depth[0] + 1) * row + 10
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="monospace" font-size="11">',
+           f'<text x="4" y="14">{escape(title)} — {elapsed * 1000:.1f} ms, {total} samples</text>']
+    colors = {'mongo': '#3a9d5d', 'firestore': '#f5a623', 'llm': '#9b59b6', 'tesseract': '#e74c3c'}
+    t0 = min((s['end'] - s['seconds'] for s in spans), default=0)
+    for s in spans:
+        x = (s['end'] - s['seconds'] - t0) / max(elapsed, 1e-9) * width
+        w = max(s['seconds'] / max(elapsed, 1e-9) * width, 1)
+        out.append(f'<rect x="{x:.1f}" y="20" width="{w:.1f}" height="{row * 2 - 2}" fill="{colors.get(s["dep"], "#888")}">'
+                   f'<title>{escape(s["dep"])} {escape(s["op"])} {s["seconds"] * 1000:.2f} ms</title></rect>')
+    for x, depth, w, name, n in rects:
+        y = height - 10 - (depth + 1) * row
+        hue = 20 + (hash(name) % 40)
+        out.append(f'<g><title>{escape(name)} ({n} samples, {n / total * 100:.1f}%)</title>'
+                   f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row - 1}" fill="hsl({hue},80%,60%)"/>')
+        if w > 40:
+            out.append(f'<text x="{x + 2:.1f}" y="{y + row - 4}">{escape(name[:int(w / 7)])}</text>')
+        out.append('</g>')
+    out.append('</svg>')
+    return '\n'.join(out)
+
+
+class SlowLog:
+    """Recent requests, from which the slowest N are reported"""
+
+    def __init__(self, keep: int = 2000):
+        self._recent = deque(maxlen=keep)
+        self._lock = threading.Lock()
+
+    def add(self, entry: Dict[str, Any]):
+        with self._lock:
+            self._recent.append(entry)
+
+    def slowest(self, n: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = list(self._recent)
+        return sorted(items, key=lambda e: -e['ms'])[:n]
+
+
+_SAFE = re.compile(r'[^A-Za-z0-9_-]+')
+
+
+def init_app(app, is_admin: Callable[[], bool], directory: str, slow_log: SlowLog,
+             interval: float = DEFAULT_INTERVAL):
+    """Profile flagged admin requests and record every request in `slow_log`"""
+    from flask import g, request
+
+    os.makedirs(directory, exist_ok=True)
+
+    @app.before_request
+    def _profile_start():
+        g._profile_t0 = time.perf_counter()
+        flag = request.headers.get('X-Profile') == '1' or request.args.get('__profile') == '1'
+        if flag and is_admin():
+            _spans.set([])
+            g._profiler = SamplingProfiler(threading.get_ident(), interval)
+            g._profiler.start()
+
+    @app.after_request
+    def _profile_finish(response):
+        t0 = getattr(g, '_profile_t0', None)
+        if t0 is None:
+            return response
+        entry = {
+            'ms': round((time.perf_counter() - t0) * 1000, 2),
+            'endpoint': request.url_rule.rule if request.url_rule else request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'request_id': getattr(g, 'request_id', None),
+            'profile': None,
+        }
+        prof = g.pop('_profiler', None)
+        if prof is not None:
+            prof.stop()
+            spans = _spans.get() or []
+            _spans.set(None)
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{_SAFE.sub('_', entry['endpoint']).strip('_')}-{entry['request_id'] or os.getpid()}"
+            base = os.path.join(directory, name)
+            with open(base + '.folded', 'w') as fh:
+                fh.write(prof.folded())
+            with open(base + '.svg', 'w') as fh:
+                fh.write(render_flamegraph(prof.stacks, spans, f"{entry['method']} {entry['endpoint']}", prof.elapsed))
+            with open(base + '.json', 'w') as fh:
+                json.dump({**entry, 'samples': prof.samples,
+                           'spans': [{k: s[k] for k in ('dep', 'op', 'seconds', 'ok')} for s in spans]}, fh)
+            entry['profile'] = name
+            response.headers['X-Profile-Id'] = name
+        slow_log.add(entry)
+        return response
+
+    @app.teardown_request
+    def _profile_teardown(exc):
+        # after_request is skipped when the view raises; never leave the sampler
+        # running or the spans attached to the thread's next request
+        prof = g.pop('_profiler', None)
+        if prof is not None:
+            prof.stop()
+        _spans.set(None)
@@ -0,0 +1,153 @@
+"""Pure helpers applied to OCR text and stored expense dates.
+
+Kept free of Flask/Mongo state so they can be benchmarked in isolation
+(see benchmarks/bench_receipt_parsing.py).
+"""
+from datetime import datetime
+import re
+
+# Stored merchant names and the keys duplicate checks compare are this long
+MERCHANT_CHARS = 40
+
+_LETTERS = re.compile(r"[A-Za-z]{3,}")
+_PAGE_MARKER = re.compile(r"^(-+\s*)?page\b", re.I)
+_NON_ALPHA = re.compile(r"[^a-z ]+")
+_SPACES = re.compile(r"\s+")
+
+
+def _merchant_line(text: str) -> str:
+    for line in (text or '').splitlines():
+        line = line.strip()
+        if line and not _PAGE_MARKER.match(line) and _LETTERS.search(line):
+            return line
+    return ''
+
+
+def extract_merchant(text: str) -> str:
+    """First line of OCR text that reads like a name (skips page markers and numeric lines)"""
+    return _merchant_line(text)[:MERCHANT_CHARS]
+
+
+def merchant_key(text: str) -> str:
+    """The merchant line lowercased with digits and punctuation removed; what fingerprints and import dedupe compare"""
+    return _SPACES.sub(' ', _NON_ALPHA.sub(' ', _merchant_line(text).lower())).strip()[:MERCHANT_CHARS]
+
+
+def categorize_expense(text):
+    text = text.lower()
+    categories = {
+        "Food": ["food", "restaurant", "burger", "pizza", "hotel", "meal", "snack", "biryani"],
+        "Travel": ["uber", "ola", "train", "flight", "bus", "taxi", "petrol", "fuel"],
+        "Entertainment": ["movie", "cinema", "netflix", "prime", "game", "music"],
+        "Bills": ["electricity", "water", "mobile", "internet", "wifi"],
+        "Shopping": ["amazon", "flipkart", "mall", "clothes", "store"],
+        "Health": ["pharmacy", "hospital", "doctor", "medical"],
+    }
+    for cat, words in categories.items():
+        if any(w in text for w in words):
+            return cat
+    return "Misc"
+
+def assess_expense(category, amount, text):
+    text_l = (text or "").lower()
+    wanted = True
+    reason = ""
+    tips = []
+
+    if category in ("Bills", "Health", "Travel"):
+        wanted = True
+        reason = f"{category} is generally a necessary expense."
+        if category == "Bills":
+            tips.append("Review recurring plans to eliminate unused subscriptions.")
+        if category == "Health":
+            tips.append("Compare pharmacies or use generics to reduce costs.")
+    elif category in ("Entertainment", "Shopping"):
+        wanted = False
+        reason = f"{category} is usually discretionary."
+        tips.append("Set a monthly cap for discretionary categories.")
+        tips.append("Delay non-urgent purchases by 24 hours to curb impulse buys.")
+    elif category == "Food":
+        if any(k in text_l for k in ["restaurant", "hotel", "pizza", "burger", "biryani"]):
+            wanted = False
+            reason = "Eating out is discretionary compared to groceries."
+            tips.append("Meal plan and cook at home more often.")
+        else:
+            wanted = True
+            reason = "Groceries are generally necessary."
+    else:
+        wanted = amount < 500
+        reason = "Small purchases may be okay; larger ones may be avoidable."
+
+    if amount >= 2000 and category in ("Entertainment", "Shopping"):
+        tips.append("High spend detected. Consider reducing frequency or finding cheaper alternatives.")
+    if amount >= 5000:
+        tips.append("Set aside an emergency buffer before large discretionary spends.")
+
+    assessment = "Wanted" if wanted else "Unwanted"
+    return assessment, reason, tips
+
+def extract_total_amount(text: str) -> float:
+    try:
+        lines = [ln.strip() for ln in (text or "").splitlines() if ln.strip()]
+        keyword_patterns = [
+            r"grand\s*total",
+            r"total\s*amount",
+            r"amount\s*payable",
+            r"net\s*total",
+            r"balance\s*due",
+            r"total$",
+            r"total\s*:"
+        ]
+        amount_pattern = r"(?:(?:₹|rs\.?)[\s:]*)?([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{1,2})?|[0-9]+(?:\.[0-9]{1,2})?)"
+
+        def to_float(s: str):
+            try:
+                return float(s.replace(',', ''))
+            except Exception:
+                return None
+
+        for ln in reversed(lines):
+            low = ln.lower()
+            if any(re.search(k, low, re.IGNORECASE) for k in keyword_patterns):
+                m = re.search(amount_pattern, ln, re.IGNORECASE)
+                if m:
+                    val = to_float(m.group(1))
+                    if val is not None:
+                        return val
+
+        currency_amounts = list(re.finditer(r"(?:₹|rs\.?)[\s:]*([0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{1,2})?|[0-9]+(?:\.[0-9]{1,2})?)", text, re.IGNORECASE))
+        if currency_amounts:
+            val = to_float(currency_amounts[-1].group(1))
+            if val is not None:
+                return val
+
+        candidates = []
+        for m in re.finditer(r"[0-9]{1,3}(?:,[0-9]{3})*(?:\.[0-9]{1,2})?|[0-9]+(?:\.[0-9]{1,2})?", text):
+            s = m.group(0)
+            if len(re.sub(r"[^0-9]", "", s)) >= 10 and (',' not in s and '.' not in s):
+                continue
+            val = to_float(s)
+            if val is None:
+                continue
+            if 1 <= val <= 1_000_000:
+                candidates.append(val)
+        if candidates:
+            return max(candidates)
+
+        return 0.0
+    except Exception:
+        return 0.0
+
+def parse_doc_date(s: str) -> datetime:
+    try:
+        return datetime.strptime(str(s), "%Y-%m-%d %H:%M")
+    except Exception:
+        return datetime.now()
+
+def month_bounds(dt: datetime):
+    start = datetime(dt.year, dt.month, 1)
+    if dt.month == 12:
+        end = datetime(dt.year + 1, 1, 1)
+    else:
+        end = datetime(dt.year, dt.month + 1, 1)
+    return start, end
@@ -0,0 +1,166 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from bson import ObjectId
+from bson.binary import Binary
+from pymongo import UpdateOne
+import re
+import zlib
+
+from receipt_parsing import MERCHANT_CHARS, extract_merchant
+
+try:
+    import zstandard as _zstd
+except ImportError:  # zlib is always available; zstd is used when installed
+    _zstd = None
+
+MAX_KEYWORDS = 60
+
+# Projection expression for `merchant` that falls back to the first line of
+# inline text on rows migrate_inline_text has not reached yet. Evaluated
+# server-side (MongoDB 4.4+), so only the 40 characters travel, never the text.
+MERCHANT_PROJECTION = {"$let": {
+    "vars": {"m": {"$ifNull": ["$merchant", ""]}},
+    "in": {"$cond": [
+        {"$ne": ["$$m", ""]},
+        "$$m",
+        {"$substrCP": [{"$arrayElemAt": [{"$split": [{"$ifNull": ["$text", ""]}, "\n"]}, 0]}, 0, MERCHANT_CHARS]}
+    ]}
+}}
+
+_WORD = re.compile(r"[a-z]{2,}")
+
+
+def extract_keywords(text: str) -> str:
+    """Distinct words of the receipt, capped, kept inline for the text index"""
+    seen = []
+    for w in _WORD.findall((text or '').lower()):
+        if w not in seen:
+            seen.append(w)
+            if len(seen) >= MAX_KEYWORDS:
+                break
+    return ' '.join(seen)
+
+
+def _compress(text: str, best: bool = False):
+    # Uploads favour speed; compact() re-packs old text at the highest levels
+    raw = text.encode('utf-8')
+    if _zstd is not None:
+        return 'zstd', _zstd.ZstdCompressor(level=19 if best else 6).compress(raw)
+    return 'zlib', zlib.compress(raw, 9 if best else 6)
+
+
+def _decompress(codec: str, data: bytes) -> str:
+    if codec == 'zstd':
+        if _zstd is None:
+            raise RuntimeError('zstandard is required to read this receipt text')
+        return _zstd.ZstdDecompressor().decompress(data).decode('utf-8')
+    if codec == 'zlib':
+        return zlib.decompress(data).decode('utf-8')
+    return bytes(data).decode('utf-8')
+
+
+class ReceiptTextStore:
+    """Compressed OCR text kept out of the expenses collection, referenced by text_id"""
+
+    def __init__(self, col):
+        self.col = col
+
+    def put(self, user: str, text: str):
+        codec, data = _compress(text or '')
+        res = self.col.insert_one({'user': user, 'codec': codec, 'size': len(text or ''), 'data': Binary(data)})
+        return res.inserted_id
+
+    def get(self, text_id) -> str:
+        if not text_id:
+            return ''
+        doc = self.col.find_one({'_id': text_id})
+        return _decompress(doc['codec'], doc['data']) if doc else ''
+
+    def get_many(self, text_ids: List[Any]) -> Dict[Any, str]:
+        return {d['_id']: _decompress(d['codec'], d['data'])
+                for d in self.col.find({'_id': {'$in': [t for t in text_ids if t]}})}
+
+    def attach(self, docs: Iterable[dict], batch: int = 500) -> Iterator[dict]:
+        """Fill in doc['text'] for a stream of expenses with one lookup per batch"""
+        buf: List[dict] = []
+        for d in docs:
+            buf.append(d)
+            if len(buf) >= batch:
+                yield from self._attach_batch(buf)
+                buf = []
+        if buf:
+            yield from self._attach_batch(buf)
+
+    def _attach_batch(self, docs: List[dict]) -> List[dict]:
+        texts = self.get_many([d.get('text_id') for d in docs])
+        for d in docs:
+            if d.get('text_id'):
+                d['text'] = texts.get(d['text_id'], '')
+            d.pop('text_id', None)
+        return docs
+
+    def delete(self, text_ids: List[Any]):
+        ids = [t for t in text_ids if t]
+        if ids:
+            self.col.delete_many({'_id': {'$in': ids}})
+
+    def delete_for_user(self, user: str) -> int:
+        return self.col.delete_many({'user': user}).deleted_count
+
+    def compact(self, before: datetime, batch: int = 500) -> Dict[str, int]:
+        """Re-compress text stored before `before` at the highest level; each blob is visited once"""
+        query = {'_id': {'$lt': ObjectId.from_datetime(before)}, 'compacted': {'$exists': False}}
+        seen = bytes_before = bytes_after = 0
+        ops = []
+        for d in self.col.find(query, {'codec': 1, 'data': 1}).batch_size(batch):
+            old = len(d['data'])
+            codec, data = _compress(_decompress(d['codec'], d['data']), best=True)
+            update: Dict[str, Any] = {'compacted': True}
+            if len(data) < old:
+                update.update(codec=codec, data=Binary(data))
+            ops.append(UpdateOne({'_id': d['_id']}, {'$set': update}))
+            seen += 1
+            bytes_before += old
+            bytes_after += min(len(data), old)
+            if len(ops) >= batch:
+                self.col.bulk_write(ops, ordered=False)
+                ops = []
+        if ops:
+            self.col.bulk_write(ops, ordered=False)
+        return {'compacted': seen, 'bytes_before': bytes_before, 'bytes_after': bytes_after}
+
+
+def text_for(expense: dict, store: ReceiptTextStore) -> str:
+    """Receipt text for an expense, whether stored inline (legacy/manual) or in the blob store"""
+    if expense.get('text_id'):
+        return store.get(expense['text_id'])
+    return expense.get('text') or ''
+
+
+def migrate_inline_text(expenses_col, store: ReceiptTextStore, batch: int = 500,
+                        user: Optional[str] = None) -> Dict[str, int]:
+    """Move OCR text of receipt uploads into the blob store, setting merchant/keywords inline"""
+    query: Dict[str, Any] = {'filename': {'$ne': None}, 'text': {'$exists': True}, 'text_id': {'$exists': False}}
+    if user:
+        query['user'] = user
+    moved = freed = 0
+    ops = []
+    for x in expenses_col.find(query, {'_id': 1, 'user': 1, 'text': 1, 'merchant': 1}).batch_size(batch):
+        text = x.get('text') or ''
+        text_id = store.put(x.get('user'), text)
+        ops.append(UpdateOne({'_id': x['_id']}, {
+            '$set': {
+                'text_id': text_id,
+                'merchant': x.get('merchant') or extract_merchant(text),
+                'keywords': extract_keywords(text)
+            },
+            '$unset': {'text': ''}
+        }))
+        moved += 1
+        freed += len(text.encode('utf-8'))
+        if len(ops) >= batch:
+            expenses_col.bulk_write(ops, ordered=False)
+            ops = []
+    if ops:
+        expenses_col.bulk_write(ops, ordered=False)
+    return {'moved': moved, 'bytes_moved': freed}
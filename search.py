@@ -0,0 +1,112 @@
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo import UpdateOne
+import re
+
+# Compound text index: equality on user, then weighted full-text over merchant, note and receipt keywords
+TEXT_INDEX = [("user", 1), ("merchant", "text"), ("note", "text"), ("keywords", "text")]
+TEXT_INDEX_WEIGHTS = {"merchant": 10, "note": 5, "keywords": 1}
+PREFIX_INDEX = [("user", 1), ("search_prefixes", 1)]
+
+MIN_PREFIX = 2
+MAX_PREFIX = 12
+MAX_OCR_TERMS = 60
+MAX_PER_PAGE = 100
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN.findall((text or '').lower())
+
+
+def search_prefixes(merchant: str = '', note: str = '', category: str = '', text: str = '') -> List[str]:
+    """Edge n-grams of the searchable words, stored on the expense for indexed prefix matching"""
+    words = _tokens(merchant) + _tokens(note) + _tokens(category)
+    seen = set(words)
+    for t in _tokens(text):
+        if len(seen) >= MAX_OCR_TERMS + len(words):
+            break
+        if len(t) >= MIN_PREFIX and not t.isdigit():
+            seen.add(t)
+    prefixes = set()
+    for w in seen:
+        for n in range(MIN_PREFIX, min(len(w), MAX_PREFIX) + 1):
+            prefixes.add(w[:n])
+    return sorted(prefixes)
+
+
+def build_query(user: str, q: str, min_amount: Optional[float] = None, max_amount: Optional[float] = None,
+                start: Optional[str] = None, end: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+    """Mongo filter for a search; returns (filter, uses_text_index).
+
+    Complete words go through the text index for ranking; the word being
+    typed (no trailing space) is matched as a prefix against search_prefixes.
+    """
+    words = _tokens(q)
+    query: Dict[str, Any] = {"user": user}
+    if words:
+        typing = q == q.rstrip() and len(words[-1]) <= MAX_PREFIX
+        full = words[:-1] if typing else words
+        if full:
+            query["$text"] = {"$search": " ".join(f'"{w}"' for w in full)}
+        if typing and len(words[-1]) >= MIN_PREFIX:
+            query["search_prefixes"] = words[-1]
+    amount = {}
+    if min_amount is not None:
+        amount["$gte"] = min_amount
+    if max_amount is not None:
+        amount["$lte"] = max_amount
+    if amount:
+        query["amount"] = amount
+    if start or end:
+        date = {}
+        if start:
+            date["$gte"] = start
+        if end:
+            date["$lt"] = end
+        query["date"] = date
+    return query, "$text" in query
+
+
+def search_expenses(expenses_col, query: Dict[str, Any], ranked: bool,
+                    page: int = 1, per_page: int = 20) -> Dict[str, Any]:
+    per_page = min(max(per_page, 1), MAX_PER_PAGE)
+    page = max(page, 1)
+    projection = {"_id": 1, "date": 1, "merchant": 1, "note": 1, "category": 1, "amount": 1, "filename": 1}
+    if ranked:
+        projection["score"] = {"$meta": "textScore"}
+        sort = [("score", {"$meta": "textScore"}), ("date", -1)]
+    else:
+        sort = [("date", -1)]
+    # Fetch one extra row to know whether there is a next page without counting
+    docs = list(expenses_col.find(query, projection).sort(sort).skip((page - 1) * per_page).limit(per_page + 1))
+    results = [{
+        "id": str(d["_id"]),
+        "date": d.get("date"),
+        "merchant": d.get("merchant"),
+        "note": d.get("note"),
+        "category": d.get("category"),
+        "amount": d.get("amount"),
+        "filename": d.get("filename"),
+        "score": d.get("score"),
+    } for d in docs[:per_page]]
+    return {"results": results, "page": page, "per_page": per_page, "has_more": len(docs) > per_page}
+
+
+def backfill_search_prefixes(expenses_col, user: Optional[str] = None, batch: int = 1000) -> int:
+    """Populate search_prefixes on expenses written before search existed"""
+    query: Dict[str, Any] = {"search_prefixes": {"$exists": False}}
+    if user:
+        query["user"] = user
+    ops, updated = [], 0
+    cursor = expenses_col.find(query, {"_id": 1, "merchant": 1, "note": 1, "category": 1, "keywords": 1, "text": 1}).batch_size(batch)
+    for x in cursor:
+        prefixes = search_prefixes(x.get("merchant") or '', x.get("note") or '', x.get("category") or '',
+                                   x.get("keywords") or x.get("text") or '')
+        ops.append(UpdateOne({"_id": x["_id"]}, {"$set": {"search_prefixes": prefixes}}))
+        if len(ops) >= batch:
+            updated += expenses_col.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        updated += expenses_col.bulk_write(ops, ordered=False).modified_count
+    return updated
@@ -542,9 +542,41 @@ function switchTab(tabName, event) {
         if (faqsList && (faqsList.children.length === 0 || faqsList.querySelector('.loading'))) {
             loadData();
         }
+    } else if (tabName === 'performance') {
+        loadSlowRequests();
     }
 }
 
+// Slowest recent requests, with links to any captured flamegraphs
+async function loadSlowRequests() {
+    const list = document.getElementById('slow-requests-list');
+    if (!list) return;
+    try {
+        const response = await fetch('/api/admin/slow-requests?limit=50', { credentials: 'same-origin' });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const rows = await response.json();
+        if (rows.length === 0) {
+            list.innerHTML = '<div class="empty-state">No requests recorded yet.</div>';
+            return;
+        }
+        list.innerHTML = `<table class="slow-requests">
+            <thead><tr><th>ms</th><th>Method</th><th>Endpoint</th><th>Status</th><th>At</th><th>Profile</th></tr></thead>
+            <tbody>${rows.map(r => `<tr>
+                <td>${r.ms.toFixed(1)}</td>
+                <td>${escapeHtml(r.method)}</td>
+                <td>${escapeHtml(r.endpoint)}</td>
+                <td>${r.status}</td>
+                <td>${escapeHtml(r.at)}</td>
+                <td>${r.profile ? `<a href="/api/admin/profiles/${encodeURIComponent(r.profile)}" target="_blank">flamegraph</a>` : ''}</td>
+            </tr>`).join('')}</tbody>
+        </table>`;
+    } catch (error) {
+        console.error('Error loading slow requests:', error);
+        showError('Error loading slow requests');
+    }
+}
+window.loadSlowRequests = loadSlowRequests;
+
 window.editUpdate = function(id, title, content) {
     openUpdateModal(id, title, content);
 };
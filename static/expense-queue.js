@@ -0,0 +1,105 @@
+// Offline expense queue, shared by the page and the service worker.
+// Expenses saved while offline are kept in IndexedDB and posted to
+// /expenses/batch in groups once the connection is back. Every entry has a
+// client-generated id, so a replayed batch is never stored twice.
+(function (scope) {
+  const DB_NAME = 'ai-expenses-offline';
+  const STORE = 'expenses';
+  const BATCH_SIZE = 50;
+  const SYNC_TAG = 'sync-expenses';
+
+  function openDb() {
+    return new Promise((resolve, reject) => {
+      const req = indexedDB.open(DB_NAME, 1);
+      req.onupgradeneeded = () => {
+        req.result.createObjectStore(STORE, { keyPath: 'client_id' });
+      };
+      req.onsuccess = () => resolve(req.result);
+      req.onerror = () => reject(req.error);
+    });
+  }
+
+  async function withStore(mode, fn) {
+    const db = await openDb();
+    return new Promise((resolve, reject) => {
+      const tx = db.transaction(STORE, mode);
+      const result = fn(tx.objectStore(STORE));
+      tx.oncomplete = () => { db.close(); resolve(result && 'result' in result ? result.result : result); };
+      tx.onerror = () => { db.close(); reject(tx.error); };
+    });
+  }
+
+  function newClientId() {
+    if (scope.crypto && scope.crypto.randomUUID) return scope.crypto.randomUUID();
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 12);
+  }
+
+  const ExpenseQueue = {
+    SYNC_TAG,
+
+    newClientId,
+
+    add(expense) {
+      const entry = { ...expense, client_id: expense.client_id || newClientId(), queued_at: Date.now() };
+      return withStore('readwrite', store => store.put(entry)).then(() => entry);
+    },
+
+    all() {
+      return withStore('readonly', store => store.getAll());
+    },
+
+    count() {
+      return withStore('readonly', store => store.count());
+    },
+
+    remove(ids) {
+      return withStore('readwrite', store => ids.forEach(id => store.delete(id)));
+    },
+
+    // Ask the service worker to flush when connectivity returns; falls back
+    // to flushing from the page where Background Sync is unavailable.
+    async requestSync() {
+      if ('serviceWorker' in navigator && 'SyncManager' in scope) {
+        const reg = await navigator.serviceWorker.ready;
+        try {
+          await reg.sync.register(SYNC_TAG);
+          return;
+        } catch (e) {
+          // Permission denied or unsupported; flush from the page instead
+        }
+      }
+      if (navigator.onLine) await ExpenseQueue.flush();
+    },
+
+    // Post queued expenses in batches. Entries the server accepted, already
+    // had, or rejected as invalid are removed; anything else stays queued.
+    async flush() {
+      const pending = await ExpenseQueue.all();
+      let created = 0;
+      for (let i = 0; i < pending.length; i += BATCH_SIZE) {
+        const batch = pending.slice(i, i + BATCH_SIZE);
+        const response = await fetch('/expenses/batch', {
+          method: 'POST',
+          credentials: 'same-origin',
+          headers: { 'Content-Type': 'application/json', 'Accept': 'application/json' },
+          body: JSON.stringify({
+            expenses: batch.map(({ queued_at, ...expense }) => expense)
+          })
+        });
+        if (!response.ok) {
+          // 401 (signed out) or a server error: keep everything for the next sync
+          throw new Error(`Batch sync failed with HTTP ${response.status}`);
+        }
+        const data = await response.json();
+        const done = data.results
+          .filter(r => r.status === 'created' || r.status === 'duplicate' || r.status === 'invalid')
+          .map(r => r.client_id);
+        await ExpenseQueue.remove(done);
+        created += data.created || 0;
+      }
+      return { created, remaining: await ExpenseQueue.count() };
+    }
+  };
+
+  scope.ExpenseQueue = ExpenseQueue;
+})(self);
@@ -140,7 +140,12 @@ async function loadSummary() {
   try {
     const res = await fetch('/api/summary');
     if (!res.ok) return;
-    const data = await res.json();
+    renderSummary(await res.json());
+  } catch (_) {}
+}
+
+function renderSummary(data) {
+  try {
     const fmt = (n) => `₹${Number(n||0).toFixed(0)}`;
     const net = document.getElementById('kpiNet');
     const spend = document.getElementById('kpiSpend');
@@ -412,8 +417,22 @@ async function loadAnnouncements() {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
     
-    const data = await response.json();
-    
+    renderAnnouncements(await response.json());
+  } catch (error) {
+    console.error('Error loading announcements:', error);
+    container.innerHTML = `
+      <div class="error">
+        <p>Failed to load announcements.</p>
+        <p><small>${error.message || 'Please try again later.'}</small></p>
+      </div>`;
+  }
+}
+
+function renderAnnouncements(data) {
+  const container = document.getElementById('announcements-list');
+  if (!container) return;
+
+  try {
     if (!Array.isArray(data)) {
       throw new Error('Invalid response format');
     }
@@ -470,8 +489,22 @@ async function loadFAQs() {
       throw new Error(`HTTP error! status: ${response.status}`);
     }
     
-    const data = await response.json();
-    
+    renderFAQs(await response.json());
+  } catch (error) {
+    console.error('Error loading FAQs:', error);
+    container.innerHTML = `
+      <div class="error">
+        <p>Failed to load FAQs.</p>
+        <p><small>${error.message || 'Please try again later.'}</small></p>
+      </div>`;
+  }
+}
+
+function renderFAQs(data) {
+  const container = document.getElementById('faq-list');
+  if (!container) return;
+
+  try {
     if (!Array.isArray(data)) {
       throw new Error('Invalid response format');
     }
@@ -529,20 +562,18 @@ document.addEventListener("DOMContentLoaded", () => {
     });
   }
 
-  // Load chat history
-  (async () => {
-    try {
-      const res = await fetch('/advice/history');
-      if (!res.ok) return;
-      const data = await res.json();
-      const msgs = Array.isArray(data.messages) ? data.messages : [];
-      msgs.forEach(m => appendChat(m.role === 'user' ? 'You' : 'AI', m.text || ''));
-    } catch (_) {}
-  })();
-
-  // If KPI nodes exist, load dashboard summary
+  // The dashboard bootstraps from one combined request; other pages load what they show
   if (document.getElementById('kpiSpend')) {
-    loadSummary();
+    loadDashboard();
+    startLiveUpdates();
+  } else {
+    loadChatHistory();
+    if (document.getElementById('announcements-list')) {
+      loadAnnouncements();
+    }
+    if (document.getElementById('faq-list')) {
+      loadFAQs();
+    }
   }
 
   // If analysis filters exist, init analysis defaults and load
@@ -550,16 +581,94 @@ document.addEventListener("DOMContentLoaded", () => {
     setQuickRange('month');
     refreshAnalysis();
   }
+});
 
-  // Load announcements and FAQs if on the dashboard
-  if (document.getElementById('announcements-list')) {
-    loadAnnouncements();
+function renderChatHistory(messages) {
+  const msgs = Array.isArray(messages) ? messages : [];
+  msgs.forEach(m => appendChat(m.role === 'user' ? 'You' : 'AI', m.text || ''));
+}
+
+async function loadChatHistory() {
+  try {
+    const res = await fetch('/advice/history');
+    if (!res.ok) return;
+    const data = await res.json();
+    renderChatHistory(data.messages);
+  } catch (_) {}
+}
+
+function renderCategoryChart(data) {
+  if (window.expenseChart && data && data.categories && data.totals) {
+    window.expenseChart.data.labels = data.categories;
+    window.expenseChart.data.datasets[0].data = data.totals;
+    window.expenseChart.update();
   }
-  
-  if (document.getElementById('faq-list')) {
-    loadFAQs();
+}
+
+// ================== Live updates (Server-Sent Events) ==================
+let liveSource = null;
+
+function liveUpdatesConnected() {
+  return !!liveSource && liveSource.readyState === EventSource.OPEN;
+}
+
+// Changes made in this or any other tab/device are pushed by the server,
+// so the dashboard never has to poll or refetch its summary after a write
+function startLiveUpdates() {
+  if (!window.EventSource || liveSource) return;
+  let connectedBefore = false;
+  liveSource = new EventSource('/api/events');
+
+  liveSource.addEventListener('hello', () => {
+    // After a reconnect we may have missed changes; revalidate (cheap 304s when nothing changed)
+    if (connectedBefore) Promise.all([loadSummary(), refreshChart()]).catch(() => {});
+    connectedBefore = true;
+  });
+
+  liveSource.addEventListener('change', (event) => {
+    let change;
+    try {
+      change = JSON.parse(event.data);
+    } catch (_) {
+      return;
+    }
+    if (change.summary) renderSummary(change.summary);
+    if (change.categories) renderCategoryChart(change.categories);
+  });
+
+  liveSource.onerror = () => {
+    // Signed out or too many open streams: stop instead of reconnecting forever
+    if (liveSource.readyState === EventSource.CLOSED) liveSource = null;
+  };
+}
+
+// Summary, category totals, chat history, announcements and FAQs in one round-trip.
+// Parts the server could not load are fetched from their own endpoints instead.
+async function loadDashboard() {
+  let data = null;
+  try {
+    const res = await fetch('/api/dashboard', { credentials: 'same-origin', headers: { 'Accept': 'application/json' } });
+    if (res.status === 401) {
+      window.location.href = '/login';
+      return;
+    }
+    if (res.ok) data = await res.json();
+  } catch (err) {
+    console.error('Error loading dashboard:', err);
   }
-});
+  data = data || { errors: ['summary', 'history', 'announcements', 'faqs'] };
+  const failed = new Set(data.errors || []);
+
+  if (failed.has('summary')) {
+    loadSummary();
+  } else {
+    renderSummary(data.summary);
+    renderCategoryChart(data.categories);
+  }
+  if (failed.has('history')) loadChatHistory(); else renderChatHistory(data.history);
+  if (failed.has('announcements')) loadAnnouncements(); else renderAnnouncements(data.announcements);
+  if (failed.has('faqs')) loadFAQs(); else renderFAQs(data.faqs);
+}
 
 // Quick prompt helper
 function sendQuick(text) {
@@ -569,15 +678,40 @@ function sendQuick(text) {
 }
 
 // Download analysis PDF
-function downloadAnalysisPdf() {
+function saveDownload(href) {
   const a = document.createElement('a');
-  a.href = '/export/analysis.pdf';
+  a.href = href;
   a.download = 'analysis.pdf';
   document.body.appendChild(a);
   a.click();
   document.body.removeChild(a);
 }
 
+// Large reports come back as a 202 job to poll; small ones are the PDF itself
+async function downloadAnalysisPdf() {
+  try {
+    const res = await fetch('/export/analysis.pdf');
+    if (res.status !== 202) {
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+      const url = URL.createObjectURL(await res.blob());
+      saveDownload(url);
+      setTimeout(() => URL.revokeObjectURL(url), 10000);
+      return;
+    }
+    let job = await res.json();
+    appendChat('AI', 'Your report is being prepared; the download will start when it is ready.');
+    while (job.status === 'pending' || job.status === 'running') {
+      await new Promise(resolve => setTimeout(resolve, 2000));
+      job = await fetch(job.poll || `/export/jobs/${job.job}`).then(r => r.json());
+    }
+    if (job.status !== 'ready') throw new Error(job.status || job.error);
+    saveDownload(job.download);
+  } catch (e) {
+    console.error('PDF export failed', e);
+    appendChat('AI', 'Sorry, the PDF report could not be generated. Please try again.');
+  }
+}
+
 async function setBudgetFromInput() {
   const el = document.getElementById('budgetInput');
   const val = (el?.value || '').trim();
@@ -819,19 +953,52 @@ async function refreshChart() {
         const response = await fetch('/expenses/summary');
         if (!response.ok) throw new Error('Failed to load expense data');
         
-        const data = await response.json();
-        
-        // Update chart if it exists
-        if (window.expenseChart && data && data.categories && data.totals) {
-            window.expenseChart.data.labels = data.categories;
-            window.expenseChart.data.datasets[0].data = data.totals;
-            window.expenseChart.update();
-        }
+        renderCategoryChart(await response.json());
     } catch (error) {
         console.error('Error refreshing chart:', error);
     }
 }
 
+async function queueOfflineExpense(expense, resultDiv, status) {
+    await ExpenseQueue.add(expense);
+    await ExpenseQueue.requestSync().catch(err => console.warn('Expense sync deferred:', err));
+    if (resultDiv) {
+        resultDiv.innerHTML = `
+            <div class="alert alert-info" style="padding: 10px; margin: 10px 0; border-radius: 4px; background-color: #d1ecf1; color: #0c5460; border: 1px solid #bee5eb;">
+                <strong>Saved offline.</strong> ₹${expense.amount.toFixed(2)} for ${expense.category} will sync when you're back online.
+            </div>
+        `;
+    }
+    status && (status.textContent = 'Queued for sync');
+    const form = document.querySelector('#expenseModal form');
+    if (form) form.reset();
+}
+
+// Queued expenses: refresh once the service worker has synced them, and
+// flush from the page on reconnect where Background Sync is unavailable
+if ('serviceWorker' in navigator) {
+    navigator.serviceWorker.addEventListener('message', (event) => {
+        if (event.data && event.data.type === 'EXPENSES_SYNCED' && event.data.created) {
+            Promise.all([loadSummary(), refreshAnalysis(), refreshChart()]).catch(() => {});
+        }
+        // A cached API response was shown and the server had newer data
+        if (event.data && event.data.type === 'API_UPDATED') {
+            const path = new URL(event.data.url).pathname;
+            if (path === '/api/summary') loadSummary().catch(() => {});
+            if (path === '/api/analysis') refreshAnalysis().catch(() => {});
+            if (path === '/api/dashboard') Promise.all([loadSummary(), refreshChart()]).catch(() => {});
+        }
+    });
+}
+window.addEventListener('online', async () => {
+    if (!window.ExpenseQueue) return;
+    try {
+        if (await ExpenseQueue.count()) await ExpenseQueue.requestSync();
+    } catch (err) {
+        console.warn('Expense sync failed:', err);
+    }
+});
+
 async function submitManualExpense() {
     const merchant = document.getElementById('manMerchant')?.value || '';
     const category = document.getElementById('manCategory')?.value || 'Misc';
@@ -870,21 +1037,37 @@ async function submitManualExpense() {
             }
         }
 
+        const expense = {
+            client_id: window.ExpenseQueue ? ExpenseQueue.newClientId() : undefined,
+            merchant,
+            category,
+            amount,
+            note,
+            date: dateToSend
+        };
+
+        // Offline: keep it in IndexedDB and let background sync upload it later
+        if (!navigator.onLine && window.ExpenseQueue) {
+            await queueOfflineExpense(expense, resultDiv, status);
+            return;
+        }
+
         // Send request to server
-        const response = await fetch('/expenses/add', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'Accept': 'application/json'
-            },
-            body: JSON.stringify({
-                merchant,
-                category,
-                amount,
-                note,
-                date: dateToSend
-            })
-        });
+        let response;
+        try {
+            response = await fetch('/expenses/add', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Accept': 'application/json'
+                },
+                body: JSON.stringify(expense)
+            });
+        } catch (networkError) {
+            if (!window.ExpenseQueue) throw networkError;
+            await queueOfflineExpense(expense, resultDiv, status);
+            return;
+        }
 
         const data = await response.json();
 
@@ -905,12 +1088,10 @@ async function submitManualExpense() {
         const form = document.querySelector('#expenseModal form');
         if (form) form.reset();
 
-        // Refresh data
-        await Promise.all([
-            loadSummary(),
-            refreshAnalysis(),
-            refreshChart()
-        ]);
+        // Refresh data; with a live connection the summary and chart arrive as a pushed change
+        await Promise.all(liveUpdatesConnected()
+            ? [refreshAnalysis()]
+            : [loadSummary(), refreshAnalysis(), refreshChart()]);
 
         // Close modal after a short delay
         setTimeout(() => {
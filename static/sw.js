@@ -1,21 +1,44 @@
-// Service Worker Version
-const CACHE_VERSION = 'v2.0.0';
+importScripts('/static/expense-queue.js');
+
+// Fingerprinted build output from `python assets.py`; missing in an unbuilt
+// checkout, where the source files below are cached instead
+try {
+  importScripts('/static/dist/precache-manifest.js');
+} catch (e) {
+  self.__PRECACHE_MANIFEST = null;
+}
+const PRECACHE = self.__PRECACHE_MANIFEST;
+
+// Service Worker Version: the build hash, so every new build replaces the cache
+const CACHE_VERSION = PRECACHE ? PRECACHE.version : 'v2.5.0';
 const CACHE_NAME = `ai-expenses-tracker-${CACHE_VERSION}`;
 
+// Per-user API responses live in one cache per user scope (an opaque key
+// the page passes in via SET_USER) and are served stale-while-revalidate
+const API_CACHE_PREFIX = 'ai-expenses-api-';
+const META_CACHE = 'ai-expenses-meta';
+const SCOPE_KEY = '/__sw/cache-scope';
+const USER_APIS = ['/api/summary', '/api/analysis', '/api/dashboard', '/advice/history', '/expenses/summary'];
+let userScope;
+
 // Assets to cache on install
-const ASSETS_TO_CACHE = [
+const APP_SHELL = [
   '/',
+  '/static/manifest.json',
+  '/favicon.ico',
+  '/logo192.png',
+  '/logo512.png'
+];
+const SOURCE_ASSETS = [
   '/static/style.css',
   '/static/animations.css',
   '/static/theme.css',
   '/static/script.js',
   '/static/firebase-config.js',
   '/static/admin.js',
-  '/static/manifest.json',
-  '/favicon.ico',
-  '/logo192.png',
-  '/logo512.png'
+  '/static/expense-queue.js'
 ];
+const ASSETS_TO_CACHE = [...APP_SHELL, ...(PRECACHE ? PRECACHE.assets : SOURCE_ASSETS)];
 
 // External resources to cache
 const EXTERNAL_RESOURCES = [
@@ -39,13 +62,19 @@ self.addEventListener('install', (event) => {
   );
 });
 
+// Caches that outlive a new build: the per-user API caches and the scope
+// record (setUserScope drops other users' caches itself)
+function isStaleCache(name) {
+  return name !== CACHE_NAME && name !== META_CACHE && !name.startsWith(API_CACHE_PREFIX);
+}
+
 // Activate event - clean up old caches
 self.addEventListener('activate', (event) => {
   event.waitUntil(
     caches.keys().then((cacheNames) => {
       return Promise.all(
         cacheNames.map((cache) => {
-          if (cache !== CACHE_NAME) {
+          if (isStaleCache(cache)) {
             console.log('[Service Worker] Removing old cache:', cache);
             return caches.delete(cache);
           }
@@ -71,8 +100,24 @@ self.addEventListener('fetch', (event) => {
     return;
   }
 
+  // Live update streams go straight to the network
+  if (requestUrl.pathname === '/api/events') return;
+
+  // Signing out: forget whose data we were caching before the session goes
+  if (requestUrl.pathname === '/logout') {
+    event.respondWith(setUserScope('').then(() => fetch(event.request)));
+    return;
+  }
+
+  if (USER_APIS.includes(requestUrl.pathname)) {
+    event.respondWith(staleWhileRevalidate(event));
+    return;
+  }
+
   // Handle API requests differently
   if (event.request.url.includes('/api/')) {
+    // Admin data is never cached; the public announcement/FAQ feeds are network-first
+    if (requestUrl.pathname.startsWith('/api/admin/')) return;
     event.respondWith(
       fetch(event.request)
         .then(response => {
@@ -95,8 +140,16 @@ self.addEventListener('fetch', (event) => {
           return caches.match(event.request);
         })
     );
-  } else {
-    // For all other requests, try cache first, then network
+  } else if (event.request.mode === 'navigate') {
+    // Pages are per-user and change with every expense: network first, the
+    // cached app shell only when offline
+    event.respondWith(
+      fetch(event.request).catch(() =>
+        caches.match(event.request).then(cached => cached || caches.match('/')))
+    );
+  } else if (requestUrl.origin !== self.location.origin || requestUrl.pathname.startsWith('/static/') ||
+             APP_SHELL.includes(requestUrl.pathname)) {
+    // Static assets: try cache first, then network
     event.respondWith(
       caches.match(event.request)
         .then((cachedResponse) => {
@@ -128,8 +181,68 @@ self.addEventListener('fetch', (event) => {
   }
 });
 
+async function getUserScope() {
+  if (userScope === undefined) {
+    const stored = await caches.open(META_CACHE).then(cache => cache.match(SCOPE_KEY));
+    userScope = stored ? await stored.text() : '';
+  }
+  return userScope;
+}
+
+async function setUserScope(scope) {
+  scope = scope || '';
+  if (scope === await getUserScope()) return;
+  userScope = scope;
+  // Someone else (or nobody) is signed in: drop every other user's responses
+  const names = await caches.keys();
+  await Promise.all(names
+    .filter(name => name.startsWith(API_CACHE_PREFIX) && name !== API_CACHE_PREFIX + scope)
+    .map(name => caches.delete(name)));
+  const meta = await caches.open(META_CACHE);
+  await meta.put(SCOPE_KEY, new Response(scope));
+}
+
+// Serve the user's cached copy at once and revalidate it with If-None-Match;
+// the server answers 304 while the user's data version is unchanged. When
+// the data did change the cache is refreshed and open pages are told.
+async function staleWhileRevalidate(event) {
+  const request = event.request;
+  const scope = await getUserScope();
+  if (!scope) return fetch(request);
+
+  const cache = await caches.open(API_CACHE_PREFIX + scope);
+  const cached = await cache.match(request);
+  const headers = new Headers(request.headers);
+  const etag = cached && cached.headers.get('ETag');
+  if (etag) headers.set('If-None-Match', etag);
+
+  const revalidate = fetch(request.url, { headers, credentials: 'same-origin', cache: 'no-store' })
+    .then(async (response) => {
+      if (response.status === 304 && cached) return cached;
+      // Only keep responses the server confirms belong to this scope
+      if (response.status === 200 && response.headers.get('X-Cache-Scope') === scope) {
+        await cache.put(request, response.clone());
+        if (cached) {
+          const clients = await self.clients.matchAll({ type: 'window' });
+          clients.forEach(client => client.postMessage({ type: 'API_UPDATED', url: request.url }));
+        }
+      }
+      return response;
+    });
+
+  if (cached) {
+    event.waitUntil(revalidate.catch(() => {}));
+    return cached;
+  }
+  return revalidate;
+}
+
 // Listen for messages from the app
 self.addEventListener('message', (event) => {
+  if (event.data && event.data.type === 'SET_USER') {
+    event.waitUntil(setUserScope(event.data.scope));
+  }
+
   if (event.data && event.data.type === 'SKIP_WAITING') {
     self.skipWaiting();
   }
@@ -138,7 +251,7 @@ self.addEventListener('message', (event) => {
     caches.keys().then(cacheNames => {
       return Promise.all(
         cacheNames.map(cache => {
-          if (cache !== CACHE_NAME) {
+          if (isStaleCache(cache)) {
             return caches.delete(cache);
           }
         })
@@ -155,7 +268,9 @@ self.addEventListener('sync', (event) => {
 });
 
 async function handleBackgroundSync() {
-  // Implement background sync logic here
   console.log('[Service Worker] Background sync started');
-  // Add your sync logic here
+  // A rejection here makes the browser retry the sync later with backoff
+  const result = await self.ExpenseQueue.flush();
+  const clients = await self.clients.matchAll({ type: 'window' });
+  clients.forEach(client => client.postMessage({ type: 'EXPENSES_SYNCED', ...result }));
 }
@@ -0,0 +1,182 @@
+"""Write-behind buffer for non-critical inserts (chat history, notifications).
+
+Request handlers add documents and return at once; a background thread
+inserts them in bulk when `max_docs` are queued or `max_delay` seconds have
+passed since the first one, whichever comes first. Documents get their _id
+on add, so a batch retried after a partial failure never stores a document
+twice. Everything still queued is flushed at interpreter exit (gunicorn's
+graceful worker shutdown included).
+
+Until a document is written, pending() lets read paths include it, so a
+user's own history never appears to lose a message.
+"""
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+import atexit
+import logging
+import os
+import threading
+import time
+
+from metrics import WRITE_BUFFER_DEPTH, WRITE_BUFFER_DROPPED, WRITE_BUFFER_ERRORS, WRITE_BUFFER_FLUSH_DOCS, WRITE_BUFFER_FLUSH_SECONDS
+
+log = logging.getLogger('expenses.write_buffer')
+
+DUPLICATE_KEY = 11000
+
+
+class WriteBuffer:
+    def __init__(self, db, max_docs: int = 200, max_delay: float = 0.5, max_pending: int = 20000,
+                 retry_delay: float = 1.0,
+                 on_flush: Optional[Callable[[str, List[Dict[str, Any]]], None]] = None):
+        self.db = db
+        self.max_docs = max_docs
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.retry_delay = retry_delay
+        self.on_flush = on_flush
+        self._queue: List[Tuple[str, Dict[str, Any]]] = []
+        self._inflight: List[Tuple[str, Dict[str, Any]]] = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()  # one writer at a time: the thread, flush() or close()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        atexit.register(self.close)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def add(self, collection: str, *docs: Dict[str, Any]):
+        """Queue documents for insertion; returns them with their _id set"""
+        for d in docs:
+            d.setdefault('_id', ObjectId())
+        with self._cond:
+            if self._closed:
+                # Shutting down: write through rather than lose the documents
+                self._insert(collection, list(docs))
+                return docs
+            self._ensure_thread()
+            self._queue.extend((collection, d) for d in docs)
+            overflow = len(self._queue) - self.max_pending
+            if overflow > 0:
+                # MongoDB has been unreachable for a while; shed the oldest rather than grow without bound
+                del self._queue[:overflow]
+                WRITE_BUFFER_DROPPED.inc(overflow)
+                log.error("Write buffer full, dropped oldest documents", extra={"dropped": overflow})
+            WRITE_BUFFER_DEPTH.set(len(self._queue))
+            # Starts the max_delay clock on the first document, or flushes early once full
+            self._cond.notify()
+        return docs
+
+    def pending(self, collection: str, match: Callable[[Dict[str, Any]], bool]) -> List[Dict[str, Any]]:
+        """Queued or in-flight documents of `collection` for which match(doc) is true"""
+        with self._cond:
+            items = self._inflight + self._queue
+        return [d for c, d in items if c == collection and match(d)]
+
+    def flush(self) -> int:
+        """Write everything queued now, on the calling thread; returns the number of documents written"""
+        with self._flush_lock:
+            with self._cond:
+                batch, self._queue = self._queue, []
+                self._inflight = batch
+                WRITE_BUFFER_DEPTH.set(0)
+            try:
+                return self._write(batch)
+            finally:
+                with self._cond:
+                    self._inflight = []
+
+    def close(self, timeout: float = 10.0):
+        """Stop the flusher and write whatever is left; safe to call twice"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        try:
+            self.flush()
+        except Exception:
+            log.exception("Write buffer final flush failed")
+
+    def _ensure_thread(self):
+        # Started on first use, so a preloading parent process never owns it
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='write-buffer', daemon=True)
+            self._thread.start()
+
+    def _after_fork(self):
+        # The parent still owns (and will write) what it had queued; the
+        # flusher thread and any held locks do not survive the fork
+        self._queue, self._inflight = [], []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        WRITE_BUFFER_DEPTH.set(0)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                # Give small bursts up to max_delay to grow into one batch
+                deadline = time.monotonic() + self.max_delay
+                while len(self._queue) < self.max_docs and not self._closed:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+            try:
+                self.flush()
+            except Exception:
+                log.exception("Write buffer flush failed")
+
+    def _write(self, batch: List[Tuple[str, Dict[str, Any]]]) -> int:
+        if not batch:
+            return 0
+        by_collection: Dict[str, List[Dict[str, Any]]] = {}
+        for c, d in batch:
+            by_collection.setdefault(c, []).append(d)
+        written = 0
+        for collection, docs in by_collection.items():
+            t0 = time.perf_counter()
+            try:
+                self._insert(collection, docs)
+            except Exception as e:
+                WRITE_BUFFER_ERRORS.inc(collection=collection)
+                log.warning("Write buffer flush error, will retry", extra={"collection": collection, "error": str(e)})
+                self._requeue(collection, docs)
+                if not self._closed:
+                    time.sleep(self.retry_delay)
+                continue
+            WRITE_BUFFER_FLUSH_SECONDS.observe(time.perf_counter() - t0, collection=collection)
+            WRITE_BUFFER_FLUSH_DOCS.observe(len(docs), collection=collection)
+            written += len(docs)
+            if self.on_flush:
+                try:
+                    self.on_flush(collection, docs)
+                except Exception:
+                    log.exception("Write buffer on_flush callback failed")
+        return written
+
+    def _insert(self, collection: str, docs: List[Dict[str, Any]]):
+        try:
+            self.db[collection].insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Documents a previous attempt already stored come back as duplicate keys
+            if any(err.get('code') != DUPLICATE_KEY for err in e.details.get('writeErrors', [])) \
+                    or e.details.get('writeConcernErrors'):
+                raise
+
+    def _requeue(self, collection: str, docs: List[Dict[str, Any]]):
+        if self._closed:
+            log.error("Write buffer dropped documents at shutdown", extra={"collection": collection, "count": len(docs)})
+            WRITE_BUFFER_DROPPED.inc(len(docs))
+            return
+        with self._cond:
+            self._queue[:0] = [(collection, d) for d in docs]
+            WRITE_BUFFER_DEPTH.set(len(self._queue))